@@ -1,20 +1,28 @@
-import plotly.express as px
 import streamlit as st
 import sqlite3
 import pandas as pd
 import yfinance as yf
-import matplotlib.pyplot as plt
 from datetime import date, datetime, timedelta
 import os
+import time
+import threading
 import psycopg2 
-from supabase import create_client
+import psycopg2.errors
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 import requests
 import xml.etree.ElementTree as ET
 import streamlit.components.v1 as components
-import json
-from streamlit_sortables import sort_items
-from streamlit_autorefresh import st_autorefresh
+import re
+import html
+import bisect
+import difflib
+import contextvars
+import random
+from urllib.parse import urlparse
 
 # -----------------------------------------------------------------------------
 # SESSION STATE (OTURUM) BAŞLANGIÇ AYARLARI
@@ -31,6 +39,18 @@ if "cev_hedef_isim" not in st.session_state:
     st.session_state.cev_hedef_isim = "Amerikan Doları (USD)"
     st.session_state.cev_hedef_kod = "USDTRY=X"
 
+# Genel Özet kayan bant ve sağ tablo listeleri (fiyat anlık görüntüsü sayfa çizilmeden önce bunlara bakar)
+if 'takip_listesi_bant' not in st.session_state:
+    st.session_state.takip_listesi_bant = {
+        "Dolar/TL": "USDTRY=X", "Euro/TL": "EURTRY=X", 
+        "Gram Altın": "GRAM_ALTIN", "Bitcoin": "BTC-USD"
+    }
+if 'sag_panel_listesi' not in st.session_state:
+    st.session_state.sag_panel_listesi = {
+        "BIST 100": "XU100.IS", "S&P 500": "^GSPC",
+        "Gram Altın": "GRAM_ALTIN", "Dolar/TL": "USDTRY=X", "Bitcoin": "BTC-USD"
+    }
+
 # --- KULLANICI DOĞRULAMA (AUTH) AYARLARI ---
 # Bu satır kodun en üstünde olmalı!
 st.set_page_config(page_title="Portföyüm", layout="wide", initial_sidebar_state="expanded")
@@ -78,16 +98,18 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Secrets'tan bilgileri çekiyoruz
-url = st.secrets["SUPABASE_URL"]
-key = st.secrets["SUPABASE_KEY"]
-supabase = create_client(url, key)
+# Supabase istemcisi süreç başına bir kez kurulur; yalnızca giriş ekranında gerektiği için modül de orada yüklenir
+@st.cache_resource
+def supabase_istemcisi():
+    from supabase import create_client
+    return create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
 
 # Kullanıcı oturumunu kontrol etme
 if "user" not in st.session_state:
     st.session_state.user = None
 
 def login_page():
+    supabase = supabase_istemcisi()
     st.markdown("""
     <style>
         .main-title { text-align: center; font-size: 3.2rem; font-weight: 800; color: #38bdf8; margin-bottom: 0px; padding-top: 1.5rem; }
@@ -185,69 +207,1034 @@ def google_ads_goster(reklam_birimi_id, yukseklik=100):
 # =============================================================================
 # OTOMATİK CANLI YENİLEME SİSTEMİ
 # =============================================================================
-st_autorefresh(interval=60000, key="canli_piyasa_guncelleme")
+# Tüm sayfayı yeniden çalıştırmak yerine yalnızca canlı bölümler (kayan bant, Canlı Piyasa tablosu ve
+# portföy metrikleri) st.fragment ile kendi zamanlayıcısında yenilenir; formlar ve grafikler yerinde kalır.
+CANLI_YENILEME_SANIYE = 60
+# Canlı kotasyon akışı veri getirirken bant ve Canlı Piyasa tablosu bellekteki son işlem tablosundan bu sıklıkla okunur
+CANLI_AKIS_SANIYE = 5
+# Bu süredir mesaj gelmeyen bağlı akış (kapalı piyasa, sessiz sunucu) yavaş aralığa döner
+CANLI_AKIS_SESSIZLIK = 30
+
+# =============================================================================
+# İZLEME (SPAN), METRİKLER VE PROMETHEUS DIŞA AKTARIMI
+# =============================================================================
+# Her veritabanı sorgusu, dış HTTP çağrısı ve sayfa bölümü bir span olarak ölçülür. Süreler süreç genelinde
+# (tür, ad) başına histogramlarda toplanır; betik iş parçacığındaki span'ler ayrıca o yeniden çalıştırmanın
+# şelale görünümü için kaydedilir. Uygulamanın kendi önbelleklerinin isabet/ıskalamaları sayaç olarak tutulur.
+# METRIK_DOSYASI tanımlıysa metrikler Prometheus metin biçiminde bu dosyaya (node_exporter textfile
+# toplayıcısı gibi) yazılır; METRIK_PORTU tanımlıysa aynı metin http://127.0.0.1:<port>/metrics adresinden sunulur.
+# Uç nokta kimlik doğrulamasızdır ve kullanıcı başına süreler içerir; dış arayüzlere açmak için METRIK_ADRESI
+# (ör. "0.0.0.0") bilinçli olarak verilmelidir.
+class RerunIzi:
+    def __init__(self):
+        self.baslangic = time.perf_counter()
+        self.spanlar = []   # (tür, ad, başlangıç ofseti sn, süre sn, derinlik)
+        self.derinlik = 0
+        self.bolum = None
+        self.bitti = False
+
+def arka_plani_durdur(nesne):
+    # st.cache_resource(on_release=...) kancası: önbellek temizlenince nesnenin iş parçacıkları da durur,
+    # yeni örneğinkilerle birlikte sahipsiz çalışmaya devam etmez
+    nesne.durdur()
+
+class Izleyici:
+    KOVALAR = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    AZAMI_SPAN = 2000
+
+    def __init__(self, dosya=None, port=None, aralik=15, adres="127.0.0.1"):
+        self._kilit = threading.Lock()
+        self._histogramlar = {}  # (tür, ad) -> [kova sayıları (kümülatif değil) + taşma, toplam süre]
+        self._sayaclar = {}      # (ölçü, (etiket, değer)...) -> adet
+        # Fonksiyonlar her yeniden çalıştırmada yeniden tanımlandığı için bağlam değişkeni önbellekteki nesnede durur
+        self.aktif_iz = contextvars.ContextVar("aktif_iz", default=None)
+        self.dosya = dosya
+        self._dur = threading.Event()
+        self._http = None
+        if dosya:
+            threading.Thread(target=self._dosya_dongusu, args=(aralik,), daemon=True).start()
+        if port:
+            threading.Thread(target=self._sunucu, args=(adres, int(port)), daemon=True).start()
+
+    def durdur(self):
+        self._dur.set()
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+
+    def gozlemle(self, tur, ad, sure):
+        kova = bisect.bisect_left(self.KOVALAR, sure)
+        with self._kilit:
+            h = self._histogramlar.get((tur, ad))
+            if h is None:
+                h = self._histogramlar[(tur, ad)] = [[0] * (len(self.KOVALAR) + 1), 0.0]
+            h[0][kova] += 1
+            h[1] += sure
+
+    def say(self, olcu, **etiketler):
+        anahtar = (olcu, *sorted(etiketler.items()))
+        with self._kilit:
+            self._sayaclar[anahtar] = self._sayaclar.get(anahtar, 0) + 1
+
+    def prometheus_metni(self):
+        def etiket(deger):
+            return str(deger).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        with self._kilit:
+            histogramlar = {k: (list(v[0]), v[1]) for k, v in self._histogramlar.items()}
+            sayaclar = dict(self._sayaclar)
+        satirlar = ["# HELP portfoy_span_saniye Ölçülen işlemlerin süresi (saniye)", "# TYPE portfoy_span_saniye histogram"]
+        for (tur, ad), (kovalar, toplam) in sorted(histogramlar.items()):
+            etiketler = f'tur="{etiket(tur)}",ad="{etiket(ad)}"'
+            birikimli = np.cumsum(kovalar)
+            for sinir, adet in zip(self.KOVALAR, birikimli):
+                satirlar.append(f'portfoy_span_saniye_bucket{{{etiketler},le="{sinir}"}} {adet}')
+            satirlar.append(f'portfoy_span_saniye_bucket{{{etiketler},le="+Inf"}} {birikimli[-1]}')
+            satirlar.append(f"portfoy_span_saniye_sum{{{etiketler}}} {toplam:.6f}")
+            satirlar.append(f"portfoy_span_saniye_count{{{etiketler}}} {birikimli[-1]}")
+        olculer = sorted({k[0] for k in sayaclar})
+        for olcu in olculer:
+            satirlar.append(f"# TYPE portfoy_{olcu}_toplam counter")
+            for anahtar, adet in sorted(sayaclar.items()):
+                if anahtar[0] != olcu: continue
+                etiketler = ",".join(f'{e}="{etiket(d)}"' for e, d in anahtar[1:])
+                satirlar.append(f"portfoy_{olcu}_toplam{{{etiketler}}} {adet}")
+        return "\n".join(satirlar) + "\n"
+
+    def _dosya_dongusu(self, aralik):
+        # Toplayıcı yarım dosya okumasın diye geçici dosyaya yazılıp yerine taşınır
+        while not self._dur.wait(aralik):
+            try:
+                gecici = f"{self.dosya}.{os.getpid()}.tmp"
+                with open(gecici, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_metni())
+                os.replace(gecici, self.dosya)
+            except OSError:
+                pass
+
+    def _sunucu(self, adres, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        izleyici = self
+
+        class MetrikIstegi(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                govde = izleyici.prometheus_metni().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(govde)))
+                self.end_headers()
+                self.wfile.write(govde)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._http = ThreadingHTTPServer((adres, port), MetrikIstegi)
+        except OSError:
+            return
+        self._http.serve_forever()
+
+@st.cache_resource(on_release=arka_plani_durdur)
+def izleyici():
+    return Izleyici(st.secrets.get("METRIK_DOSYASI"), st.secrets.get("METRIK_PORTU"),
+                    adres=st.secrets.get("METRIK_ADRESI", "127.0.0.1"))
+
+# İş parçacıklarından st.cache_resource çağırmamak için örnek modül değişkeninde tutulur
+IZLEYICI = izleyici()
+
+@contextmanager
+def span(tur, ad):
+    iz = IZLEYICI.aktif_iz.get()
+    bas = time.perf_counter()
+    if iz: iz.derinlik += 1
+    try:
+        yield
+    finally:
+        sure = time.perf_counter() - bas
+        IZLEYICI.gozlemle(tur, ad, sure)
+        if iz:
+            iz.derinlik -= 1
+            if not iz.bitti and len(iz.spanlar) < IZLEYICI.AZAMI_SPAN:
+                iz.spanlar.append((tur, ad, bas - iz.baslangic, sure, iz.derinlik))
+
+def onbellek_sonucu(onbellek, isabet):
+    IZLEYICI.say("onbellek", onbellek=onbellek, sonuc="isabet" if isabet else "iskalama")
+
+def izleme_bolumu(ad):
+    # Betik düz akışta ilerlediği için bölümler sıralıdır: yeni bölüm bir öncekini kapatır
+    iz = IZLEYICI.aktif_iz.get()
+    if iz is None or iz.bitti: return
+    simdi = time.perf_counter()
+    if iz.bolum:
+        onceki, bas = iz.bolum
+        IZLEYICI.gozlemle("bolum", onceki, simdi - bas)
+        iz.spanlar.append(("bolum", onceki, bas - iz.baslangic, simdi - bas, 0))
+    iz.bolum = (ad, simdi) if ad else None
+
+def izleme_baslat():
+    iz = RerunIzi()
+    IZLEYICI.aktif_iz.set(iz)
+    return iz
+
+def izleme_bitir():
+    iz = IZLEYICI.aktif_iz.get()
+    if iz is None: return None
+    izleme_bolumu(None)
+    iz.bitti = True
+    IZLEYICI.gozlemle("rerun", "toplam", time.perf_counter() - iz.baslangic)
+    return iz
+
+def sql_etiketi(sorgu):
+    # Etiket kardinalitesini sınırlı tutmak için sorgudan yalnızca komut ve ilk tablo / hazır sorgu adı alınır
+    if isinstance(sorgu, bytes): sorgu = sorgu.decode(errors="ignore")
+    if not isinstance(sorgu, str) or not sorgu.strip(): return "sql"
+    hazir = re.match(r"\s*(EXECUTE|PREPARE)\s+(\w+)", sorgu, re.I)
+    if hazir: return f"{hazir.group(1).lower()} {hazir.group(2)}"
+    komut = sorgu.split(None, 1)[0].lower()
+    tablo = re.search(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)", sorgu, re.I)
+    return f"{komut} {tablo.group(1)}" if tablo else komut
+
+def yonetici_mi():
+    kullanici = st.session_state.get("user")
+    return kullanici is not None and getattr(kullanici, "email", None) in st.secrets.get("YONETICI_EPOSTALARI", [])
+
+IZ_RENKLERI = {"bolum": "#94a3b8", "db": "#3b82f6", "http": "#f59e0b"}
+
+def izleme_paneli(iz):
+    # Yalnızca yöneticiye: bu yeniden çalıştırmanın şelale görünümü ve süreç geneli Prometheus metni
+    toplam = max(time.perf_counter() - iz.baslangic, 1e-6)
+    spanlar = sorted(iz.spanlar, key=lambda x: (x[2], x[4]))
+    with st.expander(f"🛠️ Performans İzleme (Yönetici) — {toplam * 1000:,.0f} ms", expanded=False):
+        ozet = pd.DataFrame(spanlar, columns=["Tür", "Ad", "Başlangıç", "Süre", "Derinlik"])
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Yeniden Çalıştırma", f"{toplam * 1000:,.0f} ms")
+        for kolon, tur, baslik in ((m2, "db", "Veritabanı"), (m3, "http", "Dış HTTP")):
+            secili = ozet[ozet["Tür"] == tur]
+            kolon.metric(baslik, f"{secili['Süre'].sum() * 1000:,.0f} ms", f"{len(secili)} çağrı", delta_color="off")
+
+        satirlar = []
+        for tur, ad, bas, sure, derinlik in spanlar:
+            # Bölümler en dışta; diğer span'ler içinde bulundukları bölümün altında girintilenir
+            derinlik += tur != "bolum"
+            sol = bas / toplam * 100
+            genislik = max(sure / toplam * 100, 0.3)
+            satirlar.append(
+                f"<div style='display: flex; align-items: center; font-size: 12px; height: 20px;'>"
+                f"<div style='width: 32%; padding-left: {derinlik * 12}px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;' title='{html.escape(ad, quote=True)}'>"
+                f"<b>{tur}</b> {html.escape(ad)}</div>"
+                f"<div style='position: relative; width: 56%; height: 12px; background: #f1f5f9; border-radius: 3px;'>"
+                f"<div style='position: absolute; left: {sol:.2f}%; width: {genislik:.2f}%; height: 100%; background: {IZ_RENKLERI.get(tur, '#64748b')}; border-radius: 3px;'></div></div>"
+                f"<div style='width: 12%; text-align: right; font-family: monospace;'>{sure * 1000:,.1f} ms</div></div>")
+        st.markdown("".join(satirlar) or "Bu çalıştırmada span kaydedilmedi.", unsafe_allow_html=True)
+
+        if not ozet.empty:
+            toplu = ozet.groupby(["Tür", "Ad"])["Süre"].agg(["count", "sum", "max"]).reset_index()
+            toplu.columns = ["Tür", "Ad", "Adet", "Toplam (ms)", "En Uzun (ms)"]
+            toplu[["Toplam (ms)", "En Uzun (ms)"]] *= 1000
+            st.dataframe(toplu.sort_values("Toplam (ms)", ascending=False).round(1), use_container_width=True, hide_index=True)
+        st.download_button("📥 Prometheus metriklerini indir", IZLEYICI.prometheus_metni(), file_name="portfoy_metrikleri.prom", mime="text/plain")
+
+izleme_baslat()
 
 # =============================================================================
 # BULUT VERİTABANI BAĞLANTISI (SUPABASE)
 # =============================================================================
-def get_db_connection():
-    return psycopg2.connect(st.secrets["DB_URL"])
+# NUMERIC kolonlar float olarak okunur; pandas ve mevcut hesaplamalar Decimal değil float bekliyor
+NUMERIC_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, "NUMERIC_FLOAT", lambda v, c: float(v) if v is not None else None
+)
+
+class IzlenenImlec(psycopg2.extensions.cursor):
+    # Her sorgu gidiş-dönüşü bir "db" span'i olarak ölçülür
+    def execute(self, sorgu, parametreler=None):
+        with span("db", sql_etiketi(sorgu)):
+            return super().execute(sorgu, parametreler)
+
+    def executemany(self, sorgu, parametreler):
+        with span("db", sql_etiketi(sorgu)):
+            return super().executemany(sorgu, parametreler)
+
+class HazirBaglanti(psycopg2.extensions.connection):
+    # Bağlantı üzerinde PREPARE edilmiş sorguları ve son kullanım zamanını tutar
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = IzlenenImlec
+        psycopg2.extensions.register_type(NUMERIC_FLOAT, self)
+        self.hazirlananlar = set()
+        self.son_kullanim = time.time()
+
+class BekleyenHavuz(ThreadedConnectionPool):
+    # Havuz dolduğunda PoolError fırlatmak yerine boşalan bağlantıyı bekler
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._yer = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._yer.acquire(timeout=30):
+            raise psycopg2.pool.PoolError("Veritabanı bağlantı havuzu dolu.")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._yer.release()
+            raise
 
-@st.cache_resource 
-def init_db():
-    conn = get_db_connection()
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._yer.release()
+
+@st.cache_resource
+def db_havuzu():
+    return BekleyenHavuz(1, 10, st.secrets["DB_URL"], connection_factory=HazirBaglanti)
+
+def _saglikli_baglanti_al(havuz):
+    # Kapanmış ya da uzun süre boşta kalıp kopmuş bağlantıları havuzdan atar
+    for _ in range(3):
+        conn = havuz.getconn()
+        if not conn.closed:
+            if time.time() - conn.son_kullanim < 60:
+                return conn
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                pass
+        havuz.putconn(conn, close=True)
+    return havuz.getconn()
+
+@contextmanager
+def db_baglantisi():
+    # Bloğun sonunda commit eder, hata olursa geri alır; bağlantı her durumda havuza döner
+    havuz = db_havuzu()
+    with span("db", "baglanti_al"):
+        conn = _saglikli_baglanti_al(havuz)
+    try:
+        yield conn
+        with span("db", "commit"):
+            conn.commit()
+    except Exception:
+        if not conn.closed: conn.rollback()
+        raise
+    finally:
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        conn.son_kullanim = time.time()
+        havuz.putconn(conn, close=bool(conn.closed))
+
+# Sık çalışan sorgular bağlantı başına bir kez PREPARE edilir: ad -> (parametre tipleri, sorgu)
+HAZIR_SORGULAR = {
+    "varlik_detay": ("uuid", "SELECT tur, sembol, miktar, ort_maliyet, guncel_fiyat FROM varliklar WHERE miktar > 0 AND user_id = $1"),
+    "islem_kaydet": ("uuid, text, text, numeric, numeric, text, date", "SELECT * FROM islem_kaydet($1, $2, $3, $4, $5, $6, $7)"),
+    "kontrol_noktasi_once": ("uuid, text, date, integer", "SELECT tarih, islem_id, miktar, ort_maliyet FROM pozisyon_kontrol_noktalari WHERE user_id = $1 AND sembol = $2 AND (tarih, islem_id) < ($3, $4) ORDER BY tarih DESC, islem_id DESC LIMIT 1"),
+    # Tarihsiz (v3 göçünde NULL kalan) işlemler defterin başına, DEFTER_BASI tarihine sıralanır
+    "islem_defteri_sonrasi": ("uuid, text, date, integer", "SELECT COALESCE(tarih, DATE '1900-01-01'), id, islem_tipi, miktar, fiyat FROM islemler WHERE user_id = $1 AND sembol = $2 AND (COALESCE(tarih, DATE '1900-01-01'), id) > ($3, $4) ORDER BY COALESCE(tarih, DATE '1900-01-01'), id"),
+    "hedef_getir": ("uuid", "SELECT ad, tutar FROM hedefler WHERE user_id = $1 LIMIT 1"),
+    "portfoy_degeri_serisi": ("uuid", "SELECT tarih, deger, yatirim FROM portfoy_degeri WHERE user_id = $1 ORDER BY tarih"),
+    "islem_akisi": ("uuid", "SELECT sembol, COALESCE(tarih, DATE '1900-01-01'), islem_tipi, miktar, fiyat FROM islemler WHERE user_id = $1 ORDER BY COALESCE(tarih, DATE '1900-01-01'), id"),
+}
+
+def hazir_sorgu(cursor, ad, parametreler):
+    conn = cursor.connection
+    if st.secrets.get("DB_HAZIR_SORGU", True) and isinstance(conn, HazirBaglanti):
+        if ad not in conn.hazirlananlar:
+            tipler, sorgu = HAZIR_SORGULAR[ad]
+            cursor.execute(f"PREPARE {ad} ({tipler}) AS {sorgu}")
+            conn.hazirlananlar.add(ad)
+        cursor.execute(f"EXECUTE {ad} ({', '.join(['%s'] * len(parametreler))})", parametreler)
+    else:
+        # Transaction modundaki pgbouncer gibi PREPARE desteklemeyen bağlantılar için düz sorgu
+        sorgu = HAZIR_SORGULAR[ad][1]
+        for i in range(len(parametreler), 0, -1):
+            sorgu = sorgu.replace(f"${i}", "%s")
+        cursor.execute(sorgu, parametreler)
+    return cursor
+
+def hazir_sorgu_df(conn, ad, parametreler):
+    with conn.cursor() as cursor:
+        hazir_sorgu(cursor, ad, parametreler)
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+# =============================================================================
+# ŞEMA GÖÇLERİ (SÜRÜMLÜ, SIRALI, TEKRAR ÇALIŞTIRILABİLİR)
+# =============================================================================
+# (sürüm, açıklama, [sql adımları]) — yeni göçler listenin sonuna, bir sonraki sürüm numarasıyla eklenir
+SEMA_GOCLERI = [
+    (1, "Sık filtrelenen kolonlara indeksler", [
+        "CREATE INDEX IF NOT EXISTS ix_varliklar_user_aktif ON varliklar (user_id) WHERE miktar > 0",
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_sembol_id ON islemler (user_id, sembol, id)",
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_id ON islemler (user_id, id DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_hedefler_user ON hedefler (user_id)",
+    ]),
+    (2, "varliklar tablosunda (user_id, sembol) tekilliği", [
+        # Aynı sembolün birden fazla satırı varsa miktarlar toplanıp ağırlıklı maliyetle en eski satırda birleştirilir
+        """WITH gruplar AS (
+               SELECT user_id, sembol, min(id) AS tut_id, sum(miktar) AS top_miktar,
+                      CASE WHEN sum(miktar) > 0 THEN sum(miktar * ort_maliyet) / sum(miktar) ELSE 0 END AS ort
+               FROM varliklar GROUP BY user_id, sembol HAVING count(*) > 1
+           )
+           UPDATE varliklar v SET miktar = g.top_miktar, ort_maliyet = g.ort FROM gruplar g WHERE v.id = g.tut_id""",
+        "DELETE FROM varliklar v USING varliklar d WHERE v.user_id = d.user_id AND v.sembol = d.sembol AND v.id > d.id",
+        """DO $$ BEGIN
+               IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_varliklar_user_sembol') THEN
+                   ALTER TABLE varliklar ADD CONSTRAINT uq_varliklar_user_sembol UNIQUE (user_id, sembol);
+               END IF;
+           END $$""",
+    ]),
+    (3, "islemler.tarih TEXT -> DATE", [
+        "ALTER TABLE islemler ALTER COLUMN tarih TYPE DATE USING NULLIF(tarih::text, '')::date",
+        "ALTER TABLE islemler ALTER COLUMN tarih SET DEFAULT CURRENT_DATE",
+    ]),
+    (4, "Miktar ve tutarlar REAL -> NUMERIC", [
+        """ALTER TABLE varliklar ALTER COLUMN miktar TYPE NUMERIC(28,10),
+                                ALTER COLUMN ort_maliyet TYPE NUMERIC(28,10),
+                                ALTER COLUMN guncel_fiyat TYPE NUMERIC(28,10)""",
+        """ALTER TABLE islemler ALTER COLUMN miktar TYPE NUMERIC(28,10),
+                               ALTER COLUMN fiyat TYPE NUMERIC(28,10)""",
+        "ALTER TABLE hedefler ALTER COLUMN tutar TYPE NUMERIC(20,2)",
+    ]),
+    (5, "Alış/satış işlemini tek çağrıda kaydeden islem_kaydet fonksiyonu", [
+        # Pozisyon satırı FOR UPDATE ile kilitlenir; satış miktarı kontrolü, maliyet güncellemesi ve
+        # işlem defteri kaydı aynı transaction içinde yapılır. Yeni pozisyonu döndürür.
+        """CREATE OR REPLACE FUNCTION islem_kaydet(p_user UUID, p_sembol TEXT, p_tip TEXT, p_miktar NUMERIC, p_fiyat NUMERIC, p_tur TEXT)
+           RETURNS TABLE (yeni_miktar NUMERIC, yeni_ort_maliyet NUMERIC, yeni_islem_id INTEGER)
+           LANGUAGE plpgsql AS $$
+           DECLARE
+               v_id INTEGER;
+               v_miktar NUMERIC;
+           BEGIN
+               IF p_miktar IS NULL OR p_miktar <= 0 THEN
+                   RAISE EXCEPTION 'GECERSIZ_MIKTAR' USING ERRCODE = 'check_violation';
+               END IF;
+
+               SELECT v.id, v.miktar INTO v_id, v_miktar
+               FROM varliklar v WHERE v.user_id = p_user AND v.sembol = p_sembol
+               FOR UPDATE;
+
+               IF p_tip = 'SATIS' THEN
+                   IF v_id IS NULL OR v_miktar < p_miktar THEN
+                       RAISE EXCEPTION 'YETERSIZ_BAKIYE' USING ERRCODE = 'check_violation';
+                   END IF;
+                   UPDATE varliklar v SET miktar = v.miktar - p_miktar, guncel_fiyat = p_fiyat
+                   WHERE v.id = v_id
+                   RETURNING v.miktar, v.ort_maliyet INTO yeni_miktar, yeni_ort_maliyet;
+               ELSIF p_tip = 'ALIS' THEN
+                   INSERT INTO varliklar AS v (tur, sembol, miktar, ort_maliyet, guncel_fiyat, user_id)
+                   VALUES (p_tur, p_sembol, p_miktar, p_fiyat, p_fiyat, p_user)
+                   ON CONFLICT (user_id, sembol) DO UPDATE SET
+                       miktar = v.miktar + EXCLUDED.miktar,
+                       ort_maliyet = (v.miktar * v.ort_maliyet + EXCLUDED.miktar * EXCLUDED.ort_maliyet) / (v.miktar + EXCLUDED.miktar),
+                       guncel_fiyat = EXCLUDED.guncel_fiyat,
+                       tur = EXCLUDED.tur
+                   RETURNING v.miktar, v.ort_maliyet INTO yeni_miktar, yeni_ort_maliyet;
+               ELSE
+                   RAISE EXCEPTION 'GECERSIZ_ISLEM_TIPI' USING ERRCODE = 'check_violation';
+               END IF;
+
+               INSERT INTO islemler (sembol, islem_tipi, miktar, fiyat, tarih, user_id)
+               VALUES (p_sembol, p_tip, p_miktar, p_fiyat, CURRENT_DATE, p_user)
+               RETURNING id INTO yeni_islem_id;
+
+               RETURN NEXT;
+           END $$""",
+    ]),
+    (6, "İşlem defteri için pozisyon kontrol noktaları", [
+        """CREATE TABLE IF NOT EXISTS pozisyon_kontrol_noktalari (
+               user_id UUID NOT NULL, sembol TEXT NOT NULL, tarih DATE NOT NULL, islem_id INTEGER NOT NULL,
+               miktar NUMERIC(28,10) NOT NULL, ort_maliyet NUMERIC(28,10) NOT NULL,
+               PRIMARY KEY (user_id, sembol, tarih, islem_id)
+           )""",
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_sembol_tarih_id ON islemler (user_id, sembol, tarih, id)",
+    ]),
+    (7, "Günlük portföy değeri serisi ve işlem değişikliğinde geçersiz kılma", [
+        """CREATE TABLE IF NOT EXISTS portfoy_degeri (
+               user_id UUID NOT NULL, tarih DATE NOT NULL,
+               deger NUMERIC(20,2) NOT NULL, yatirim NUMERIC(20,2) NOT NULL,
+               PRIMARY KEY (user_id, tarih)
+           )""",
+        # Eklenen, düzenlenen ya da silinen işlemin tarihinden sonraki değerler bir sonraki okumada yeniden kurulur
+        """CREATE OR REPLACE FUNCTION portfoy_degeri_gecersiz_kil() RETURNS trigger
+           LANGUAGE plpgsql AS $$
+           BEGIN
+               IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                   DELETE FROM portfoy_degeri WHERE user_id = OLD.user_id AND tarih >= OLD.tarih;
+               END IF;
+               IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                   DELETE FROM portfoy_degeri WHERE user_id = NEW.user_id AND tarih >= NEW.tarih;
+               END IF;
+               RETURN NULL;
+           END $$""",
+        "DROP TRIGGER IF EXISTS trg_islemler_portfoy_degeri ON islemler",
+        """CREATE TRIGGER trg_islemler_portfoy_degeri AFTER INSERT OR UPDATE OR DELETE ON islemler
+           FOR EACH ROW EXECUTE FUNCTION portfoy_degeri_gecersiz_kil()""",
+    ]),
+    (8, "İşlem geçmişi sayfalamasında tip ve tarih filtreleri için indeksler", [
+        # Sembol filtresi ix_islemler_user_sembol_id, filtresiz sayfalar ix_islemler_user_id ile karşılanır
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_tip_id ON islemler (user_id, islem_tipi, id)",
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_tarih_id ON islemler (user_id, tarih, id)",
+    ]),
+    (9, "İşlem defteri sıralaması tarihsiz işlemleri de kapsasın", [
+        # Defter (COALESCE(tarih, DEFTER_BASI), id) ile okunur; v6 indeksinin yerini ifade indeksi alır
+        "CREATE INDEX IF NOT EXISTS ix_islemler_user_sembol_defter ON islemler (user_id, sembol, (COALESCE(tarih, DATE '1900-01-01')), id)",
+        "DROP INDEX IF EXISTS ix_islemler_user_sembol_tarih_id",
+    ]),
+    (10, "Tarihsiz işlemlerin değişikliği de portföy değeri serisini geçersiz kılsın", [
+        # NULL tarih defterde DEFTER_BASI'na sıralanır; o işlemin değişmesi serinin tamamını geçersiz kılar
+        """CREATE OR REPLACE FUNCTION portfoy_degeri_gecersiz_kil() RETURNS trigger
+           LANGUAGE plpgsql AS $$
+           BEGIN
+               IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                   DELETE FROM portfoy_degeri WHERE user_id = OLD.user_id AND tarih >= COALESCE(OLD.tarih, DATE '1900-01-01');
+               END IF;
+               IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                   DELETE FROM portfoy_degeri WHERE user_id = NEW.user_id AND tarih >= COALESCE(NEW.tarih, DATE '1900-01-01');
+               END IF;
+               RETURN NULL;
+           END $$""",
+    ]),
+    (11, "islem_kaydet kullanıcının seçtiği tarihi alsın", [
+        # Sunucu ile veritabanının günü farklı olabilir (saat dilimi, gece yarısı); tarih çağıran taraftan gelir
+        "DROP FUNCTION IF EXISTS islem_kaydet(UUID, TEXT, TEXT, NUMERIC, NUMERIC, TEXT)",
+        """CREATE OR REPLACE FUNCTION islem_kaydet(p_user UUID, p_sembol TEXT, p_tip TEXT, p_miktar NUMERIC, p_fiyat NUMERIC, p_tur TEXT, p_tarih DATE)
+           RETURNS TABLE (yeni_miktar NUMERIC, yeni_ort_maliyet NUMERIC, yeni_islem_id INTEGER)
+           LANGUAGE plpgsql AS $$
+           DECLARE
+               v_id INTEGER;
+               v_miktar NUMERIC;
+           BEGIN
+               IF p_miktar IS NULL OR p_miktar <= 0 THEN
+                   RAISE EXCEPTION 'GECERSIZ_MIKTAR' USING ERRCODE = 'check_violation';
+               END IF;
+
+               SELECT v.id, v.miktar INTO v_id, v_miktar
+               FROM varliklar v WHERE v.user_id = p_user AND v.sembol = p_sembol
+               FOR UPDATE;
+
+               IF p_tip = 'SATIS' THEN
+                   IF v_id IS NULL OR v_miktar < p_miktar THEN
+                       RAISE EXCEPTION 'YETERSIZ_BAKIYE' USING ERRCODE = 'check_violation';
+                   END IF;
+                   UPDATE varliklar v SET miktar = v.miktar - p_miktar, guncel_fiyat = p_fiyat
+                   WHERE v.id = v_id
+                   RETURNING v.miktar, v.ort_maliyet INTO yeni_miktar, yeni_ort_maliyet;
+               ELSIF p_tip = 'ALIS' THEN
+                   INSERT INTO varliklar AS v (tur, sembol, miktar, ort_maliyet, guncel_fiyat, user_id)
+                   VALUES (p_tur, p_sembol, p_miktar, p_fiyat, p_fiyat, p_user)
+                   ON CONFLICT (user_id, sembol) DO UPDATE SET
+                       miktar = v.miktar + EXCLUDED.miktar,
+                       ort_maliyet = (v.miktar * v.ort_maliyet + EXCLUDED.miktar * EXCLUDED.ort_maliyet) / (v.miktar + EXCLUDED.miktar),
+                       guncel_fiyat = EXCLUDED.guncel_fiyat,
+                       tur = EXCLUDED.tur
+                   RETURNING v.miktar, v.ort_maliyet INTO yeni_miktar, yeni_ort_maliyet;
+               ELSE
+                   RAISE EXCEPTION 'GECERSIZ_ISLEM_TIPI' USING ERRCODE = 'check_violation';
+               END IF;
+
+               INSERT INTO islemler (sembol, islem_tipi, miktar, fiyat, tarih, user_id)
+               VALUES (p_sembol, p_tip, p_miktar, p_fiyat, COALESCE(p_tarih, CURRENT_DATE), p_user)
+               RETURNING id INTO yeni_islem_id;
+
+               RETURN NEXT;
+           END $$""",
+    ]),
+]
+
+def sema_goclerini_uygula(conn):
+    # Aynı anda açılan süreçler göçleri iki kez uygulamasın diye oturum kilidi alınır
     cursor = conn.cursor()
-    
-    cursor.execute("CREATE TABLE IF NOT EXISTS varliklar (id SERIAL PRIMARY KEY, tur TEXT, sembol TEXT, miktar REAL, ort_maliyet REAL, guncel_fiyat REAL, user_id UUID)")
-    cursor.execute("CREATE TABLE IF NOT EXISTS islemler (id SERIAL PRIMARY KEY, sembol TEXT, islem_tipi TEXT, miktar REAL, fiyat REAL, tarih TEXT, user_id UUID)")
-    cursor.execute("CREATE TABLE IF NOT EXISTS hedefler (id SERIAL PRIMARY KEY, ad TEXT, tutar REAL, user_id UUID)")
-    cursor.execute("CREATE TABLE IF NOT EXISTS takip_listesi (sembol TEXT, isim TEXT, kisa_kod TEXT)")
-    
-    cursor.execute("SELECT count(*) FROM takip_listesi")
-    if cursor.fetchone()[0] == 0:
-        d = [
-            ("USDTRY=X", "DOLAR/TL", "USD"), 
-            ("EURTRY=X", "EURO/TL", "EUR"), 
-            ("GRAM-ALTIN", "GRAM ALTIN", "GAU"), 
-            ("GRAM-GUMUS", "GRAM GÜMÜŞ", "GÜMÜŞ"),
-            ("GRAM-PLATIN", "GRAM PLATİN", "PLATİN"),
-            ("GC=F", "ONS ALTIN", "ONS-ALTIN"),
-            ("SI=F", "ONS GÜMÜŞ", "ONS-GÜMÜŞ"),
-            ("PL=F", "ONS PLATİN", "ONS-PLATİN"),
-            ("XU100.IS", "BIST 100", "BIST"), 
-            ("BTC-USD", "BITCOIN", "BTC")
-        ]
-        cursor.executemany("INSERT INTO takip_listesi VALUES (%s,%s,%s)", d)
-    
+    cursor.execute("CREATE TABLE IF NOT EXISTS sema_surumu (surum INTEGER PRIMARY KEY, aciklama TEXT, uygulama TIMESTAMPTZ DEFAULT now())")
     conn.commit()
-    conn.close()
+    cursor.execute("SELECT pg_advisory_lock(hashtext('portfoy_sema_gocu'))")
+    try:
+        cursor.execute("SELECT COALESCE(max(surum), 0) FROM sema_surumu")
+        mevcut = cursor.fetchone()[0]
+        for surum, aciklama, adimlar in SEMA_GOCLERI:
+            if surum <= mevcut: continue
+            for sql in adimlar:
+                cursor.execute(sql)
+            cursor.execute("INSERT INTO sema_surumu (surum, aciklama) VALUES (%s, %s)", (surum, aciklama))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(hashtext('portfoy_sema_gocu'))")
+        conn.commit()
+
+@st.cache_resource 
+def init_db():
+    with db_baglantisi() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute("CREATE TABLE IF NOT EXISTS varliklar (id SERIAL PRIMARY KEY, tur TEXT, sembol TEXT, miktar REAL, ort_maliyet REAL, guncel_fiyat REAL, user_id UUID)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS islemler (id SERIAL PRIMARY KEY, sembol TEXT, islem_tipi TEXT, miktar REAL, fiyat REAL, tarih TEXT, user_id UUID)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS hedefler (id SERIAL PRIMARY KEY, ad TEXT, tutar REAL, user_id UUID)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS takip_listesi (sembol TEXT, isim TEXT, kisa_kod TEXT)")
+        
+        cursor.execute("SELECT count(*) FROM takip_listesi")
+        if cursor.fetchone()[0] == 0:
+            d = [
+                ("USDTRY=X", "DOLAR/TL", "USD"), 
+                ("EURTRY=X", "EURO/TL", "EUR"), 
+                ("GRAM-ALTIN", "GRAM ALTIN", "GAU"), 
+                ("GRAM-GUMUS", "GRAM GÜMÜŞ", "GÜMÜŞ"),
+                ("GRAM-PLATIN", "GRAM PLATİN", "PLATİN"),
+                ("GC=F", "ONS ALTIN", "ONS-ALTIN"),
+                ("SI=F", "ONS GÜMÜŞ", "ONS-GÜMÜŞ"),
+                ("PL=F", "ONS PLATİN", "ONS-PLATİN"),
+                ("XU100.IS", "BIST 100", "BIST"), 
+                ("BTC-USD", "BITCOIN", "BTC")
+            ]
+            cursor.executemany("INSERT INTO takip_listesi VALUES (%s,%s,%s)", d)
+        
+        conn.commit()
+        sema_goclerini_uygula(conn)
     
+izleme_bolumu("veritabanı hazırlığı")
 init_db()
 
+# =============================================================================
+# İŞLEM DEFTERİ MOTORU (KONTROL NOKTALI ORTALAMA MALİYET HESABI)
+# =============================================================================
+# Defter (tarih, id) sırasıyla oynatılır; her KONTROL_NOKTASI_ARALIGI işlemde bir pozisyon anlık görüntüsü
+# saklanır. Silme, düzenleme ve geriye tarihli eklemede yalnızca etkilenen noktadan önceki en yakın
+# kontrol noktasından itibaren yeniden hesaplanır.
+KONTROL_NOKTASI_ARALIGI = 500
+DEFTER_BASI = (date(1900, 1, 1), 0)  # islem_defteri_sonrasi tarihsiz işlemleri de bu tarihe sıralar
+
+def defter_anahtari(tarih, islem_id):
+    return (tarih or DEFTER_BASI[0], islem_id)
+
+def pozisyon_ilerlet(miktar0, ort0, tipler, miktarlar, fiyatlar):
+    # Bir işlem dilimini vektörel uygular: (son miktar, son ortalama maliyet, dilimdeki en düşük miktar).
+    # Ortalama maliyet yalnızca alışlarda değişir: A_k = a_k * A_(k-1) + b_k. Pozisyon kapalıyken
+    # yapılan alış maliyeti sıfırdan başlatır (a_k = 0).
+    al = tipler == "ALIS"
+    isaretli = np.where(al, miktarlar, -miktarlar)
+    q_sonra = miktar0 + np.cumsum(isaretli)
+    q_once = q_sonra - isaretli
+    sifirdan = al & (q_once <= 0)
+    payda = np.where(q_sonra > 0, q_sonra, 1.0)
+    a = np.where(al, np.where(sifirdan, 0.0, q_once / payda), 1.0)
+    b = np.where(al, np.where(sifirdan, fiyatlar, miktarlar * fiyatlar / payda), 0.0)
+
+    sifirlar = np.flatnonzero(a == 0)
+    bas = sifirlar[-1] if len(sifirlar) else 0
+    log_a = np.log(np.where(a[bas:] > 0, a[bas:], 1.0))
+    birikimli = np.cumsum(log_a)
+    # exp(S_n - S_j) = a_(j+1) * ... * a_n; üs hiçbir zaman pozitif olmadığı için taşma olmaz
+    ort = float(np.dot(b[bas:], np.exp(birikimli[-1] - birikimli)))
+    if not len(sifirlar):
+        ort += ort0 * float(np.exp(birikimli[-1]))
+    return float(q_sonra[-1]), ort, float(q_sonra.min())
+
+def pozisyonu_yeniden_hesapla(cursor, user_id, sembol, baslangic=None, dogrula=False):
+    # baslangic=(tarih, islem_id): bu noktada ya da sonrasında değişen defter için yeniden hesaplama.
+    # baslangic=None tüm defteri baştan kurar. Pozisyon satırı önce kilitlenir: eşzamanlı islem_kaydet
+    # ya bu yeniden hesaplamadan önce biter (ve defterde görünür) ya da bunun commit'ini bekler.
+    cursor.execute("SELECT 1 FROM varliklar WHERE user_id=%s AND sembol=%s FOR UPDATE", (user_id, sembol))
+    anahtar = baslangic or DEFTER_BASI
+    cursor.execute("DELETE FROM pozisyon_kontrol_noktalari WHERE user_id=%s AND sembol=%s AND (tarih, islem_id) >= (%s, %s)", (user_id, sembol, *anahtar))
+    nokta = hazir_sorgu(cursor, "kontrol_noktasi_once", (user_id, sembol, *anahtar)).fetchone()
+    if nokta:
+        bas_anahtar, miktar, ort = (nokta[0], nokta[1]), nokta[2], nokta[3]
+    else:
+        bas_anahtar, miktar, ort = DEFTER_BASI, 0.0, 0.0
+
+    satirlar = hazir_sorgu(cursor, "islem_defteri_sonrasi", (user_id, sembol, *bas_anahtar)).fetchall()
+    en_dusuk = miktar
+    if satirlar:
+        tarihler, idler, tipler, miktarlar, fiyatlar = zip(*satirlar)
+        tipler = np.array(tipler)
+        miktarlar = np.array(miktarlar, dtype=float)
+        fiyatlar = np.array(fiyatlar, dtype=float)
+        noktalar = []
+        for i in range(0, len(satirlar), KONTROL_NOKTASI_ARALIGI):
+            j = i + KONTROL_NOKTASI_ARALIGI
+            miktar, ort, dilim_en_dusuk = pozisyon_ilerlet(miktar, ort, tipler[i:j], miktarlar[i:j], fiyatlar[i:j])
+            en_dusuk = min(en_dusuk, dilim_en_dusuk)
+            if j <= len(satirlar):
+                noktalar.append((user_id, sembol, tarihler[j - 1], idler[j - 1], miktar, ort))
+        if noktalar:
+            execute_values(cursor, "INSERT INTO pozisyon_kontrol_noktalari (user_id, sembol, tarih, islem_id, miktar, ort_maliyet) VALUES %s ON CONFLICT DO NOTHING", noktalar)
+
+    if dogrula and en_dusuk < -1e-9:
+        raise ValueError("YETERSIZ_BAKIYE")
+    if miktar <= 0:
+        miktar, ort = 0.0, 0.0
+    cursor.execute("UPDATE varliklar SET miktar=%s, ort_maliyet=%s WHERE sembol=%s AND user_id=%s", (miktar, ort, sembol, user_id))
+    return miktar, ort
+
+def islem_sil(cursor, user_id, islem_id):
+    cursor.execute("DELETE FROM islemler WHERE id=%s AND user_id=%s RETURNING sembol, tarih", (islem_id, user_id))
+    silinen = cursor.fetchone()
+    if silinen:
+        pozisyonu_yeniden_hesapla(cursor, user_id, silinen[0], defter_anahtari(silinen[1], islem_id))
+
+def islem_duzenle(cursor, user_id, islem_id, miktar, fiyat, tarih):
+    cursor.execute("SELECT sembol, tarih FROM islemler WHERE id=%s AND user_id=%s", (islem_id, user_id))
+    eski = cursor.fetchone()
+    if not eski: return
+    cursor.execute("UPDATE islemler SET miktar=%s, fiyat=%s, tarih=%s WHERE id=%s", (miktar, fiyat, tarih, islem_id))
+    pozisyonu_yeniden_hesapla(cursor, user_id, eski[0], min(defter_anahtari(eski[1], islem_id), defter_anahtari(tarih, islem_id)), dogrula=True)
+
+def gecmis_tarihli_islem_ekle(cursor, user_id, sembol, tip, miktar, fiyat, tarih, tur):
+    cursor.execute("INSERT INTO varliklar (tur, sembol, miktar, ort_maliyet, guncel_fiyat, user_id) VALUES (%s,%s,0,0,%s,%s) ON CONFLICT (user_id, sembol) DO NOTHING", (tur, sembol, fiyat, user_id))
+    cursor.execute("INSERT INTO islemler (sembol, islem_tipi, miktar, fiyat, tarih, user_id) VALUES (%s,%s,%s,%s,%s,%s) RETURNING id", (sembol, tip, miktar, fiyat, tarih, user_id))
+    yeni_id = cursor.fetchone()[0]
+    return pozisyonu_yeniden_hesapla(cursor, user_id, sembol, defter_anahtari(tarih, yeni_id), dogrula=True)
+
+# İşlem geçmişi id'ye göre azalan sırada anahtar (keyset) sayfalamasıyla okunur: her sayfa bir önceki
+# sayfanın son id'sinden devam eder, OFFSET kullanılmaz. Sayım SAYIM_SINIRI'nda kesilir; böylece bellek
+# ve süre defterin boyutuna değil sayfa boyutuna bağlı kalır.
+SAYIM_SINIRI = 10000
+
+def _islem_filtresi(user_id, sembol=None, tip=None, baslangic=None, bitis=None):
+    kosullar, parametreler = ["user_id = %s"], [user_id]
+    for kosul, deger in (("sembol = %s", sembol), ("islem_tipi = %s", tip), ("tarih >= %s", baslangic), ("tarih <= %s", bitis)):
+        if deger:
+            kosullar.append(kosul)
+            parametreler.append(deger)
+    return " AND ".join(kosullar), parametreler
+
+def islem_sayfasi(conn, user_id, filtre, once_id=None, boyut=50):
+    # once_id'den küçük id'li en yeni `boyut` işlemi ve sonraki sayfanın olup olmadığını döndürür
+    kosul, parametreler = _islem_filtresi(user_id, **filtre)
+    if once_id is not None:
+        kosul += " AND id < %s"
+        parametreler.append(once_id)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT id, tarih, sembol, islem_tipi, miktar, fiyat FROM islemler WHERE {kosul} ORDER BY id DESC LIMIT %s", (*parametreler, boyut + 1))
+        df = pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+    return df.head(boyut), len(df) > boyut
+
+def islem_sayisi(conn, user_id, filtre):
+    kosul, parametreler = _islem_filtresi(user_id, **filtre)
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM (SELECT 1 FROM islemler WHERE {kosul} LIMIT %s) t", (*parametreler, SAYIM_SINIRI + 1))
+        return cursor.fetchone()[0]
+
 # =============================================================================
 # VERİ ÇEKME VE HESAPLAMA MOTORU (FİZİKİ ALTIN DAHİL)
 # =============================================================================
-@st.cache_data(ttl=60)
-def veri_getir(sembol):
-    try:
-        data = yf.Ticker(sembol).history(period="5d")
-        if not data.empty:
-            return float(data['Close'].iloc[-1])
-        return 0.0
-    except:
-        return 0.0
+# Sidebar hesaplamalarının her zaman ihtiyaç duyduğu temel girdiler
+ONS_GRAM = 31.1035  # bir troy onsun gram karşılığı; tüm ons -> gram dönüşümleri bunu kullanır
+TEMEL_GIRDILER = ("USDTRY=X", "GC=F", "SI=F", "PL=F")
+
+# Bantta kullanılan eski gram kodlarının TURETILMIS_VARLIKLAR karşılıkları
+BANT_TAKMA_ADLARI = {"GRAM_ALTIN": "GRAM-ALTIN", "GRAM_GUMUS": "GRAM-GUMUS", "GRAM_PLATIN": "GRAM-PLATIN"}
+
+def temel_sembol(kod):
+    # Türetilmiş kodları (GRAM_ALTIN, CEYREK-ALTIN, GRAM-GUMUS...) Yahoo'daki ons sembolüne indirger.
+    # Eşleşme tam koddur; ALTIN.IS gibi borsa sembolleri olduğu gibi kotasyona gider.
+    turetilmis = TURETILMIS_VARLIKLAR.get(BANT_TAKMA_ADLARI.get(kod, kod))
+    if turetilmis is None: return kod
+    temel = turetilmis[1]
+    if temel == "TRY": return None
+    return "GC=F" if temel == "SERBEST-ALTIN" else temel
+
+# Dış veri çağrıları tek katmandan geçer: süreç geneli jeton kovası istek hızını sınırlar, sunucu başına devre
+# kesici art arda hatalardan sonra çağrıları bir süre hiç denemeden reddeder, geçici hatalar jitter'lı üstel
+# geri çekilmeyle yeniden denenir. Çağıran taraf VeriAlinamadi alır ve son bilinen değerle devam eder.
+YAHOO_SUNUCUSU = "finance.yahoo.com"
+
+class VeriAlinamadi(Exception):
+    pass
+
+class JetonKovasi:
+    def __init__(self, hiz, kapasite):
+        self.hiz = hiz              # saniyede eklenen jeton
+        self.kapasite = kapasite    # anlık patlama sınırı
+        self._jeton = float(kapasite)
+        self._zaman = time.monotonic()
+        self._kilit = threading.Lock()
+
+    def al(self, azami_bekleme):
+        # Jeton azami_bekleme içinde alınamayacaksa beklemeden False döner
+        bitis = time.monotonic() + azami_bekleme
+        while True:
+            with self._kilit:
+                simdi = time.monotonic()
+                self._jeton = min(self.kapasite, self._jeton + (simdi - self._zaman) * self.hiz)
+                self._zaman = simdi
+                if self._jeton >= 1:
+                    self._jeton -= 1
+                    return True
+                bekle = (1 - self._jeton) / self.hiz
+            if simdi + bekle > bitis:
+                return False
+            time.sleep(bekle)
+
+class DevreKesici:
+    # kapalı -> (esik ardışık hata) -> açık -> (bekleme dolunca) yarı açık: tek deneme.
+    # Deneme başarılıysa kapanır, başarısızsa bekleme iki katına çıkarak yeniden açılır.
+    def __init__(self, esik=5, bekleme=30, azami_bekleme=300):
+        self.esik = esik
+        self.ilk_bekleme = bekleme
+        self.azami_bekleme = azami_bekleme
+        self._kilit = threading.Lock()
+        self._ardisik_hata = 0
+        self._acilis = None
+        self._bekleme = bekleme
+        self._deneme_suruyor = False
+
+    @property
+    def durum(self):
+        if self._acilis is None: return "kapali"
+        if time.monotonic() - self._acilis < self._bekleme: return "acik"
+        return "yari_acik"
+
+    def izin_var_mi(self):
+        with self._kilit:
+            durum = self.durum
+            if durum == "kapali": return True
+            if durum == "acik" or self._deneme_suruyor: return False
+            self._deneme_suruyor = True
+            return True
+
+    def basarili(self):
+        with self._kilit:
+            self._ardisik_hata = 0
+            self._acilis = None
+            self._bekleme = self.ilk_bekleme
+            self._deneme_suruyor = False
+
+    def basarisiz(self):
+        with self._kilit:
+            self._ardisik_hata += 1
+            if self._deneme_suruyor:
+                self._bekleme = min(self._bekleme * 2, self.azami_bekleme)
+                self._acilis = time.monotonic()
+                self._deneme_suruyor = False
+            elif self._acilis is None and self._ardisik_hata >= self.esik:
+                self._acilis = time.monotonic()
+
+class VeriCekici:
+    def __init__(self, hiz=8, kapasite=20, deneme=3, taban=0.5, tavan=8.0):
+        self.kova = JetonKovasi(hiz, kapasite)
+        self.deneme = deneme
+        self.taban = taban
+        self.tavan = tavan
+        self._devreler = {}
+        self._kilit = threading.Lock()
+
+    def devre(self, sunucu):
+        with self._kilit:
+            return self._devreler.setdefault(sunucu, DevreKesici())
+
+    def cagir(self, sunucu, islev, bekleme=2.0):
+        # islev argümansız çağrılır; bekleme jeton için en fazla kaç saniye beklenebileceğidir.
+        # Ekranı çizen çağrılar kısa, arka plandaki toplu işler uzun bekleme kullanır.
+        devre = self.devre(sunucu)
+        hata = None
+        for deneme in range(self.deneme):
+            if not devre.izin_var_mi():
+                IZLEYICI.say("dis_cagri", sunucu=sunucu, sonuc="devre_acik")
+                raise VeriAlinamadi(f"{sunucu}: devre açık") from hata
+            if not self.kova.al(bekleme):
+                IZLEYICI.say("dis_cagri", sunucu=sunucu, sonuc="hiz_siniri")
+                raise VeriAlinamadi(f"{sunucu}: hız sınırı") from hata
+            try:
+                sonuc = islev()
+            except Exception as e:
+                hata = e
+                devre.basarisiz()
+                IZLEYICI.say("dis_cagri", sunucu=sunucu, sonuc="hata")
+                if deneme + 1 < self.deneme:
+                    # Tam jitter: aynı anda hata alan istekler aynı anda yeniden denemesin
+                    time.sleep(random.uniform(0, min(self.tavan, self.taban * 2 ** deneme)))
+                continue
+            devre.basarili()
+            IZLEYICI.say("dis_cagri", sunucu=sunucu, sonuc="basarili")
+            return sonuc
+        raise VeriAlinamadi(f"{sunucu}: {hata}") from hata
+
+@st.cache_resource
+def veri_cekici():
+    return VeriCekici(hiz=float(st.secrets.get("YAHOO_ISTEK_HIZI", 8)))
+
+# Arka plan iş parçacıkları da aynı örneği kullanır (st.cache_resource yalnızca betik iş parçacığında çağrılır)
+VERI_CEKICI = veri_cekici()
+
+def toplu_fiyat_indir(semboller):
+    # Tek yf.download isteğiyle tüm sembollerin son ve bir önceki kapanışını döndürür: {sembol: (son, onceki)}.
+    # yfinance sembol hatalarını yutup boş kolon döndürür. Hiçbir sembol gelmemesi (ör. tek başına indirilen
+    # geçersiz/kotasyondan çıkmış sembol) sunucu hatası değildir: yeniden denenmez, devre kesiciye sayılmaz.
+    def indir():
+        with span("http", "yfinance.download"):
+            data = yf.download(list(semboller), period="5d", progress=False, threads=True)
+        sonuc = {}
+        kapanis = data['Close'] if data is not None and not data.empty else pd.DataFrame()
+        if isinstance(kapanis, pd.Series):
+            kapanis = kapanis.to_frame(semboller[0])
+        for s in semboller:
+            if s not in kapanis.columns: continue
+            seri = kapanis[s].dropna()
+            if seri.empty: continue
+            son = float(seri.iloc[-1])
+            onceki = float(seri.iloc[-2]) if len(seri) > 1 else son
+            sonuc[s] = (son, onceki)
+        return sonuc
+    sonuc = VERI_CEKICI.cagir(YAHOO_SUNUCUSU, indir)
+    if not sonuc:
+        IZLEYICI.say("dis_cagri", sunucu=YAHOO_SUNUCUSU, sonuc="bos")
+        raise VeriAlinamadi("yfinance.download: hiçbir sembol için veri dönmedi")
+    return sonuc
 
-def fiyatlari_hesapla(serbest_altin_girdisi):
-    usd = veri_getir("USDTRY=X")
-    if usd == 0: usd = 1.0 
+# =============================================================================
+# ORTAK FİYAT DEPOSU (TÜM OTURUMLAR TEK DEPOYU PAYLAŞIR)
+# =============================================================================
+class FiyatDeposu:
+    # Sembol başına saklanan son fiyatlar. Süresi dolan fiyat hemen döndürülür ve
+    # arka planda yenilenir; aynı sembol için aynı anda tek indirme yapılır.
+    # İndirme başarısız olursa son bilinen fiyat korunur ve sembol bayat işaretlenir; bellekte hiç kaydı
+    # olmayan semboller için yedek(semboller) -> {sembol: (son, onceki)} (diskteki son kapanışlar) kullanılır.
+    HATA_BEKLEME = 30
+
+    def __init__(self, varsayilan_ttl=60, yedek=None):
+        self.varsayilan_ttl = varsayilan_ttl
+        self.yedek = yedek
+        self._kilit = threading.Lock()
+        self._kayitlar = {}     # sembol -> (son, onceki, zaman)
+        self._ttl = {}          # sembol -> saniye
+        self._hatalar = {}      # sembol -> son başarısız deneme zamanı
+        self._bekleyenler = {}  # sembol -> threading.Event (süren indirme)
+
+    def ttl_belirle(self, sembol, saniye):
+        with self._kilit:
+            self._ttl[sembol] = saniye
+
+    def _ttl_al(self, sembol):
+        if sembol in self._ttl: return self._ttl[sembol]
+        if sembol.endswith("-USD"): return 30
+        return self.varsayilan_ttl
+
+    def al(self, semboller):
+        simdi = time.time()
+        sonuc, eksik, beklenecek = {}, [], []
+        benim_eksik, benim_bayat = [], []
+        with self._kilit:
+            for s in semboller:
+                kayit = self._kayitlar.get(s)
+                onbellek_sonucu("fiyat", kayit is not None)
+                if kayit:
+                    sonuc[s] = (kayit[0], kayit[1])
+                    if (simdi - kayit[2] > self._ttl_al(s) and s not in self._bekleyenler
+                            and simdi - self._hatalar.get(s, 0) > self.HATA_BEKLEME):
+                        benim_bayat.append(s)
+                elif s in self._bekleyenler:
+                    eksik.append(s)
+                    beklenecek.append(self._bekleyenler[s])
+                elif simdi - self._hatalar.get(s, 0) > self.HATA_BEKLEME:
+                    eksik.append(s)
+                    benim_eksik.append(s)
+            olay_eksik, olay_bayat = threading.Event(), threading.Event()
+            for s in benim_eksik: self._bekleyenler[s] = olay_eksik
+            for s in benim_bayat: self._bekleyenler[s] = olay_bayat
+
+        if benim_bayat:
+            threading.Thread(target=self._yenile, args=(benim_bayat, olay_bayat), daemon=True).start()
+        if benim_eksik:
+            self._yenile(benim_eksik, olay_eksik)
+        for olay in beklenecek:
+            olay.wait(timeout=15)
+
+        if eksik:
+            with self._kilit:
+                for s in eksik:
+                    if s in self._kayitlar:
+                        sonuc[s] = self._kayitlar[s][:2]
+        return sonuc
+
+    def _yenile(self, semboller, olay):
+        veriler, yedekler = {}, {}
+        try:
+            veriler = toplu_fiyat_indir(tuple(semboller))
+        except VeriAlinamadi:
+            pass
+        finally:
+            kayitsiz = [s for s in semboller if s not in veriler and s not in self._kayitlar]
+            if kayitsiz and self.yedek:
+                try:
+                    yedekler = self.yedek(kayitsiz)
+                except Exception:
+                    pass
+            with self._kilit:
+                zaman = time.time()
+                for s in semboller:
+                    if s in veriler:
+                        self._kayitlar[s] = (*veriler[s], zaman)
+                        self._hatalar.pop(s, None)
+                    else:
+                        if s in yedekler:
+                            self._kayitlar[s] = (*yedekler[s], 0.0)
+                        self._hatalar[s] = zaman
+                    if self._bekleyenler.get(s) is olay:
+                        del self._bekleyenler[s]
+            olay.set()
+
+    def canli_guncelle(self, sembol, son, onceki=None):
+        # Akıştan gelen son işlem fiyatı; kaydı taze sayıldığı için sembol için indirme yapılmaz
+        with self._kilit:
+            kayit = self._kayitlar.get(sembol)
+            if not onceki:
+                onceki = kayit[1] if kayit else son
+            self._kayitlar[sembol] = (son, onceki, time.time())
+            self._hatalar.pop(sembol, None)
+
+    def bayat_semboller(self, semboller=None):
+        # Son yenilemesi başarısız olduğu için son bilinen (ya da diskteki) değeri gösterilen semboller
+        with self._kilit:
+            bayat = {s for s in self._hatalar if s in self._kayitlar}
+        return bayat if semboller is None else bayat & set(semboller)
+
+@st.cache_resource
+def fiyat_deposu():
+    return FiyatDeposu(yedek=gecmis_deposu().son_kapanislar)
+
+def fiyat_anlik_goruntu(kodlar=()):
+    # Sayfanın ihtiyaç duyduğu tüm kodların birleşimini ortak depodan tek seferde okur
+    semboller = set(TEMEL_GIRDILER)
+    for kod in kodlar:
+        s = temel_sembol(kod)
+        if s: semboller.add(s)
+    canli_kotasyonlar().izle(semboller)
+    return fiyat_deposu().al(sorted(semboller))
+
+def bayat_kodlar(kodlar):
+    # Gösterilen değeri son bilinen fiyattan gelen kodlar; TL'ye kurla çevrilen türetilmiş kodlar kur bayatsa da bayattır
+    bayat = fiyat_deposu().bayat_semboller()
+    if not bayat: return set()
+    sonuc = set()
+    for kod in kodlar:
+        k = BANT_TAKMA_ADLARI.get(kod, kod)
+        if temel_sembol(k) in bayat or (k in TURETILMIS_VARLIKLAR and "USDTRY=X" in bayat):
+            sonuc.add(kod)
+    return sonuc
+
+def veri_getir(sembol, anlik=None):
+    if anlik is not None and sembol in anlik:
+        return anlik[sembol][0]
+    return fiyat_deposu().al([sembol]).get(sembol, (0.0, 0.0))[0]
+
+def fiyatlari_hesapla(serbest_altin_girdisi, anlik):
+    # Kur okunamazsa 1.0 gibi uydurma bir değerle değil NaN ile devam edilir; değerleme NaN fiyatları
+    # veritabanındaki son guncel_fiyat ile doldurur, yenileyici de NaN fiyatı yazmaz
+    usd = veri_getir("USDTRY=X", anlik)
+    if not usd > 0: usd = float("nan")
     
-    ons_altin = veri_getir("GC=F")
-    ons_gumus = veri_getir("SI=F")
-    ons_platin = veri_getir("PL=F")
+    ons_altin = veri_getir("GC=F", anlik)
+    ons_gumus = veri_getir("SI=F", anlik)
+    ons_platin = veri_getir("PL=F", anlik)
 
-    has_altin_banka = (ons_altin * usd) / 31.1035
-    gumus_tl = (ons_gumus * usd) / 31.1035
-    platin_tl = (ons_platin * usd) / 31.1035
+    has_altin_banka = (ons_altin * usd) / ONS_GRAM
+    gumus_tl = (ons_gumus * usd) / ONS_GRAM
+    platin_tl = (ons_platin * usd) / ONS_GRAM
 
     try:
         if serbest_altin_girdisi:
@@ -260,21 +1247,1105 @@ def fiyatlari_hesapla(serbest_altin_girdisi):
 
     return usd, has_altin_banka, has_altin_serbest, gumus_tl, platin_tl
 
-def guncel_fiyat_bul(sembol, fiyatlar):
-    usd, has_altin_banka, has_altin_serbest, gumus_tl, platin_tl = fiyatlar
-    
-    if sembol == "GRAM-ALTIN": return has_altin_banka
-    elif sembol == "GRAM-ALTIN-S": return has_altin_serbest
-    elif sembol == "GRAM-ALTIN-22": return has_altin_serbest * 0.916
-    elif sembol == "GRAM-ALTIN-22-B": return has_altin_serbest * 0.910
-    elif sembol == "GRAM-ALTIN-14": return has_altin_serbest * 0.585
-    elif sembol == "CEYREK-ALTIN": return has_altin_serbest * 1.6065
-    elif sembol == "YARIM-ALTIN": return has_altin_serbest * 3.2130
-    elif sembol == "TAM-ALTIN": return has_altin_serbest * 6.4260
-    elif sembol == "ATA-ALTIN": return has_altin_serbest * 6.6080
-    elif sembol == "GRAM-GUMUS": return gumus_tl
-    elif sembol == "GRAM-PLATIN": return platin_tl 
-    else: return veri_getir(sembol)
+# =============================================================================
+# CANLI KOTASYON AKIŞI (YAHOO WEBSOCKET, TÜM OTURUMLARA ORTAK SON İŞLEM TABLOSU)
+# =============================================================================
+# Aktif oturumların fiyat anlık görüntüsünde istediği tüm semboller tek bir websocket aboneliğinde toplanır.
+# Gelen her işlem bellekteki son işlem tablosuna ve FiyatDeposu'na yazılır; akıştan beslenen semboller için
+# periyodik indirme yapılmaz. IZLEME_SURESI boyunca hiçbir oturumun istemediği sembollerin aboneliği bırakılır.
+# CANLI_AKIS_URL ile başka bir sunucuya (ör. benchmarks/canli_tekrar.py) bağlanılabilir; CANLI_AKIS=false kapatır.
+class CanliKotasyonlar:
+    IZLEME_SURESI = 600
+    TEMIZLIK_ARALIGI = 60
+
+    def __init__(self, depo, url=None):
+        self.depo = depo
+        self.url = url
+        self._kilit = threading.Lock()
+        self._izlenen = {}        # sembol -> son istenme zamanı
+        self._abone = set()
+        self._son_islemler = {}   # sembol -> (fiyat, onceki, zaman)
+        self._ws = None
+        self._son_mesaj = 0.0
+        self._son_temizlik = time.time()
+        self._baslat = threading.Event()
+        self._dur = threading.Event()
+        self.bagli = False
+        self._is = threading.Thread(target=self._dongu, daemon=True)
+        self._is.start()
+
+    def durdur(self):
+        self._dur.set()
+        self._baslat.set()
+        with self._kilit:
+            ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()  # listen() bağlantı kapanınca döner
+            except Exception:
+                pass
+        self._is.join(timeout=5)
+
+    def izle(self, semboller):
+        simdi = time.time()
+        with self._kilit:
+            for s in semboller:
+                self._izlenen[s] = simdi
+            yeni = set(semboller) - self._abone
+            birakilacak = set()
+            if simdi - self._son_temizlik > self.TEMIZLIK_ARALIGI:
+                self._son_temizlik = simdi
+                birakilacak = {s for s, t in self._izlenen.items() if simdi - t > self.IZLEME_SURESI}
+                for s in birakilacak: del self._izlenen[s]
+            ws = self._ws
+        self._baslat.set()
+        if ws is None: return
+        try:
+            if yeni:
+                ws.subscribe(sorted(yeni))
+                with self._kilit: self._abone |= yeni
+            if birakilacak & self._abone:
+                ws.unsubscribe(sorted(birakilacak & self._abone))
+                with self._kilit: self._abone -= birakilacak
+        except Exception:
+            pass  # bağlantı koptuysa dinleme döngüsü yeniden bağlanıp tüm listeye abone olur
+
+    def son_islemler(self):
+        with self._kilit:
+            return dict(self._son_islemler)
+
+    def akiyor(self):
+        # Bağlı ve son CANLI_AKIS_SESSIZLIK saniyede en az bir işlem gelmiş
+        return self.bagli and time.time() - self._son_mesaj < CANLI_AKIS_SESSIZLIK
+
+    def _mesaj(self, veri):
+        sembol, fiyat = veri.get("id"), veri.get("price")
+        if not sembol or not fiyat: return
+        fiyat = float(fiyat)
+        onceki = veri.get("previous_close")
+        if not onceki and veri.get("change") is not None:
+            onceki = fiyat - float(veri["change"])
+        onceki = float(onceki) if onceki else None
+        with self._kilit:
+            self._son_mesaj = time.time()
+            self._son_islemler[sembol] = (fiyat, onceki, self._son_mesaj)
+        self.depo.canli_guncelle(sembol, fiyat, onceki)
+        IZLEYICI.say("canli_mesaj")
+
+    def _baglan_ve_dinle(self):
+        ws = yf.WebSocket(url=self.url, verbose=False) if self.url else yf.WebSocket(verbose=False)
+        with self._kilit:
+            semboller = sorted(self._izlenen)
+        ws.subscribe(semboller)
+        with self._kilit:
+            self._ws, self._abone = ws, set(semboller)
+        self.bagli = True
+        try:
+            ws.listen(self._mesaj)
+        finally:
+            self.bagli = False
+            with self._kilit:
+                self._ws, self._abone = None, set()
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _dongu(self):
+        # İlk sembol istenene kadar bağlanılmaz; kopmalarda jitter'lı üstel bekleme ile yeniden bağlanılır
+        self._baslat.wait()
+        bekleme = 1.0
+        while not self._dur.is_set():
+            baslangic = time.time()
+            try:
+                self._baglan_ve_dinle()
+            except Exception:
+                IZLEYICI.say("dis_cagri", sunucu=urlparse(self.url or "wss://streamer.finance.yahoo.com").hostname, sonuc="hata")
+            if time.time() - baslangic > 60:
+                bekleme = 1.0
+            self._dur.wait(random.uniform(bekleme / 2, bekleme))
+            bekleme = min(bekleme * 2, 120)
+
+class _KapaliAkis:
+    # Akış kapalıyken ya da yfinance sürümü websocket desteklemiyorken aynı arayüz
+    bagli = False
+    def izle(self, semboller): pass
+    def son_islemler(self): return {}
+    def akiyor(self): return False
+    def durdur(self): pass
+
+@st.cache_resource(on_release=arka_plani_durdur)
+def canli_kotasyonlar():
+    if not st.secrets.get("CANLI_AKIS", True) or not hasattr(yf, "WebSocket"):
+        return _KapaliAkis()
+    return CanliKotasyonlar(fiyat_deposu(), st.secrets.get("CANLI_AKIS_URL"))
+
+def _canli_aralik():
+    return CANLI_AKIS_SANIYE if canli_kotasyonlar().akiyor() else CANLI_YENILEME_SANIYE
+
+def canli_yenileme_araligi():
+    # run_every yalnızca tam çalıştırmada okunur; hızlı aralık yalnızca akış veri getirirken seçilir ve oturuma yazılır
+    aralik = st.session_state.canli_aralik = _canli_aralik()
+    return aralik
+
+def canli_araligi_denetle():
+    # Fragment tikinde akış başladıysa ya da koptu/sustuysa run_every'nin yeniden okunması için bir tam çalıştırma
+    if st.session_state.get("canli_aralik", CANLI_YENILEME_SANIYE) != _canli_aralik():
+        st.rerun()
+
+def canli_cizim(anahtar, uret):
+    # Akış veri getirmiyorken son çizim aynen yeniden basılır; yeniden hesaplama CANLI_YENILEME_SANIYE'de
+    # bir yapılır. Tam çalıştırma canli_cizimler'i boşalttığı için (liste düzenleme vb.) her zaman yeniden hesaplar.
+    cizimler = st.session_state.setdefault("canli_cizimler", {})
+    kayit = cizimler.get(anahtar)
+    if kayit is None or canli_kotasyonlar().akiyor() or time.time() - kayit[0] >= CANLI_YENILEME_SANIYE:
+        kayit = cizimler[anahtar] = (time.time(), uret())
+    return kayit[1]
+
+# =============================================================================
+# PORTFÖY DEĞERLEME MOTORU (TEK ANLIK GÖRÜNTÜ, VEKTÖREL, TL'YE NORMALİZE)
+# =============================================================================
+# Türetilmiş kod -> (çarpan, temel enstrüman, temel enstrümanın para birimi, kodun kotasyon para birimi).
+# "SERBEST-ALTIN" kullanıcının girdiği (ya da bankadan türetilen) serbest piyasa has gram fiyatıdır.
+TURETILMIS_VARLIKLAR = {
+    "TRY": (1.0, "TRY", "TRY", "TRY"),
+    "ONS-ALTIN": (1.0, "GC=F", "USD", "USD"),
+    "GRAM-ALTIN": (1 / ONS_GRAM, "GC=F", "USD", "TRY"),
+    "GRAM-ALTIN-S": (1.0, "SERBEST-ALTIN", "TRY", "TRY"),
+    "GRAM-ALTIN-22": (0.916, "SERBEST-ALTIN", "TRY", "TRY"),
+    "GRAM-ALTIN-22-B": (0.910, "SERBEST-ALTIN", "TRY", "TRY"),
+    "GRAM-ALTIN-14": (0.585, "SERBEST-ALTIN", "TRY", "TRY"),
+    "CEYREK-ALTIN": (1.6065, "SERBEST-ALTIN", "TRY", "TRY"),
+    "YARIM-ALTIN": (3.2130, "SERBEST-ALTIN", "TRY", "TRY"),
+    "TAM-ALTIN": (6.4260, "SERBEST-ALTIN", "TRY", "TRY"),
+    "ATA-ALTIN": (6.6080, "SERBEST-ALTIN", "TRY", "TRY"),
+    "GRAM-GUMUS": (1 / ONS_GRAM, "SI=F", "USD", "TRY"),
+    "GRAM-PLATIN": (1 / ONS_GRAM, "PL=F", "USD", "TRY"),
+}
+
+def kotasyon_para_birimi(sembol):
+    return "TRY" if (".IS" in sembol or sembol.endswith("TRY=X")) else "USD"
+
+def degerleme_haritasi(semboller):
+    # Her sembol için (carpan, temel, temel_para, kotasyon_para) tablosu
+    semboller = pd.Index(pd.unique(pd.Series(semboller, dtype=object)), name="sembol")
+    varsayilan = [(1.0, s, kotasyon_para_birimi(s), kotasyon_para_birimi(s)) for s in semboller]
+    satirlar = [TURETILMIS_VARLIKLAR.get(s, v) for s, v in zip(semboller, varsayilan)]
+    return pd.DataFrame(satirlar, index=semboller, columns=["carpan", "temel", "temel_para", "kotasyon_para"])
+
+def varlik_fiyatlari(semboller, anlik, fiyatlar, onceki=False):
+    # Sembolleri tek geçişte fiyatlar: kotasyon para biriminde 'fiyat', TL karşılığı 'fiyat_tl' ve kur 'kur'.
+    # onceki=True bir önceki kapanışla hesaplar; serbest altın banka gramıyla aynı oranda değişmiş sayılır.
+    usd, has_altin_banka, has_altin_serbest, _, _ = fiyatlar
+    harita = degerleme_haritasi(semboller)
+    i = 1 if onceki else 0
+    temel_fiyatlar = pd.Series({s: v[i] for s, v in anlik.items()}, dtype=float)
+    if onceki:
+        usd = anlik.get("USDTRY=X", (usd, usd))[1] or usd
+        banka_onceki = anlik.get("GC=F", (0.0, 0.0))[1] * usd / ONS_GRAM
+        if has_altin_banka > 0 and banka_onceki > 0:
+            has_altin_serbest = has_altin_serbest * banka_onceki / has_altin_banka
+    temel_fiyatlar["SERBEST-ALTIN"] = has_altin_serbest
+    temel_fiyatlar["TRY"] = 1.0
+    kurlar = pd.Series({"TRY": 1.0, "USD": usd})
+
+    temel = harita["temel"].map(temel_fiyatlar).where(lambda x: x > 0)
+    harita["fiyat_tl"] = temel * harita["carpan"] * harita["temel_para"].map(kurlar)
+    harita["kur"] = harita["kotasyon_para"].map(kurlar)
+    # Temel enstrümanla aynı para biriminde kote edilen sembolün fiyatı kura bağlı değildir
+    ayni_para = harita["temel_para"] == harita["kotasyon_para"]
+    harita["fiyat"] = (temel * harita["carpan"]).where(ayni_para, harita["fiyat_tl"] / harita["kur"])
+    return harita
+
+def portfoy_degerle(df_varlik, anlik, fiyatlar):
+    # Özet metrikleri, tablo, pasta grafik ve ısı haritasının ortak kullandığı zenginleştirilmiş çerçeve.
+    # Anlık fiyatı okunamayan varlıklar veritabanındaki son guncel_fiyat ile, okunamayan kur diskteki son
+    # USDTRY kapanışıyla değerlenir. Kur hiç bilinmiyorsa toplamlar eksik kalmasın diye attrs["kur_eksik"] işaretlenir.
+    df = df_varlik.copy()
+    harita = varlik_fiyatlari(df['sembol'], anlik, fiyatlar)
+    fiyat = df['sembol'].map(harita['fiyat'])
+    kur = df['sembol'].map(harita['kur'])
+    if kur.isna().any():
+        yedek = gecmis_deposu().son_kapanislar(["USDTRY=X"]).get("USDTRY=X", (None,))[0]
+        if yedek and yedek > 0:
+            kur = kur.fillna(df['sembol'].map(harita['kotasyon_para']).map({"USD": yedek}))
+    df.attrs["kur_eksik"] = bool(kur.isna().any())
+    df['guncel_fiyat'] = fiyat.fillna(df['guncel_fiyat']).fillna(0.0)
+    df['Birim'] = df['sembol'].map(harita['kotasyon_para']).map({"TRY": "₺", "USD": "$"})
+    df['Yatirim'] = df['miktar'] * df['ort_maliyet'] * kur
+    df['Guncel'] = df['miktar'] * df['guncel_fiyat'] * kur
+    df['Kar_Zarar'] = df['Guncel'] - df['Yatirim']
+    df['Degisim_%'] = np.where(df['Yatirim'] > 0, (df['Kar_Zarar'] / df['Yatirim'].where(df['Yatirim'] > 0, 1.0)) * 100, 0.0)
+    return df
+
+# =============================================================================
+# ÇAPRAZ KUR MOTORU (TÜM ENSTRÜMANLAR x TÜM ENSTRÜMANLAR, FİYAT ANLIK GÖRÜNTÜSÜ BAŞINA BİR KEZ)
+# =============================================================================
+class CaprazKur:
+    # Döviz, maden, altın türleri/ayarları, kripto ve anlık görüntüdeki diğer semboller TL'ye çevrilir;
+    # oranlar[i, j] = 1 birim i'nin j cinsinden değeri. Her dönüşüm sabit zamanlı bir dizi okumasıdır.
+    def __init__(self, anlik, fiyatlar):
+        self.kodlar = list(dict.fromkeys([*TURETILMIS_VARLIKLAR, *anlik]))
+        self.indeks = {k: i for i, k in enumerate(self.kodlar)}
+        son = varlik_fiyatlari(self.kodlar, anlik, fiyatlar)
+        onceki = varlik_fiyatlari(self.kodlar, anlik, fiyatlar, onceki=True)
+        self.tl = np.column_stack([son['fiyat_tl'].to_numpy(dtype=float), onceki['fiyat_tl'].to_numpy(dtype=float)])
+        self.kur = np.column_stack([son['kur'].to_numpy(dtype=float), onceki['kur'].to_numpy(dtype=float)])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.oranlar = self.tl[:, 0][:, None] / self.tl[:, 0][None, :]
+
+    def tl_degeri(self, kod):
+        i = self.indeks.get(kod)
+        return float(self.tl[i, 0]) if i is not None else float("nan")
+
+    def oran(self, kaynak, hedef):
+        i, j = self.indeks.get(kaynak), self.indeks.get(hedef)
+        return float(self.oranlar[i, j]) if i is not None and j is not None else float("nan")
+
+    def yerel(self, kod):
+        # Kotasyon para biriminde (son, onceki); bilinmeyen ya da fiyatı okunamayan kod için (0, 0)
+        i = self.indeks.get(kod)
+        if i is None: return 0.0, 0.0
+        return tuple(float(x) for x in np.nan_to_num(self.tl[i] / self.kur[i]))
+
+@st.cache_resource(max_entries=16)
+def _capraz_kur(anlik_anahtari, fiyatlar):
+    return CaprazKur(dict(anlik_anahtari), fiyatlar)
+
+def capraz_kur_matrisi(anlik, fiyatlar):
+    # Aynı anlık görüntü (ve serbest altın girdisi) için matris bir kez kurulur, tüm sayfalar paylaşır
+    return _capraz_kur(tuple(sorted(anlik.items())), tuple(fiyatlar))
+
+def portfoy_sembolleri():
+    return kullanici_varliklari(user_id)['sembol'].tolist()
+
+def sayfa_sembolleri(menu):
+    # Seçili sayfanın çizerken ihtiyaç duyacağı tüm fiyat kodları
+    if menu == "📊 Genel Özet":
+        return (portfoy_sembolleri()
+                + list(st.session_state.takip_listesi_bant.values())
+                + list(st.session_state.sag_panel_listesi.values()))
+    if menu == "🔥 Isı Haritası":
+        return portfoy_sembolleri()
+    if menu == "🧮 Hesap Araçları":
+        return [st.session_state.cev_kaynak_kod, st.session_state.cev_hedef_kod]
+    return []
+
+# =============================================================================
+# FİYAT GEÇMİŞİ DEPOSU (DİSKTE, SEMBOL BAŞINA ARTIMLI GÜNLÜK SERİ)
+# =============================================================================
+# Günlük kapanış/yüksek/düşük barları SQLite dosyasında tutulur ve yeniden başlatmalarda korunur.
+# İlk istekte 5 yıllık seri indirilir; sonrasında yalnızca son kayıtlı bardan bugüne kadar olan kuyruk çekilir.
+# Seriler Yahoo'nun temettü/bölünme düzeltmeli (auto_adjust) fiyatlarıdır. Yeni bir düzeltme eski barları
+# yeniden ölçekler; kuyruğa eklenen kapanmış bir bar kayıtlı değerinden farklı gelirse seri baştan indirilir.
+GECMIS_YILI = 5
+DUZELTME_TOLERANSI = 1e-4  # göreli; kayan nokta gürültüsünü yutar, en küçük temettü düzeltmesini yakalar
+
+class GecmisDeposu:
+    TAZELIK = 900  # saniye; bu süre içinde kontrol edilen sembol için ağa çıkılmaz
+    BOS_BEKLEME = 21600  # Yahoo'nun hiç veri döndürmediği (bilinmeyen/kotasyondan çıkmış) sembol bu süre sorulmaz
+
+    def __init__(self, yol):
+        klasor = os.path.dirname(yol)
+        if klasor: os.makedirs(klasor, exist_ok=True)
+        self._kilit = threading.Lock()
+        self._sembol_kilitleri = {}
+        self._conn = sqlite3.connect(yol, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS fiyat_gecmisi (
+                sembol TEXT NOT NULL, tarih TEXT NOT NULL,
+                kapanis REAL, yuksek REAL, dusuk REAL,
+                PRIMARY KEY (sembol, tarih)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS gecmis_meta (
+                sembol TEXT PRIMARY KEY, son_kontrol REAL NOT NULL
+            );
+        ''')
+        self._conn.commit()
+
+    def _son_durum(self, sembol):
+        # (son kontrol zamanı, son bar tarihi, karşılaştırma barı). Karşılaştırma barı sondan bir önceki bardır:
+        # son bar gün içinde yarım kaydedilmiş olabilir, bir önceki kapanmıştır ve ancak düzeltmeyle değişir.
+        with self._kilit:
+            kontrol = self._conn.execute("SELECT son_kontrol FROM gecmis_meta WHERE sembol = ?", (sembol,)).fetchone()
+            son_barlar = self._conn.execute(
+                "SELECT tarih, kapanis FROM fiyat_gecmisi WHERE sembol = ? ORDER BY tarih DESC LIMIT 2", (sembol,)).fetchall()
+        return (kontrol[0] if kontrol else 0), (son_barlar[0][0] if son_barlar else None), (son_barlar[-1] if son_barlar else None)
+
+    def guncelle(self, sembol):
+        # Aynı sembolü isteyen paralel iş parçacıkları (ör. ons serisini paylaşan altın türleri) tek indirmeyi bekler
+        with self._kilit:
+            sembol_kilidi = self._sembol_kilitleri.setdefault(sembol, threading.Lock())
+        with sembol_kilidi:
+            self._guncelle(sembol)
+
+    def _guncelle(self, sembol):
+        son_kontrol, son_tarih, karsilastirma = self._son_durum(sembol)
+        taze = time.time() - son_kontrol < (self.TAZELIK if son_tarih else self.BOS_BEKLEME)
+        onbellek_sonucu("gecmis", taze)
+        if taze:
+            return
+        # Kuyruk karşılaştırma barından başlar: gün içinde kaydedilmiş yarım son bar kapanışla değiştirilir
+        def indir(baslangic=None):
+            with span("http", "yfinance.history"):
+                if baslangic:
+                    return yf.Ticker(sembol).history(start=baslangic, auto_adjust=True)
+                return yf.Ticker(sembol).history(period=f"{GECMIS_YILI}y", auto_adjust=True)
+        veri = VERI_CEKICI.cagir(YAHOO_SUNUCUSU, lambda: indir(karsilastirma and karsilastirma[0]), bekleme=15)
+
+        bastan = False
+        if karsilastirma and veri is not None and not veri.empty:
+            gelen = veri['Close'][veri.index.strftime("%Y-%m-%d") == karsilastirma[0]].dropna()
+            if len(gelen) and not np.isclose(float(gelen.iloc[0]), karsilastirma[1], rtol=DUZELTME_TOLERANSI, atol=0):
+                # Aradaki temettü/bölünme geçmişi yeniden ölçekledi; kuyruk eklemek seride kırılma bırakırdı
+                IZLEYICI.say("gecmis_duzeltme")
+                veri = VERI_CEKICI.cagir(YAHOO_SUNUCUSU, indir, bekleme=15)
+                bastan = True
+
+        satirlar = []
+        if veri is not None and not veri.empty:
+            veri = veri.dropna(subset=['Close'])
+            tarihler = veri.index.strftime("%Y-%m-%d")
+            satirlar = list(zip([sembol] * len(veri), tarihler, veri['Close'].astype(float),
+                                veri['High'].astype(float), veri['Low'].astype(float)))
+        with self._kilit:
+            if bastan and satirlar:
+                self._conn.execute("DELETE FROM fiyat_gecmisi WHERE sembol = ?", (sembol,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fiyat_gecmisi (sembol, tarih, kapanis, yuksek, dusuk) VALUES (?, ?, ?, ?, ?)",
+                satirlar)
+            # Boş yanıt da kaydedilir: veri olmayan sembol her çizimde yeniden indirilmez
+            self._conn.execute("INSERT OR REPLACE INTO gecmis_meta (sembol, son_kontrol) VALUES (?, ?)", (sembol, time.time()))
+            self._conn.commit()
+
+    def seri(self, sembol, baslangic=None, bitis=None):
+        # DatetimeIndex'li Close/High/Low çerçevesi; dönem seçimi tarih aralığıyla yapılır
+        sorgu = "SELECT tarih, kapanis, yuksek, dusuk FROM fiyat_gecmisi WHERE sembol = ?"
+        parametreler = [sembol]
+        if baslangic is not None:
+            sorgu += " AND tarih >= ?"
+            parametreler.append(pd.Timestamp(baslangic).strftime("%Y-%m-%d"))
+        if bitis is not None:
+            sorgu += " AND tarih <= ?"
+            parametreler.append(pd.Timestamp(bitis).strftime("%Y-%m-%d"))
+        with self._kilit:
+            satirlar = self._conn.execute(sorgu + " ORDER BY tarih", parametreler).fetchall()
+        df = pd.DataFrame(satirlar, columns=['tarih', 'Close', 'High', 'Low'])
+        df.index = pd.to_datetime(df.pop('tarih'))
+        return df
+
+    def getir(self, sembol, baslangic=None, bitis=None):
+        try:
+            self.guncelle(sembol)
+        except Exception:
+            pass  # ağ hatasında diskteki son seri kullanılır
+        return self.seri(sembol, baslangic, bitis)
+
+    def son_kapanislar(self, semboller):
+        # Ağa çıkmadan diskteki son iki kapanış: {sembol: (son, onceki)}
+        sonuc = {}
+        with self._kilit:
+            for s in semboller:
+                satirlar = self._conn.execute(
+                    "SELECT kapanis FROM fiyat_gecmisi WHERE sembol = ? AND kapanis IS NOT NULL ORDER BY tarih DESC LIMIT 2", (s,)).fetchall()
+                if satirlar:
+                    sonuc[s] = (satirlar[0][0], satirlar[-1][0])
+        return sonuc
+
+@st.cache_resource
+def gecmis_deposu():
+    return GecmisDeposu(st.secrets.get("GECMIS_DB_YOLU", os.path.join("veri", "fiyat_gecmisi.sqlite3")))
+
+def gecmis_kaynagi(sembol):
+    # Geçmiş serisi için (çarpan, temel sembol, temel para birimi). Altın/gümüş türleri ve ayarları
+    # TURETILMIS_VARLIKLAR'dan ons serisine yönlenir; serbest piyasanın geçmişi yok, banka gramıyla yaklaşıklanır
+    if sembol in TURETILMIS_VARLIKLAR:
+        carpan, temel, temel_para, _ = TURETILMIS_VARLIKLAR[sembol]
+        if temel == "SERBEST-ALTIN":
+            return carpan / ONS_GRAM, "GC=F", "USD"
+        return carpan, temel, temel_para
+    return 1.0, ("XU100.IS" if sembol == "BIST" else sembol), kotasyon_para_birimi(sembol)
+
+def gecmis_cerceve(sembol, baslangic=None, bitis=None, depo=None):
+    # Analiz ekranları için sembolün kotasyon para birimi cinsinden günlük Close/High/Low çerçevesi
+    depo = depo or gecmis_deposu()
+    carpan, temel, temel_para = gecmis_kaynagi(sembol)
+    if temel == "TRY":
+        return pd.DataFrame(columns=['Close', 'High', 'Low'], index=pd.DatetimeIndex([]), dtype=float)
+    df = depo.getir(temel, baslangic, bitis).dropna(subset=['Close'])
+    if sembol not in TURETILMIS_VARLIKLAR:
+        return df
+    if temel_para == TURETILMIS_VARLIKLAR[sembol][3]:
+        return df[['Close', 'High', 'Low']] * carpan
+    usd = depo.getir("USDTRY=X", baslangic, bitis)['Close'].rename('U')
+    df = df.join(usd, how='outer').sort_index().ffill().dropna()
+    return df[['Close', 'High', 'Low']].mul(df['U'] * carpan, axis=0)
+
+def fiyat_gecmisi(sembol, baslangic=None, bitis=None):
+    return gecmis_cerceve(sembol, baslangic, bitis)['Close']
+
+# =============================================================================
+# TEKNİK GÖSTERGE MOTORU (ÇOK SEMBOLLÜ, VEKTÖREL, ARTIMLI)
+# =============================================================================
+# Semboller son bara göre sağa hizalanmış (satır = sondan kaçıncı bar) matrislere dizilir; böylece
+# farklı tatil günlerine sahip piyasalar aynı matriste boşluksuz hesaplanır. EMA tabanlı göstergeler
+# (RSI, MACD, ATR) ve getiri varyansı sembol başına durum olarak saklanır; yeni bar geldiğinde yalnızca
+# yeni barlar işlenir. Sonuçlar (sembol, son bar tarihi, son kapanış) anahtarıyla önbelleğe alınır; depo gün içi
+# son barı her TAZELIK'te yeniden yazdığından göstergeler gün boyunca güncel fiyatı izler.
+GOSTERGE_PENCERESI = 260  # SMA200 ve 52 haftalık zirve için gereken en uzun pencere
+
+def _hizala(seriler, uzunluk=None):
+    # {sembol: Series} -> sağa hizalı (uzunluk x sembol) matris, kısa seriler başta NaN
+    if uzunluk is None:
+        uzunluk = max((len(s) for s in seriler.values()), default=0)
+    matris = np.full((uzunluk, len(seriler)), np.nan)
+    for j, s in enumerate(seriler.values()):
+        d = s.to_numpy(dtype=float)[-uzunluk:] if uzunluk else s.to_numpy(dtype=float)[:0]
+        if len(d): matris[uzunluk - len(d):, j] = d
+    return pd.DataFrame(matris, columns=list(seriler.keys()))
+
+def _ema_adimi(onceki, x, alfa):
+    # NaN olan (henüz başlamamış ya da yeni barı olmayan) sütunlarda durum korunur
+    yeni = np.where(np.isnan(onceki), x, alfa * x + (1 - alfa) * onceki)
+    return np.where(np.isnan(x), onceki, yeni)
+
+class GostergeMotoru:
+    DURUMLAR = ["tarih", "kapanis", "ema12", "ema26", "sinyal", "kazanc", "kayip", "atr", "n", "ort", "m2"]
+
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self._durum = pd.DataFrame(columns=self.DURUMLAR[1:], dtype=float)
+        self._durum_tarih = {}
+        self._sonuclar = {}  # sembol -> ((son bar tarihi, son kapanış), gösterge satırı)
+        self._zamanlar = {}  # sembol -> son hesaplama zamanı
+        self._bekleyenler = set()  # arka planda hesaplanan semboller
+
+    def _durum_ilklendir(self, kapanis, yuksek, dusuk):
+        # Tüm geçmişten EMA/Wilder ve Welford durumlarını çıkarır (pandas ewm ile aynı özyineleme)
+        ema12 = kapanis.ewm(span=12, adjust=False).mean()
+        ema26 = kapanis.ewm(span=26, adjust=False).mean()
+        sinyal = (ema12 - ema26).ewm(span=9, adjust=False).mean()
+        fark = kapanis.diff()
+        kazanc = fark.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+        kayip = (-fark).clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+        onceki = kapanis.shift(1)
+        tr = pd.concat([yuksek - dusuk, (yuksek - onceki).abs(), (dusuk - onceki).abs()]).groupby(level=0).max()
+        tr = tr.where(onceki.notna())
+        atr = tr.ewm(alpha=1/14, adjust=False).mean()
+        getiri = kapanis.pct_change()
+        n = getiri.count()
+        return pd.DataFrame({
+            "kapanis": kapanis.ffill().iloc[-1], "ema12": ema12.iloc[-1], "ema26": ema26.iloc[-1],
+            "sinyal": sinyal.iloc[-1], "kazanc": kazanc.iloc[-1], "kayip": kayip.iloc[-1],
+            "atr": atr.iloc[-1], "n": n, "ort": getiri.mean().fillna(0.0), "m2": (getiri.var(ddof=0) * n).fillna(0.0),
+        })
+
+    def _durum_ilerlet(self, durum, kapanis, yuksek, dusuk):
+        # Yalnızca yeni barlar üzerinden, tüm semboller için aynı anda bir adım ilerler
+        d = {k: durum[k].to_numpy(dtype=float).copy() for k in durum.columns}
+        for i in range(len(kapanis)):
+            x, h, l = kapanis.iloc[i].to_numpy(), yuksek.iloc[i].to_numpy(), dusuk.iloc[i].to_numpy()
+            var = ~np.isnan(x)
+            onceki = d["kapanis"]
+            e12 = _ema_adimi(d["ema12"], x, 2 / 13)
+            e26 = _ema_adimi(d["ema26"], x, 2 / 27)
+            d["sinyal"] = _ema_adimi(d["sinyal"], np.where(var, e12 - e26, np.nan), 2 / 10)
+            d["ema12"], d["ema26"] = e12, e26
+            fark = x - onceki
+            d["kazanc"] = _ema_adimi(d["kazanc"], np.where(var, np.clip(fark, 0, None), np.nan), 1 / 14)
+            d["kayip"] = _ema_adimi(d["kayip"], np.where(var, np.clip(-fark, 0, None), np.nan), 1 / 14)
+            tr = np.fmax(h - l, np.fmax(np.abs(h - onceki), np.abs(l - onceki)))
+            d["atr"] = _ema_adimi(d["atr"], np.where(var, tr, np.nan), 1 / 14)
+            r = fark / onceki
+            gecerli = var & ~np.isnan(r)
+            n_yeni = d["n"] + gecerli
+            delta = np.where(gecerli, r - d["ort"], 0.0)
+            d["ort"] = np.where(gecerli, d["ort"] + delta / np.maximum(n_yeni, 1), d["ort"])
+            d["m2"] = np.where(gecerli, d["m2"] + delta * (r - d["ort"]), d["m2"])
+            d["n"] = n_yeni
+            d["kapanis"] = np.where(var, x, onceki)
+        return pd.DataFrame(d, index=durum.index)
+
+    def hesapla(self, gecmisler):
+        # gecmisler: {sembol: Close/High/Low DataFrame (DatetimeIndex)} -> sembol başına gösterge tablosu
+        gecmisler = {s: g for s, g in gecmisler.items() if g is not None and not g.empty}
+        with self._kilit:
+            hazir = {}
+            for s, g in gecmisler.items():
+                onbellek = self._sonuclar.get(s)
+                hazir[s] = onbellek[1] if onbellek and onbellek[0] == (g.index[-1], g['Close'].iloc[-1]) else None
+                onbellek_sonucu("gosterge", hazir[s] is not None)
+                self._zamanlar[s] = time.time()
+            hesaplanacak = [s for s, r in hazir.items() if r is None]
+            if hesaplanacak:
+                # Durumun ait olduğu bar sonradan düzeltildiyse (gün içi yarım bar) sembol baştan hesaplanır
+                artimli = {s: self._durum_tarih[s] for s in hesaplanacak
+                           if s in self._durum_tarih and self._durum_tarih[s] in gecmisler[s].index
+                           and gecmisler[s]['Close'].loc[self._durum_tarih[s]] == self._durum.at[s, "kapanis"]}
+                sifirdan = [s for s in hesaplanacak if s not in artimli]
+
+                durumlar = []
+                if sifirdan:
+                    durumlar.append(self._durum_ilklendir(
+                        *(_hizala({s: gecmisler[s][k] for s in sifirdan}) for k in ("Close", "High", "Low"))))
+                if artimli:
+                    yeni = {s: gecmisler[s][gecmisler[s].index > t] for s, t in artimli.items()}
+                    durumlar.append(self._durum_ilerlet(
+                        self._durum.loc[list(artimli)],
+                        *(_hizala({s: y[k] for s, y in yeni.items()}) for k in ("Close", "High", "Low"))))
+                yeni_durum = pd.concat(durumlar)
+                self._durum = pd.concat([self._durum.drop(index=yeni_durum.index, errors="ignore"), yeni_durum])
+                for s in hesaplanacak:
+                    self._durum_tarih[s] = gecmisler[s].index[-1]
+
+                pencere = _hizala({s: gecmisler[s]['Close'] for s in hesaplanacak}, GOSTERGE_PENCERESI)
+                tablo = self._pencere_gostergeleri(pencere, self._durum.loc[hesaplanacak])
+                for s in hesaplanacak:
+                    satir = tablo.loc[s]
+                    self._sonuclar[s] = ((gecmisler[s].index[-1], gecmisler[s]['Close'].iloc[-1]), satir)
+                    hazir[s] = satir
+        if not hazir:
+            return pd.DataFrame()
+        return pd.DataFrame(hazir).T
+
+    def hazir_sonuclar(self, semboller, tazelik):
+        # Ağa çıkmadan son hesaplanan satırlar ve tazelik süresini aşmış (ya da hiç hesaplanmamış) semboller
+        simdi = time.time()
+        with self._kilit:
+            satirlar = {s: self._sonuclar[s][1] for s in semboller if s in self._sonuclar}
+            eskiler = [s for s in semboller if simdi - self._zamanlar.get(s, 0) > tazelik]
+        return (pd.DataFrame(satirlar).T if satirlar else pd.DataFrame()), eskiler
+
+    def arka_planda(self, semboller, hesapla):
+        # hesapla(semboller) tek bir arka plan iş parçacığında çalışır; kuyruktaki sembol yeniden eklenmez
+        with self._kilit:
+            yeni = [s for s in semboller if s not in self._bekleyenler]
+            self._bekleyenler.update(yeni)
+        if not yeni: return
+
+        def _calis():
+            try:
+                hesapla(yeni)
+            except Exception:
+                pass
+            finally:
+                with self._kilit:
+                    self._bekleyenler.difference_update(yeni)
+        threading.Thread(target=_calis, daemon=True).start()
+
+    @staticmethod
+    def _pencere_gostergeleri(kapanis, durum):
+        # Pencere matrisi sağa hizalı; geçmişi yetmeyen sembollerde ilgili gösterge NaN kalır
+        son = kapanis.iloc[-1]
+        sma50 = kapanis.rolling(50).mean().iloc[-1]
+        sma200 = kapanis.rolling(200).mean().iloc[-1]
+        bb_orta = kapanis.rolling(20).mean().iloc[-1]
+        bb_std = kapanis.rolling(20).std().iloc[-1]
+        ay_once = kapanis.shift(29).iloc[-1]
+        hafta_once = kapanis.shift(4).iloc[-1]
+        zirve = kapanis.iloc[-252:].max()
+
+        macd = durum["ema12"] - durum["ema26"]
+        rsi = 100 - 100 / (1 + durum["kazanc"] / durum["kayip"])
+        getiri_1ay = (son - ay_once) / ay_once
+
+        tablo = pd.DataFrame({
+            "son": son, "sma50": sma50, "sma200": sma200,
+            "volatilite": np.sqrt(durum["m2"] / (durum["n"] - 1).where(durum["n"] > 1)) * 100,
+            "zirve_52h": zirve, "zirveye_uzaklik": (zirve - son) / zirve * 100,
+            "getiri_1ay": getiri_1ay * 100, "momentum_5g": (son - hafta_once) / hafta_once * 100,
+            "rsi": rsi, "macd": macd, "macd_sinyal": durum["sinyal"], "macd_hist": macd - durum["sinyal"],
+            "bb_ust": bb_orta + 2 * bb_std, "bb_alt": bb_orta - 2 * bb_std,
+            "bb_yuzde": (son - (bb_orta - 2 * bb_std)) / (4 * bb_std) * 100,
+            "atr": durum["atr"], "atr_yuzde": durum["atr"] / son * 100,
+        })
+        # SMA200 ya da 1 aylık getiri için geçmişi yetmeyen sembolün puanı yoktur (0 "zayıf" okunurdu)
+        tablo["puan"] = (25 * ((son > sma50).astype(int) + (son > sma200).astype(int)
+                               + (sma50 > sma200).astype(int) + (getiri_1ay > 0).astype(int))
+                         ).where(sma200.notna() & getiri_1ay.notna())
+        return tablo
+
+@st.cache_resource
+def gosterge_motoru():
+    return GostergeMotoru()
+
+def gostergeler(semboller):
+    # Sembollerin geçmişini depodan paralel toplar ve tek seferde gösterge tablosunu döndürür
+    semboller = list(dict.fromkeys(semboller))
+    depo = gecmis_deposu()
+    def _getir(s):
+        try:
+            return s, gecmis_cerceve(s, depo=depo)
+        except Exception:
+            return s, None
+    with ThreadPoolExecutor(max_workers=8) as havuz:
+        gecmisler = dict(havuz.map(_getir, semboller))
+    return gosterge_motoru().hesapla(gecmisler)
+
+def hazir_gostergeler(semboller):
+    # Sayfa çizimini bekletmeyen okuma: hazır satırlar hemen döner, eksik ya da eskimiş semboller
+    # arka planda hesaplanır ve sonraki çizimde görünür. İkinci değer henüz satırı olmayan sembollerdir.
+    semboller = list(dict.fromkeys(semboller))
+    motor = gosterge_motoru()
+    tablo, eskiler = motor.hazir_sonuclar(semboller, GecmisDeposu.TAZELIK)
+    if eskiler:
+        motor.arka_planda(eskiler, gostergeler)
+    return tablo, [s for s in semboller if s not in tablo.index]
+
+# =============================================================================
+# PORTFÖY DEĞER GEÇMİŞİ (GÜNLÜK, KALICI, ARTIMLI)
+# =============================================================================
+# Kullanıcının günlük TL değeri ve net yatırımı portfoy_degeri tablosunda saklanır. Her açılışta yalnızca
+# son kayıtlı günden bugüne kadar olan kısım hesaplanır; islemler tablosundaki değişiklikler tetikleyiciyle
+# etkilenen tarihten sonraki satırları siler, bir sonraki açılışta o aralık yeniden kurulur.
+def gunluk_fiyat_matrisi(semboller, baslangic, takvim, depo):
+    # Sembol başına TL kapanış matrisi (takvim x sembol); tatil ve hafta sonları son kapanışla doldurulur
+    usd = depo.getir("USDTRY=X", baslangic)['Close']
+    kaynaklar, carpanlar, usd_bazli = {}, {}, {}
+    for s in semboller:
+        if s == "TRY": continue
+        carpan, temel, temel_para = gecmis_kaynagi(s)
+        try:
+            kaynaklar[s] = gecmis_cerceve(temel, baslangic, depo=depo)['Close']
+        except Exception:
+            kaynaklar[s] = pd.Series(dtype=float)
+        carpanlar[s], usd_bazli[s] = carpan, temel_para == "USD"
+
+    kur = usd.reindex(usd.index.union(takvim)).ffill().reindex(takvim)
+    if not kaynaklar:
+        return pd.DataFrame(index=takvim), kur
+    temel = pd.concat(kaynaklar, axis=1)
+    temel = temel.reindex(temel.index.union(takvim)).ffill().reindex(takvim)
+    fx = np.where(pd.Series(usd_bazli)[temel.columns].to_numpy(), kur.to_numpy()[:, None], 1.0)
+    return temel * pd.Series(carpanlar)[temel.columns] * fx, kur
+
+def portfoy_degeri_hesapla(islemler, baslangic, onceki_yatirim, depo):
+    # islemler: (sembol, tarih, islem_tipi, miktar, fiyat); baslangic gününden bugüne günlük değer/yatırım
+    bugun = pd.Timestamp(date.today())
+    takvim = pd.date_range(baslangic, bugun, freq="D")
+    if len(takvim) == 0:
+        return pd.DataFrame(columns=["deger", "yatirim"])
+    df = pd.DataFrame(islemler, columns=["sembol", "tarih", "islem_tipi", "miktar", "fiyat"])
+    df['tarih'] = pd.to_datetime(df['tarih'])
+    df['isaretli'] = np.where(df['islem_tipi'] == "ALIS", df['miktar'], -df['miktar'])
+
+    # Günlük pozisyonlar baştan toplanır (yalnızca miktar; ucuz), fiyat birleştirmesi sadece yeni aralıkta yapılır
+    adetler = df.pivot_table(index="tarih", columns="sembol", values="isaretli", aggfunc="sum")
+    adetler = adetler.reindex(adetler.index.union(takvim), fill_value=0).fillna(0).cumsum().reindex(takvim).clip(lower=0)
+
+    fiyatlar_tl, kur = gunluk_fiyat_matrisi(list(adetler.columns), takvim[0] - pd.Timedelta(days=10), takvim, depo)
+    fiyatlar_tl = fiyatlar_tl.reindex(columns=adetler.columns)
+    if "TRY" in adetler.columns:
+        fiyatlar_tl["TRY"] = 1.0
+    usd_bazli = np.array([kotasyon_para_birimi(s) == "USD" and s not in TURETILMIS_VARLIKLAR for s in adetler.columns])
+    fx = np.where(usd_bazli, kur.to_numpy()[:, None], 1.0)
+
+    # Geçmiş verisi olmayan günlerde son işlem fiyatı kullanılır
+    son_islem = df.pivot_table(index="tarih", columns="sembol", values="fiyat", aggfunc="last")
+    son_islem = son_islem.reindex(son_islem.index.union(takvim)).ffill().reindex(takvim)[adetler.columns]
+    fiyatlar_tl = fiyatlar_tl.fillna(son_islem * fx)
+
+    yeni = df[df['tarih'] >= takvim[0]]
+    nakit = yeni.assign(tutar=yeni['isaretli'] * yeni['fiyat']).pivot_table(index="tarih", columns="sembol", values="tutar", aggfunc="sum")
+    nakit = nakit.reindex(index=takvim, columns=adetler.columns).fillna(0)
+    return pd.DataFrame({
+        "deger": (adetler * fiyatlar_tl).sum(axis=1),
+        "yatirim": onceki_yatirim + (nakit * fx).sum(axis=1).cumsum(),
+    })
+
+def portfoy_degeri_gecmisi(user_id):
+    # Saklanan seriyi okur; bugüne kadar uzatılması gerekiyorsa eksik kısmı hesaplayıp yazar.
+    # Fiyat geçmişi ağdan inebileceği için hesaplama sırasında havuzdan bağlantı tutulmaz.
+    with db_baglantisi() as conn:
+        seri = hazir_sorgu_df(conn, "portfoy_degeri_serisi", (user_id,))
+        seri['tarih'] = pd.to_datetime(seri['tarih'])
+        seri = seri.set_index("tarih")
+        if len(seri) and seri.index[-1] >= pd.Timestamp(date.today()):
+            return seri
+        islemler = hazir_sorgu(conn.cursor(), "islem_akisi", (user_id,)).fetchall()
+    if not islemler:
+        return seri
+    # Tarihsiz işlemler defterdeki gibi en başta sayılır; seri 1900'den değil ilk tarihli günden başlar
+    ilk_tarih = next((t for _, t, *_ in islemler if t != DEFTER_BASI[0]), date.today())
+    islemler = [(s, max(t, ilk_tarih), *geri) for s, t, *geri in islemler]
+    # Son gün gün içi fiyatla yazılmış olabilir; o gün yeniden hesaplanır
+    if len(seri) > 1:
+        baslangic, onceki_yatirim = seri.index[-1], float(seri['yatirim'].iloc[-2])
+        seri = seri.iloc[:-1]
+    else:
+        baslangic, onceki_yatirim = pd.Timestamp(islemler[0][1]), 0.0
+        seri = seri.iloc[:0]
+    yeni = portfoy_degeri_hesapla(islemler, baslangic, onceki_yatirim, gecmis_deposu())
+    with db_baglantisi() as conn:
+        execute_values(conn.cursor(), """INSERT INTO portfoy_degeri (user_id, tarih, deger, yatirim) VALUES %s
+            ON CONFLICT (user_id, tarih) DO UPDATE SET deger = EXCLUDED.deger, yatirim = EXCLUDED.yatirim""",
+            [(user_id, t.date(), float(d), float(y)) for t, d, y in yeni.itertuples()])
+    return pd.concat([seri, yeni])
+
+# =============================================================================
+# TEMEL VERİ (.info) DEPOSU (GÜNLÜK, TÜM KULLANICILARA ORTAK)
+# =============================================================================
+# yf.Ticker(...).info en yavaş Yahoo uç noktalarından biri; sembol başına günde bir kez çekilir.
+# Temettü tarayıcısı ve .info alanlarına (exDividendDate, dividendRate vb.) ihtiyaç duyan her özellik buradan okur.
+class TemelVeriDeposu:
+    HATA_BEKLEME = 600
+
+    def __init__(self, ttl=86400, paralel=6):
+        self.ttl = ttl
+        self.paralel = paralel
+        self._kilit = threading.Lock()
+        self._kayitlar = {}        # sembol -> (info sözlüğü ya da None, zaman)
+        self._sembol_kilitleri = {}
+
+    def onbellekte(self, sembol):
+        kayit = self._kayitlar.get(sembol)
+        if kayit is None: return False
+        gecerlilik = self.ttl if kayit[0] is not None else self.HATA_BEKLEME
+        return time.time() - kayit[1] < gecerlilik
+
+    def al(self, sembol):
+        with self._kilit:
+            sembol_kilidi = self._sembol_kilitleri.setdefault(sembol, threading.Lock())
+        # Aynı sembol için eşzamanlı istekler tek indirmeyi bekler
+        with sembol_kilidi:
+            isabet = self.onbellekte(sembol)
+            onbellek_sonucu("temel_veri", isabet)
+            if not isabet:
+                try:
+                    def indir():
+                        with span("http", "yfinance.info"):
+                            return yf.Ticker(sembol).info
+                    info = VERI_CEKICI.cagir(YAHOO_SUNUCUSU, indir, bekleme=15) or {}
+                except Exception:
+                    info = None
+                self._kayitlar[sembol] = (info, time.time())
+            return self._kayitlar[sembol][0]
+
+    def toplu_al(self, semboller):
+        # Önbellekteki semboller hemen, diğerleri sınırlı iş parçacığı havuzundan çözüldükçe döner: (sembol, info)
+        semboller = list(dict.fromkeys(semboller))
+        eksik = []
+        for s in semboller:
+            if self.onbellekte(s):
+                onbellek_sonucu("temel_veri", True)
+                yield s, self._kayitlar[s][0]
+            else: eksik.append(s)
+        if not eksik: return
+        with ThreadPoolExecutor(max_workers=self.paralel) as havuz:
+            isler = {havuz.submit(self.al, s): s for s in eksik}
+            for bitti in as_completed(isler):
+                yield isler[bitti], bitti.result()
+
+@st.cache_resource
+def temel_veri_deposu():
+    return TemelVeriDeposu()
+
+# =============================================================================
+# SEMBOL ARAMA DİZİNİ (TÜM ARAMA KUTULARININ ORTAK SERVİSİ)
+# =============================================================================
+# Bellekte sıralı anahtar listesi tutulur: sembol, soneksiz sembol ve isim kelimeleri. Önek aramaları bisect
+# ile, yazım hataları difflib ile yerelde cevaplanır. Yahoo'ya yalnızca yerel dizin yetersiz kaldığında
+# gidilir ve dönen her sonuç dizine eklenir.
+SEMBOL_TOHUMLARI = [
+    ("USDTRY=X", "Dolar / TL", "Döviz"), ("EURTRY=X", "Euro / TL", "Döviz"), ("GBPTRY=X", "Sterlin / TL", "Döviz"),
+    ("CHFTRY=X", "İsviçre Frangı / TL", "Döviz"), ("JPYTRY=X", "Japon Yeni / TL", "Döviz"),
+    ("EURUSD=X", "Euro / Dolar", "Döviz"), ("GBPUSD=X", "Sterlin / Dolar", "Döviz"),
+    ("GC=F", "Ons Altın", "Emtia"), ("SI=F", "Ons Gümüş", "Emtia"), ("PL=F", "Ons Platin", "Emtia"),
+    ("PA=F", "Ons Paladyum", "Emtia"), ("HG=F", "Bakır", "Emtia"), ("CL=F", "Ham Petrol WTI", "Emtia"),
+    ("BZ=F", "Brent Petrol", "Emtia"), ("NG=F", "Doğalgaz", "Emtia"),
+    ("GRAM-ALTIN", "Gram Altın", "Fiziki"), ("CEYREK-ALTIN", "Çeyrek Altın", "Fiziki"),
+    ("GRAM-GUMUS", "Gram Gümüş", "Fiziki"), ("GRAM-PLATIN", "Gram Platin", "Fiziki"),
+    ("BTC-USD", "Bitcoin USD", "Kripto"), ("ETH-USD", "Ethereum USD", "Kripto"), ("SOL-USD", "Solana USD", "Kripto"),
+    ("AVAX-USD", "Avalanche USD", "Kripto"), ("XRP-USD", "XRP USD", "Kripto"), ("BNB-USD", "BNB USD", "Kripto"),
+    ("DOGE-USD", "Dogecoin USD", "Kripto"), ("ADA-USD", "Cardano USD", "Kripto"),
+    ("XU100.IS", "BIST 100", "Istanbul"), ("XU030.IS", "BIST 30", "Istanbul"),
+    ("AKBNK.IS", "Akbank", "Istanbul"), ("ARCLK.IS", "Arçelik", "Istanbul"), ("ASELS.IS", "Aselsan", "Istanbul"),
+    ("BIMAS.IS", "BİM Birleşik Mağazalar", "Istanbul"), ("EKGYO.IS", "Emlak Konut GYO", "Istanbul"),
+    ("EREGL.IS", "Ereğli Demir Çelik", "Istanbul"), ("FROTO.IS", "Ford Otosan", "Istanbul"),
+    ("GARAN.IS", "Garanti BBVA", "Istanbul"), ("HEKTS.IS", "Hektaş", "Istanbul"), ("ISCTR.IS", "İş Bankası C", "Istanbul"),
+    ("KCHOL.IS", "Koç Holding", "Istanbul"), ("KOZAL.IS", "Koza Altın", "Istanbul"), ("KRDMD.IS", "Kardemir D", "Istanbul"),
+    ("PETKM.IS", "Petkim", "Istanbul"), ("PGSUS.IS", "Pegasus", "Istanbul"), ("SAHOL.IS", "Sabancı Holding", "Istanbul"),
+    ("SASA.IS", "Sasa Polyester", "Istanbul"), ("SISE.IS", "Şişecam", "Istanbul"), ("TCELL.IS", "Turkcell", "Istanbul"),
+    ("THYAO.IS", "Türk Hava Yolları", "Istanbul"), ("TOASO.IS", "Tofaş", "Istanbul"), ("TUPRS.IS", "Tüpraş", "Istanbul"),
+    ("YKBNK.IS", "Yapı Kredi", "Istanbul"), ("ENKAI.IS", "Enka İnşaat", "Istanbul"), ("TTKOM.IS", "Türk Telekom", "Istanbul"),
+    ("ALARK.IS", "Alarko Holding", "Istanbul"), ("ODAS.IS", "Odaş Elektrik", "Istanbul"),
+]
+_TR_KATLAMA = str.maketrans("çğıöşüâîûÇĞİIÖŞÜ", "cgiosuaiuCGIIOSU")
+
+def arama_anahtari(metin):
+    return " ".join(re.sub(r"[^\w.=/-]", " ", (metin or "").translate(_TR_KATLAMA).upper()).split())
+
+class SembolDizini:
+    AZAMI_YAHOO = 20   # Yahoo'dan istenen sonuç sayısı; daha azı dönerse o önek "tükenmiş" sayılır
+    ASGARI_SONUC = 3   # yerelde bundan az sonuç varsa ve önek daha önce sorulmadıysa Yahoo'ya gidilir
+
+    def __init__(self, tohumlar=()):
+        self._kilit = threading.Lock()
+        self._kayitlar = {}    # sembol -> (isim, borsa)
+        self._anahtarlar = []  # sıralı (anahtar, öncelik, sembol)
+        self._tukenmis = set() # ağda sorulmuş ve tüm sonuçları dönmüş sorgular
+        self._benzersiz = None # yazım hatası araması için tekil anahtarlar (ekleme olunca yeniden kurulur)
+        for sembol, isim, borsa in tohumlar:
+            self.ekle(sembol, isim, borsa)
+
+    def ekle(self, sembol, isim="", borsa=""):
+        with self._kilit:
+            if sembol in self._kayitlar: return
+            self._kayitlar[sembol] = (isim or "", borsa or "")
+            s = arama_anahtari(sembol)
+            anahtarlar = {(s, 0)}
+            kok = re.split(r"[.=-]", s)[0]
+            if kok != s: anahtarlar.add((kok, 0))
+            isim_anahtari = arama_anahtari(isim)
+            if isim_anahtari:
+                anahtarlar.add((isim_anahtari, 1))
+                anahtarlar.update((k, 1) for k in isim_anahtari.replace("/", " ").split() if len(k) > 1)
+            for anahtar, oncelik in anahtarlar:
+                bisect.insort(self._anahtarlar, (anahtar, oncelik, sembol))
+            self._benzersiz = None
+
+    def yerel_ara(self, kelime, limit=15):
+        q = arama_anahtari(kelime)
+        if not q: return []
+        with self._kilit:
+            bulunan = {}
+            i = bisect.bisect_left(self._anahtarlar, (q,))
+            while i < len(self._anahtarlar) and self._anahtarlar[i][0].startswith(q):
+                anahtar, oncelik, sembol = self._anahtarlar[i]
+                # Sıralama: tam sembol eşleşmesi, sembol öneki, isim öneki; kısa anahtar önce
+                puan = (0 if anahtar == q and oncelik == 0 else 1, oncelik, len(anahtar))
+                if sembol not in bulunan or puan < bulunan[sembol]: bulunan[sembol] = puan
+                i += 1
+            if not bulunan:
+                if self._benzersiz is None:
+                    self._benzersiz = sorted({a[0] for a in self._anahtarlar})
+                adaylar = difflib.get_close_matches(q, self._benzersiz, n=limit, cutoff=0.75)
+                for sira, aday in enumerate(adaylar):
+                    j = bisect.bisect_left(self._anahtarlar, (aday,))
+                    while j < len(self._anahtarlar) and self._anahtarlar[j][0] == aday:
+                        bulunan.setdefault(self._anahtarlar[j][2], (2, sira, 0))
+                        j += 1
+            sirali = sorted(bulunan, key=lambda s: (bulunan[s], s))[:limit]
+            return [(s, *self._kayitlar[s]) for s in sirali]
+
+    def _ag_gerekli(self, q, sonuclar):
+        if any(q in (arama_anahtari(s), re.split(r"[.=-]", arama_anahtari(s))[0]) for s, _, _ in sonuclar): return False
+        if len(sonuclar) >= self.ASGARI_SONUC: return False
+        return not any(q.startswith(t) for t in self._tukenmis)
+
+    def ara(self, kelime, limit=15):
+        # [(sembol, isim, borsa)]
+        q = arama_anahtari(kelime)
+        sonuclar = self.yerel_ara(q, limit)
+        if len(q) < 2 or not self._ag_gerekli(q, sonuclar):
+            return sonuclar
+        try:
+            def ara():
+                with span("http", "yahoo.arama"):
+                    res = requests.get("https://query2.finance.yahoo.com/v1/finance/search",
+                                       params={"q": kelime, "quotesCount": self.AZAMI_YAHOO, "newsCount": 0},
+                                       headers={'User-Agent': 'Mozilla/5.0'}, timeout=5)
+                    res.raise_for_status()
+                    return res.json().get('quotes', [])
+            quotes = VERI_CEKICI.cagir(YAHOO_SUNUCUSU, ara)
+        except Exception:
+            return sonuclar
+        for quote in quotes:
+            if quote.get('symbol'):
+                self.ekle(quote['symbol'], quote.get('shortname') or quote.get('longname', ''), quote.get('exchDisp', ''))
+        if len(quotes) < self.AZAMI_YAHOO:
+            with self._kilit:
+                self._tukenmis.add(q)
+        # Yahoo'nun döndürdüğü sıralama korunur, yerel eşleşmeler arkadan eklenir
+        yahoo = [(q_['symbol'], *self._kayitlar[q_['symbol']]) for q_ in quotes if q_.get('symbol')]
+        return list({s[0]: s for s in yahoo + self.yerel_ara(q, limit)}.values())[:limit]
+
+@st.cache_resource
+def sembol_dizini():
+    return SembolDizini(SEMBOL_TOHUMLARI)
+
+def sembol_ara(kelime):
+    # Arama kutularının kullandığı biçim: {"SEMBOL - İsim (Borsa)": sembol}
+    return {f"{s} - {isim} ({borsa})": s for s, isim, borsa in sembol_dizini().ara(kelime)}
+
+# =============================================================================
+# ARKA PLAN FİYAT YENİLEYİCİ (TÜM KULLANICILARIN KAYITLI FİYATLARI)
+# =============================================================================
+class FiyatYenileyici:
+    # Süreç başına tek iş parçacığı: varliklar tablosundaki tüm sembolleri toplu fiyatlar
+    # ve guncel_fiyat alanını tek bir UPDATE ile yazar.
+    def __init__(self, havuz, depo, aralik=120):
+        self.havuz = havuz
+        self.depo = depo
+        self.aralik = aralik
+        self.tur = 0
+        self._calisiyor = False
+        self.son_calisma = None
+        self.son_fiyatlar = {}  # sembol -> son turda yazılan guncel_fiyat
+        self._tetik = threading.Event()
+        self._dur = threading.Event()
+        self._kosul = threading.Condition()
+        self._is = threading.Thread(target=self._dongu, daemon=True)
+        self._is.start()
+
+    def durdur(self):
+        # Süren tur yarıda kesilmez; bitmesi beklenir
+        self._dur.set()
+        self._tetik.set()
+        self._is.join(timeout=30)
+
+    def simdi_yenile(self, bekle=0):
+        # Süren tur istekten önce başlamıştır, eski fiyatları yazabilir; o durumda ondan sonraki tur beklenir
+        with self._kosul:
+            self._tetik.set()
+            hedef = self.tur + (2 if self._calisiyor else 1)
+            if bekle:
+                self._kosul.wait_for(lambda: self.tur >= hedef, timeout=bekle)
+
+    def _dongu(self):
+        while not self._dur.is_set():
+            with self._kosul:
+                self._tetik.clear()
+                self._calisiyor = True
+            try:
+                self.yenile()
+            except Exception:
+                pass
+            with self._kosul:
+                self.tur += 1
+                self._calisiyor = False
+                self._kosul.notify_all()
+            self._tetik.wait(self.aralik)
+
+    def yenile(self):
+        conn = _saglikli_baglanti_al(self.havuz)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT sembol FROM varliklar")
+            semboller = [r[0] for r in cursor.fetchall()]
+            if not semboller:
+                return
+            temeller = {temel_sembol(s) for s in semboller} - {None}
+            anlik = self.depo.al(sorted(temeller | set(TEMEL_GIRDILER)))
+            fiyatlar = fiyatlari_hesapla(None, anlik)
+
+            yeni = varlik_fiyatlari(semboller, anlik, fiyatlar)['fiyat'].dropna()
+            degerler = [(s, float(f)) for s, f in yeni.items() if f > 0]
+            if degerler:
+                # Değişmeyen satırlar yeniden yazılmaz; karşılaştırma sütunun NUMERIC(28,10) yuvarlamasıyla yapılır
+                execute_values(cursor, """UPDATE varliklar AS v SET guncel_fiyat = d.fiyat FROM (VALUES %s) AS d(sembol, fiyat)
+                    WHERE v.sembol = d.sembol AND v.guncel_fiyat IS DISTINCT FROM d.fiyat::NUMERIC(28,10)""", degerler)
+            conn.commit()
+            self.son_fiyatlar = {**self.son_fiyatlar, **dict(degerler)}
+            self.son_calisma = datetime.now()
+        finally:
+            if not conn.closed: conn.rollback()
+            conn.son_kullanim = time.time()
+            self.havuz.putconn(conn, close=bool(conn.closed))
+
+@st.cache_resource(on_release=arka_plani_durdur)
+def fiyat_yenileyici():
+    return FiyatYenileyici(db_havuzu(), fiyat_deposu())
+
+fiyat_yenileyici()
+
+# =============================================================================
+# KULLANICI PORTFÖY ÖNBELLEĞİ (SÜRÜM SAYACIYLA, YAZMADA GEÇERSİZ KILINAN)
+# =============================================================================
+# Varlık ve hedef satırları (kullanıcı, sürüm) anahtarıyla önbelleğe alınır. Alış/satış, silme, düzenleme ve
+# hedef kaydı portfoy_yazimi üzerinden yapılır ve commit'ten sonra kullanıcının sürümünü artırır; böylece
+# okumalar yalnızca gerçek bir değişiklikten sonra veritabanına gider. Arka plan yenileyicisinin yazdığı
+# guncel_fiyat değerleri sürümü değiştirmez, bellekteki son değerlerle önbellekteki satırların üzerine yazılır.
+# Sürümler süreç içinde tutulur; birden çok süreçli kurulumda diğer süreçlerin yazmaları görünmez.
+class PortfoySurumleri:
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self._surumler = {}
+
+    def al(self, user_id):
+        return self._surumler.get(user_id, 0)
+
+    def artir(self, user_id):
+        with self._kilit:
+            self._surumler[user_id] = self._surumler.get(user_id, 0) + 1
+
+@st.cache_resource
+def portfoy_surumleri():
+    return PortfoySurumleri()
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def _kullanici_portfoyu(user_id, surum):
+    with db_baglantisi() as conn:
+        varliklar = hazir_sorgu_df(conn, "varlik_detay", (user_id,))
+        hedef = hazir_sorgu(conn.cursor(), "hedef_getir", (user_id,)).fetchone()
+    return varliklar, (tuple(hedef) if hedef else None)
+
+def kullanici_varliklari(user_id, detay=False):
+    # detay=False: sembol, miktar, ort_maliyet, guncel_fiyat; detay=True tur kolonunu da içerir
+    varliklar, _ = _kullanici_portfoyu(user_id, portfoy_surumleri().al(user_id))
+    son_fiyatlar = fiyat_yenileyici().son_fiyatlar
+    if son_fiyatlar and not varliklar.empty:
+        varliklar['guncel_fiyat'] = varliklar['sembol'].map(son_fiyatlar).fillna(varliklar['guncel_fiyat'])
+    return varliklar if detay else varliklar.drop(columns="tur")
+
+def kullanici_hedefi(user_id):
+    return _kullanici_portfoyu(user_id, portfoy_surumleri().al(user_id))[1]
+
+@contextmanager
+def portfoy_yazimi(user_id):
+    # Kullanıcının varlıklarını ya da hedefini değiştiren yazmalar; hata olsa bile sürüm artırılır
+    try:
+        with db_baglantisi() as conn:
+            yield conn
+    finally:
+        portfoy_surumleri().artir(user_id)
+
+# =============================================================================
+# KREDİ HESAPLAMA MOTORU (VEKTÖREL ANÜİTE, ÖDEME PLANI, FAİZ x VADE DUYARLILIĞI)
+# =============================================================================
+# Faiz aylık yüzde olarak girilir; BSMV/KKDF vergi çarpanıyla efektif orana eklenir. Oran ve vade argümanları
+# dizi olabilir: sonuçlar NumPy yayınlamasıyla tek geçişte hesaplanır (duyarlılık matrisi = oran[:, None] x vade).
+KREDI_VADELERI = [12, 24, 36, 48, 60, 120]
+
+def _anuite_carpani(aylik_faiz, vade, vergi_carpani):
+    # Taksit / anapara oranı: r / (1 - (1 + r)^-n); faizsiz kredide 1 / n
+    r = np.asarray(aylik_faiz, dtype=float) / 100.0 * vergi_carpani
+    n = np.asarray(vade, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(r > 0, r / -np.expm1(-n * np.log1p(r)), 1.0 / n)
+
+def kredi_taksiti(anapara, aylik_faiz, vade, vergi_carpani=1.0):
+    return anapara * _anuite_carpani(aylik_faiz, vade, vergi_carpani)
+
+def cekilebilir_tutar(taksit, aylik_faiz, vade, vergi_carpani=1.0):
+    return taksit / _anuite_carpani(aylik_faiz, vade, vergi_carpani)
+
+def odeme_plani(anapara, aylik_faiz, vade, vergi_carpani=1.0):
+    # Ay ay taksitin anapara, net faiz ve vergi (BSMV+KKDF) kırılımı; kalan borç kapalı formdan hesaplanır
+    r = aylik_faiz / 100.0 * vergi_carpani
+    taksit = float(kredi_taksiti(anapara, aylik_faiz, vade, vergi_carpani))
+    ay = np.arange(vade + 1)
+    buyume = np.expm1(ay * np.log1p(r))
+    kalan = np.clip(anapara * (1 + buyume) - taksit * (buyume / r if r > 0 else ay), 0.0, None)
+    faiz_ve_vergi = kalan[:-1] * r
+    net_faiz = faiz_ve_vergi / vergi_carpani
+    return pd.DataFrame({
+        "Ay": ay[1:], "Taksit": taksit, "Anapara": taksit - faiz_ve_vergi,
+        "Faiz": net_faiz, "BSMV+KKDF": faiz_ve_vergi - net_faiz, "Kalan Borç": kalan[1:],
+    })
+
+def duyarlilik_oranlari(merkez, adet=50, adim=0.05):
+    # Merkez oranın etrafında adim aralıklı, pozitif oranlar
+    oranlar = np.round(merkez + adim * (np.arange(adet) - adet // 2), 4)
+    return oranlar[oranlar > 0]
+
+def kredi_duyarliligi(deger, oranlar, vadeler, vergi_carpani=1.0, taksit_modu=True):
+    # Satırlar aylık faiz, sütunlar vade: tutar verildiyse taksit, taksit verildiyse çekilebilir tutar
+    carpan = _anuite_carpani(np.asarray(oranlar)[:, None], np.asarray(vadeler)[None, :], vergi_carpani)
+    return pd.DataFrame(deger * carpan if taksit_modu else deger / carpan,
+                        index=pd.Index([f"%{o:.2f}" for o in oranlar], name="Aylık Faiz"),
+                        columns=[f"{v} Ay" for v in vadeler])
 
 # =============================================================================
 # MODERNİZE EDİLMİŞ SOL MENÜ (SIDEBAR) TASARIMI
@@ -323,6 +2394,7 @@ st.sidebar.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+izleme_bolumu("kenar çubuğu")
 with st.sidebar:
     st.markdown('<div class="sidebar-title">💎 PORTFÖYÜM</div>', unsafe_allow_html=True)
     
@@ -337,19 +2409,18 @@ with st.sidebar:
     
     st.subheader("⚙️ Sistem Ayarları")
     serbest_altin = st.text_input("Serbest Piyasa Gr Altın (₺):", placeholder="Örn: 3150")
-    fiyatlar = fiyatlari_hesapla(serbest_altin)
+    # Sayfanın kod listesi tam çalıştırmada bir kez kurulur; fragment yenilemeleri portföyü yeniden okumaz
+    st.session_state.sayfa_kodlari = sayfa_sembolleri(menu)
+    st.session_state.canli_cizimler = {}
+    anlik = fiyat_anlik_goruntu(st.session_state.sayfa_kodlari)
+    fiyatlar = fiyatlari_hesapla(serbest_altin, anlik)
+    bayat = fiyat_deposu().bayat_semboller(anlik)
+    if bayat:
+        st.caption(f"🕓 {len(bayat)} sembolün fiyatı güncellenemedi; son bilinen değerler gösteriliyor.")
 
     if st.button("🔄 Fiyatları Güncelle", use_container_width=True):
         with st.spinner("Güncelleniyor..."):
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT sembol FROM varliklar WHERE user_id=%s", (user_id,))
-            for (s,) in cursor.fetchall():
-                yeni_f = guncel_fiyat_bul(s, fiyatlar)
-                if yeni_f > 0:
-                    cursor.execute("UPDATE varliklar SET guncel_fiyat=%s WHERE sembol=%s AND user_id=%s", (float(yeni_f), s, user_id))
-            conn.commit()
-            conn.close()
+            fiyat_yenileyici().simdi_yenile(bekle=15)
         st.success("Veriler yenilendi!")
 
     st.markdown("<br>", unsafe_allow_html=True)
@@ -360,24 +2431,65 @@ with st.sidebar:
 # =============================================================================
 # HABER BANDI (MARQUEE) VE CSS TASARIMLARI
 # =============================================================================
-@st.cache_data(ttl=300)
-def haberleri_getir_marquee():
-    try:
-        url = "https://www.bloomberght.com/rss"
-        resp = requests.get(url, timeout=5)
-        resp.encoding = 'utf-8'
-        root = ET.fromstring(resp.content)
-        
-        haberler_html = ""
-        for item in root.findall('./channel/item')[:15]:
-            title = item.find('title').text
-            link = item.find('link').text
-            haberler_html += f"<a href='{link}' class='news-link' target='_blank'> 🔴 {title}</a>"
-        return haberler_html
-    except:
-        return "<span class='news-link'>Haberler alınamadı...</span>"
-
-haber_metni = haberleri_getir_marquee()
+class HaberAkisi:
+    # RSS akışını arka planda izler; sayfalar yalnızca son başarılı anlık görüntüyü okur ve beklemez.
+    # Koşullu GET (ETag / Last-Modified) ile değişmeyen akış yeniden indirilmez, XML akarken ayrıştırılır.
+    def __init__(self, url, adet=15, aralik=300):
+        self.url = url
+        self.adet = adet
+        self.aralik = aralik
+        self.etag = None
+        self.son_degisim = None
+        self.son_kontrol = None
+        self.html = "<span class='news-link'>Haberler yükleniyor...</span>"
+        self._dur = threading.Event()
+        self._is = threading.Thread(target=self._dongu, daemon=True)
+        self._is.start()
+
+    def durdur(self):
+        self._dur.set()
+        self._is.join(timeout=30)
+
+    def _dongu(self):
+        while not self._dur.is_set():
+            try:
+                VERI_CEKICI.cagir(urlparse(self.url).hostname, self.yenile, bekleme=30)
+            except Exception:
+                if self.son_kontrol is None:
+                    self.html = "<span class='news-link'>Haberler alınamadı...</span>"
+            self._dur.wait(self.aralik)
+
+    def yenile(self):
+        basliklar = {}
+        if self.etag: basliklar["If-None-Match"] = self.etag
+        if self.son_degisim: basliklar["If-Modified-Since"] = self.son_degisim
+        with span("http", "rss"), requests.get(self.url, headers=basliklar, timeout=(5, 15), stream=True) as resp:
+            if resp.status_code == 304:
+                self.son_kontrol = datetime.now()
+                return
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            haberler = []
+            for _, eleman in ET.iterparse(resp.raw, events=("end",)):
+                if eleman.tag != "item": continue
+                title, link = eleman.findtext("title"), eleman.findtext("link")
+                if title and link:
+                    haberler.append(f"<a href='{html.escape(link.strip(), quote=True)}' class='news-link' target='_blank'> 🔴 {html.escape(title.strip())}</a>")
+                eleman.clear()
+                if len(haberler) >= self.adet: break
+        if haberler:
+            self.html = "".join(haberler)
+            self.etag = resp.headers.get("ETag")
+            self.son_degisim = resp.headers.get("Last-Modified")
+        self.son_kontrol = datetime.now()
+
+izleme_bolumu("haber bandı ve stiller")
+
+@st.cache_resource(on_release=arka_plani_durdur)
+def haber_akisi():
+    return HaberAkisi("https://www.bloomberght.com/rss")
+
+haber_metni = haber_akisi().html
 
 footer_css = f"""
 <style>
@@ -400,72 +2512,109 @@ footer_css = f"""
 """
 st.markdown(footer_css, unsafe_allow_html=True)
 
+izleme_bolumu(f"sayfa: {menu}")
+
 # -----------------------------------------------------------------------------
 # SAYFA 1: GENEL ÖZET
 # -----------------------------------------------------------------------------
 if menu == "📊 Genel Özet":
-    st.title("Portföy Analizi")
+    import plotly.express as px
+    from streamlit_sortables import sort_items
 
-    if 'takip_listesi_bant' not in st.session_state:
-        st.session_state.takip_listesi_bant = {
-            "Dolar/TL": "USDTRY=X", "Euro/TL": "EURTRY=X", 
-            "Gram Altın": "GRAM_ALTIN", "Bitcoin": "BTC-USD"
-        }
-    if 'sag_panel_listesi' not in st.session_state:
-        st.session_state.sag_panel_listesi = {
-            "BIST 100": "XU100.IS", "S&P 500": "^GSPC",
-            "Gram Altın": "GRAM_ALTIN", "Dolar/TL": "USDTRY=X", "Bitcoin": "BTC-USD"
-        }
-
-    @st.cache_data(ttl=3600)
-    def yahoo_arama(kelime):
-        url = f"https://query2.finance.yahoo.com/v1/finance/search?q={kelime}"
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        try:
-            res = requests.get(url, headers=headers, timeout=5)
-            quotes = res.json().get('quotes', [])
-            sonuclar = {}
-            for q in quotes:
-                sembol = q.get('symbol')
-                isim = q.get('shortname', '')
-                borsa = q.get('exchDisp', '')
-                if sembol: sonuclar[f"{sembol} - {isim} ({borsa})"] = sembol
-            return sonuclar
-        except:
-            return {}
+    st.title("Portföy Analizi")
 
-    @st.cache_data(ttl=300) 
-    def dinamik_bant_verisi_cek(takip_sozlugu):
+    def dinamik_bant_verisi_cek(takip_sozlugu, kurlar):
+        # Fiyatı hiç okunamayan kod "—" ile, son bilinen değeri gösterilen kod 🕓 ile işaretlenir
         sonuclar = []
-        try: usd_fiyat = float(yf.Ticker("USDTRY=X").history(period="1d")['Close'].iloc[-1])
-        except: usd_fiyat = 1.0 
-
+        bayat = bayat_kodlar(takip_sozlugu.values())
         for ad, kod in takip_sozlugu.items():
-            try:
-                if kod == "GRAM_ALTIN":
-                    f = (float(yf.Ticker("GC=F").history(period="1d")['Close'].iloc[-1]) / 31.1035) * usd_fiyat
-                    sonuclar.append(f"🟡 GR ALTIN: {f:,.2f} ₺")
-                elif kod == "GRAM_GUMUS":
-                    f = (float(yf.Ticker("SI=F").history(period="1d")['Close'].iloc[-1]) / 31.1035) * usd_fiyat
-                    sonuclar.append(f"🥈 GR GÜMÜŞ: {f:,.2f} ₺")
-                elif kod == "GRAM_PLATIN":
-                    f = (float(yf.Ticker("PL=F").history(period="1d")['Close'].iloc[-1]) / 31.1035) * usd_fiyat
-                    sonuclar.append(f"💍 GR PLATİN: {f:,.2f} ₺")
-                else:
-                    f = float(yf.Ticker(kod).history(period="1d")['Close'].iloc[-1])
-                    birim = "₺" if (".IS" in kod or "TRY" in kod) else "$"
-                    if kod == "GC=F": ikon = "🏆"
-                    elif kod == "SI=F": ikon = "⚙️"
-                    elif kod == "PL=F": ikon = "💎"
-                    elif "TRY" in kod: ikon = "💵"
-                    elif "-USD" in kod: ikon = "🪙"
-                    else: ikon = "📈"
-                    kisa_ad = ad.split('-')[0].strip()[:15]
-                    sonuclar.append(f"{ikon} {kisa_ad}: {f:,.2f} {birim}")
-            except:
-                sonuclar.append(f"⚠️ {ad[:10]}: Hata")
+            if kod == "GRAM_ALTIN":
+                f, etiket, birim = kurlar.tl_degeri("GRAM-ALTIN"), "🟡 GR ALTIN", "₺"
+            elif kod == "GRAM_GUMUS":
+                f, etiket, birim = kurlar.tl_degeri("GRAM-GUMUS"), "🥈 GR GÜMÜŞ", "₺"
+            elif kod == "GRAM_PLATIN":
+                f, etiket, birim = kurlar.tl_degeri("GRAM-PLATIN"), "💍 GR PLATİN", "₺"
+            else:
+                f = kurlar.yerel(kod)[0]
+                birim = "₺" if (".IS" in kod or "TRY" in kod) else "$"
+                if kod == "GC=F": ikon = "🏆"
+                elif kod == "SI=F": ikon = "⚙️"
+                elif kod == "PL=F": ikon = "💎"
+                elif "TRY" in kod: ikon = "💵"
+                elif "-USD" in kod: ikon = "🪙"
+                else: ikon = "📈"
+                etiket = f"{ikon} {ad.split('-')[0].strip()[:15]}"
+            if not f > 0:
+                sonuclar.append(f"⚠️ {ad[:10]}: —")
+            else:
+                sonuclar.append(f"{etiket}: {f:,.2f} {birim}" + (" 🕓" if kod in bayat else ""))
         return sonuclar
 
+    def canli_fiyatlar():
+        # Fragment yenilemelerinde sayfa başındaki anlık görüntü eskir; depodan güncelini alır.
+        # Kod listesi oturumdan okunur: zamanlayıcı tikleri veritabanına gitmez.
+        anlik_simdi = fiyat_anlik_goruntu(st.session_state.sayfa_kodlari)
+        return anlik_simdi, fiyatlari_hesapla(serbest_altin, anlik_simdi)
+
+    def bant_html():
+        ticker_data = dinamik_bant_verisi_cek(st.session_state.takip_listesi_bant, capraz_kur_matrisi(*canli_fiyatlar()))
+        if not ticker_data: ticker_data = ["Gösterilecek veri yok."]
+
+        return f"""
+        <div style="background-color: #0e1117; padding: 0px 10px; border-radius: 5px; border: 1px solid #30333d; overflow: hidden; white-space: nowrap; height: 42px; display: flex; align-items: center;">
+            <div style="display: inline-block; animation: marquee 45s linear infinite; font-family: monospace; font-size: 16px; color: #00ffcc;">
+                {" &nbsp;&nbsp;&nbsp;&nbsp; | &nbsp;&nbsp;&nbsp;&nbsp; ".join(ticker_data)}
+            </div>
+        </div>
+        """
+
+    @st.fragment(run_every=canli_yenileme_araligi())
+    def canli_bant():
+        canli_araligi_denetle()
+        st.markdown(canli_cizim("bant", bant_html), unsafe_allow_html=True)
+
+    @st.fragment(run_every=CANLI_YENILEME_SANIYE)
+    def portfoy_metrikleri(df_ham):
+        anlik_simdi, fiyatlar_simdi = canli_fiyatlar()
+        df_canli = portfoy_degerle(df_ham, anlik_simdi, fiyatlar_simdi)
+        cc1, cc2, cc3 = st.columns(3)
+        if df_canli.attrs["kur_eksik"]:
+            # Dolar varlıkları kursuz toplanırsa toplam olduğundan düşük görünür; eksik toplam gösterilmez
+            cc1.metric("💼 Yatırım", "—")
+            cc2.metric("💎 Güncel", "—")
+            cc3.metric("🚀 Net K/Z", "—")
+            st.caption("🕓 Dolar kuru okunamadı; kur gelene kadar portföy toplamları hesaplanamıyor.")
+            return
+        top_yatirim = df_canli['Yatirim'].sum()
+        top_guncel = df_canli['Guncel'].sum()
+        net_kz = top_guncel - top_yatirim
+        yuzde_kz = (net_kz / top_yatirim * 100) if top_yatirim > 0 else 0 
+          
+        cc1.metric("💼 Yatırım", f"{top_yatirim:,.0f} ₺")
+        cc2.metric("💎 Güncel", f"{top_guncel:,.0f} ₺")
+        cc3.metric("🚀 Net K/Z", f"{net_kz:+,.0f} ₺", f"%{yuzde_kz:.2f}")
+
+    def portfoy_degeri_bolumu():
+        deger_serisi = portfoy_degeri_gecmisi(user_id)
+        if len(deger_serisi) > 1:
+            st.subheader("📈 Portföy Değeri")
+            zirve = deger_serisi['deger'].cummax()
+            dusus = (deger_serisi['deger'] / zirve.where(zirve > 0) - 1) * 100
+            dc1, dc2, dc3 = st.columns(3)
+            dc1.metric("🏔️ Zirve Değer", f"{zirve.iloc[-1]:,.0f} ₺")
+            dc2.metric("📉 Zirveden Düşüş", f"%{dusus.iloc[-1]:.2f}")
+            dc3.metric("🕳️ En Büyük Düşüş", f"%{dusus.min():.2f}")
+            fig_deger = px.line(
+                deger_serisi.rename(columns={'deger': 'Değer', 'yatirim': 'Net Yatırım'}),
+                y=['Değer', 'Net Yatırım'], color_discrete_sequence=["#3b82f6", "#888888"]
+            )
+            fig_deger.update_layout(
+                margin=dict(t=10, b=10, l=10, r=10), xaxis_title=None, yaxis_title=None, legend_title=None,
+                paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", height=300
+            )
+            st.plotly_chart(fig_deger, use_container_width=True)
+            st.write("---")
+
     col_bant, col_ayar = st.columns([12, 1])
     with col_ayar:
         with st.popover("⚙️"):
@@ -510,7 +2659,7 @@ if menu == "📊 Genel Özet":
             st.markdown("**4. Hisse/Fon Ara**")
             arama_kelimesi = st.text_input("Şirket veya Fon Kodu:", placeholder="Örn: Tesla, AKBNK")
             if arama_kelimesi:
-                bulunanlar = yahoo_arama(arama_kelimesi)
+                bulunanlar = sembol_ara(arama_kelimesi)
                 if bulunanlar:
                     secilen = st.selectbox("Sonuçlar:", ["Lütfen Seçin..."] + list(bulunanlar.keys()))
                     if secilen != "Lütfen Seçin...":
@@ -519,45 +2668,21 @@ if menu == "📊 Genel Özet":
                             st.rerun()
 
     with col_bant:
-        ticker_data = dinamik_bant_verisi_cek(st.session_state.takip_listesi_bant)
-        if not ticker_data: ticker_data = ["Gösterilecek veri yok."]
-
-        ticker_html = f"""
-        <div style="background-color: #0e1117; padding: 0px 10px; border-radius: 5px; border: 1px solid #30333d; overflow: hidden; white-space: nowrap; height: 42px; display: flex; align-items: center;">
-            <div style="display: inline-block; animation: marquee 45s linear infinite; font-family: monospace; font-size: 16px; color: #00ffcc;">
-                {" &nbsp;&nbsp;&nbsp;&nbsp; | &nbsp;&nbsp;&nbsp;&nbsp; ".join(ticker_data)}
-            </div>
-        </div>
-        """
-        st.markdown(ticker_html, unsafe_allow_html=True)
+        canli_bant()
         st.markdown("<br>", unsafe_allow_html=True)
         
     ana_kolon, sag_kolon = st.columns([3, 1], gap="large")
+    deger_yeri = None
 
     with ana_kolon:
-        conn = get_db_connection()
-        query = "SELECT sembol, miktar, ort_maliyet, guncel_fiyat FROM varliklar WHERE miktar > 0 AND user_id = %s"
-        df_varlik = pd.read_sql_query(query, conn, params=(user_id,))
+        df_varlik = kullanici_varliklari(user_id)
 
         if df_varlik.empty:
             st.info("Portföyünüzde henüz varlık bulunmuyor. Yan menüden işlem ekleyerek başlayabilirsiniz!")
         else:
-            df_varlik['guncel_fiyat'] = df_varlik['sembol'].apply(lambda x: guncel_fiyat_bul(x, fiyatlar))
-            
-            df_varlik['Yatirim'] = df_varlik['miktar'] * df_varlik['ort_maliyet']
-            df_varlik['Guncel'] = df_varlik['miktar'] * df_varlik['guncel_fiyat']
-            df_varlik['Kar_Zarar'] = df_varlik['Guncel'] - df_varlik['Yatirim']
-            df_varlik['Degisim_%'] = np.where(df_varlik['Yatirim'] > 0, (df_varlik['Kar_Zarar'] / df_varlik['Yatirim']) * 100, 0)
-            
-            top_yatirim = df_varlik['Yatirim'].sum()
+            portfoy_metrikleri(df_varlik)
+            df_varlik = portfoy_degerle(df_varlik, anlik, fiyatlar)
             top_guncel = df_varlik['Guncel'].sum()
-            net_kz = top_guncel - top_yatirim
-            yuzde_kz = (net_kz / top_yatirim * 100) if top_yatirim > 0 else 0 
-              
-            cc1, cc2, cc3 = st.columns(3)
-            cc1.metric("💼 Yatırım", f"{top_yatirim:,.0f} ₺")
-            cc2.metric("💎 Güncel", f"{top_guncel:,.0f} ₺")
-            cc3.metric("🚀 Net K/Z", f"{net_kz:+,.0f} ₺", f"%{yuzde_kz:.2f}")
             
             st.write("---")
             df_gosterim = df_varlik.rename(columns={
@@ -583,8 +2708,8 @@ if menu == "📊 Genel Özet":
             st.dataframe(
                 df_gosterim.style
                 .format({
-                    'Adet': '{:.2f}', 'Maliyet': '{:,.2f} ₺', 
-                    'Fiyat': '{:,.2f} ₺', 'Yatirim': '{:,.2f} ₺', 
+                    'Adet': '{:.2f}', 'Maliyet': '{:,.2f}', 
+                    'Fiyat': '{:,.2f}', 'Yatirim': '{:,.2f} ₺', 
                     'Guncel': '{:,.2f} ₺', 'K/Z (₺)': '{:+,.2f} ₺', 'Değişim (%)': '%{:.2f}'
                 })
                 .map(portfoy_renk, subset=['K/Z (₺)', 'Değişim (%)']),
@@ -592,6 +2717,10 @@ if menu == "📊 Genel Özet":
                 hide_index=True
             )
 
+            # Değer geçmişi ilk görüntülemede ve işlemlerden sonra fiyat geçmişi indirebilir; yeri burada ayrılır,
+            # sayfanın geri kalanı çizildikten sonra doldurulur
+            deger_yeri = st.container()
+
             col_grafik, col_hedef = st.columns([2, 1])
             
             with col_grafik:
@@ -617,10 +2746,8 @@ if menu == "📊 Genel Özet":
                 
             with col_hedef:
                 st.subheader("🎯 Hedef")
-                cursor = conn.cursor()
-                cursor.execute("SELECT ad, tutar FROM hedefler WHERE user_id=%s LIMIT 1", (user_id,))
-                hedef = cursor.fetchone()
-                
+                hedef = kullanici_hedefi(user_id)
+
                 h_ad = hedef[0] if hedef else "Finansal Özgürlük"
                 h_tutar = hedef[1] if hedef else 1000000
                 
@@ -636,12 +2763,11 @@ if menu == "📊 Genel Özet":
                         yeni_ad = st.text_input("Hedef Adı", value=h_ad)
                         yeni_tutar = st.number_input("Hedef Tutar", value=float(h_tutar), step=1000.0)
                         if st.form_submit_button("Kaydet"):
-                            cursor.execute("DELETE FROM hedefler WHERE user_id=%s", (user_id,))
-                            cursor.execute("INSERT INTO hedefler (ad, tutar, user_id) VALUES (%s, %s, %s)", (yeni_ad, yeni_tutar, user_id))
-                            conn.commit()
+                            with portfoy_yazimi(user_id) as conn:
+                                cursor = conn.cursor()
+                                cursor.execute("DELETE FROM hedefler WHERE user_id=%s", (user_id,))
+                                cursor.execute("INSERT INTO hedefler (ad, tutar, user_id) VALUES (%s, %s, %s)", (yeni_ad, yeni_tutar, user_id))
                             st.rerun()
-                            
-        conn.close()
 
     hazir_tablo_varliklar = {
         "Gram Altın": "GRAM_ALTIN", "Gram Gümüş": "GRAM_GUMUS", "Gram Platin": "GRAM_PLATIN",
@@ -698,7 +2824,7 @@ if menu == "📊 Genel Özet":
         st.markdown("**4. Hisse/Fon Ara**")
         arama_tablo = st.text_input("Hisse/Fon Ara:", placeholder="Örn: AAPL, THYAO", key="tablo_ara_popup")
         if arama_tablo:
-            bulunanlar_tablo = yahoo_arama(arama_tablo) 
+            bulunanlar_tablo = sembol_ara(arama_tablo) 
             if bulunanlar_tablo:
                 st.selectbox("Sonuçlar:", ["Lütfen Seçin..."] + list(bulunanlar_tablo.keys()), key="tablo_sonuc_popup")
                 st.button("➕ Arama Sonucunu Ekle", on_click=arama_ekle_aksiyonu_temp, kwargs={"bulunanlar": bulunanlar_tablo}, use_container_width=True, key="btn_ara")
@@ -711,37 +2837,16 @@ if menu == "📊 Genel Özet":
     with sag_kolon:
         st.markdown("<h3 style='margin:0; margin-bottom: 10px; white-space:nowrap; font-size:20px;'>📊 Canlı Piyasa</h3>", unsafe_allow_html=True)
 
-        @st.cache_data(ttl=300)
-        def tablo_verisi_hazirla_html(sozluk):
+        def tablo_verisi_hazirla_html(sozluk, kurlar):
             satirlar_html = ""
-            try:
-                usd_hist = yf.Ticker("USDTRY=X").history(period="5d")['Close']
-            except:
-                usd_hist = None
-            
+            bayat = bayat_kodlar(sozluk.values())
             for ad, kod in sozluk.items():
                 try:
-                    if kod in ["GRAM_ALTIN", "GRAM_GUMUS", "GRAM_PLATIN"]:
-                        ons_kod = "GC=F" if kod == "GRAM_ALTIN" else ("SI=F" if kod == "GRAM_GUMUS" else "PL=F")
-                        ons_data = yf.Ticker(ons_kod).history(period="5d")['Close']
-                        df_ortak = pd.concat([ons_data, usd_hist], axis=1, keys=['ONS', 'USD']).ffill().dropna()
-                        
-                        if not df_ortak.empty:
-                            bugun = (float(df_ortak['ONS'].iloc[-1]) * float(df_ortak['USD'].iloc[-1])) / 31.1035
-                            if len(df_ortak) > 1:
-                                dun = (float(df_ortak['ONS'].iloc[-2]) * float(df_ortak['USD'].iloc[-2])) / 31.1035
-                            else:
-                                dun = bugun
-                        else:
-                            bugun, dun = 0.0, 0.0
-                    else:
-                        fiyatlar = yf.Ticker(kod).history(period="5d")['Close'].dropna()
-                        if not fiyatlar.empty:
-                            bugun = float(fiyatlar.iloc[-1])
-                            dun = float(fiyatlar.iloc[-2]) if len(fiyatlar) > 1 else bugun
-                        else:
-                            bugun, dun = 0.0, 0.0
-                    
+                    # GRAM_ALTIN gibi eski bant kodları çapraz kur tablosundaki GRAM-ALTIN karşılığından okunur
+                    bugun, dun = kurlar.yerel(BANT_TAKMA_ADLARI.get(kod, kod))
+                    if not bugun > 0: raise KeyError(kod)
+                    if kod in bayat: ad = f"🕓 {ad}"
+
                     degisim_yuzde = ((bugun - dun) / dun) * 100 if dun > 0 else 0.0
                     renk = "#10b981" if degisim_yuzde > 0 else "#ef4444"
                     ok = "▲" if degisim_yuzde > 0 else "▼"
@@ -754,15 +2859,16 @@ if menu == "📊 Genel Özet":
                 except Exception as e:
                     satirlar_html += f'<tr style="border-bottom: 1px solid #2d3748;">'
                     satirlar_html += f'<td style="padding: 10px 5px; color: #e2e8f0; font-size: 13px; font-weight: 500; vertical-align: middle; white-space: nowrap;">{ad[:15]}</td>'
-                    satirlar_html += f'<td style="padding: 10px 5px; color: #ffffff; font-weight: 600; text-align: right; font-size: 13px; vertical-align: middle; white-space: nowrap;">0.00</td>'
-                    satirlar_html += f'<td style="padding: 10px 5px; color: #888888; font-weight: 600; text-align: right; font-size: 13px; vertical-align: middle; white-space: nowrap;">0.00%</td>'
+                    satirlar_html += f'<td style="padding: 10px 5px; color: #888888; font-weight: 600; text-align: right; font-size: 13px; vertical-align: middle; white-space: nowrap;">—</td>'
+                    satirlar_html += f'<td style="padding: 10px 5px; color: #888888; font-weight: 600; text-align: right; font-size: 13px; vertical-align: middle; white-space: nowrap;">—</td>'
                     satirlar_html += f'</tr>'
             return satirlar_html
 
-        html_govde = tablo_verisi_hazirla_html(st.session_state.sag_panel_listesi)
-        
-        if html_govde:
-            st.markdown(f"""<div style="background-color: #111827; padding: 12px; border-radius: 12px; border: 1px solid #1f2937; box-shadow: 0 4px 6px -1px rgba(0,0,0,0.5); margin-bottom: 15px;">
+        def piyasa_tablosu_html():
+            html_govde = tablo_verisi_hazirla_html(st.session_state.sag_panel_listesi, capraz_kur_matrisi(*canli_fiyatlar()))
+            if not html_govde:
+                return None
+            return f"""<div style="background-color: #111827; padding: 12px; border-radius: 12px; border: 1px solid #1f2937; box-shadow: 0 4px 6px -1px rgba(0,0,0,0.5); margin-bottom: 15px;">
 <table style="width: 100%; border-collapse: collapse; font-family: inherit;">
 <thead>
 <tr style="border-bottom: 2px solid #374151; text-align: left;">
@@ -775,31 +2881,62 @@ if menu == "📊 Genel Özet":
 {html_govde}
 </tbody>
 </table>
-</div>""", unsafe_allow_html=True)
-        else:
-            st.info("Tablo boş.")
+</div>"""
+
+        @st.fragment(run_every=canli_yenileme_araligi())
+        def canli_piyasa_tablosu():
+            canli_araligi_denetle()
+            html = canli_cizim("piyasa_tablosu", piyasa_tablosu_html)
+            if html:
+                st.markdown(html, unsafe_allow_html=True)
+            else:
+                st.info("Tablo boş.")
+
+        canli_piyasa_tablosu()
 
         if st.button("⚙️ Düzenle", key="tablo_ayar_buton_alt", use_container_width=True):
             st.session_state.temp_liste = st.session_state.sag_panel_listesi.copy()
             tablo_ayarlari_popup()
 
+    if deger_yeri is not None:
+        with deger_yeri, st.spinner("Portföy değeri geçmişi hesaplanıyor..."):
+            portfoy_degeri_bolumu()
+
 # -----------------------------------------------------------------------------
 # SAYFA 2: ISI HARİTASI
 # -----------------------------------------------------------------------------
 elif menu == "🔥 Isı Haritası":
+    @st.cache_data(max_entries=32)
+    def isi_haritasi_html(df):
+        # Tüm kutular tek bir CSS grid içinde, tek geçişte üretilir; Streamlit'e tek öğe gönderilir
+        y = df['Yuzde'].to_numpy()
+        bg = pd.Series(np.select(
+            [y >= 10, y >= 3, y >= 0, y <= -10, y <= -3],
+            ["#059669", "#10b981", "#34d399", "#be123c", "#e11d48"], default="#fb7185"))
+        ok = pd.Series(np.where(y >= 0, "▲", "▼"))
+        isim = df['sembol'].map(html.escape)
+        f_size = pd.Series(np.where(df['sembol'].str.len() > 12, "14px", "18px"))
+        kutular = (
+            '<div style="background-color: ' + bg + '; padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">'
+            + '<div style="font-size: ' + f_size + '; font-weight: bold; margin-bottom: 10px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;" title="' + isim + '">' + isim + '</div>'
+            + '<div style="font-size: 26px; font-weight: bold; margin-bottom: 10px;">' + ok + ' %' + df['Yuzde'].abs().map("{:.2f}".format) + '</div>'
+            + '<div style="font-size: 16px; margin-top: 10px; font-weight: 500;">' + df['Tutar'].map("{:,.0f} ₺".format) + '</div>'
+            + '<div style="font-size: 13px; opacity: 0.9; margin-top: 5px;">(' + df['KZ_TL'].map("{:+,.0f} ₺".format) + ')</div>'
+            + '</div>'
+        )
+        return ('<div style="display: grid; grid-template-columns: repeat(auto-fill, minmax(220px, 1fr)); gap: 15px;">'
+                + "".join(kutular) + '</div>')
+
     st.title("Portföy Isı Haritası")
     st.write("Varlıklarınızın anlık kar/zarar durumunu renklerle analiz edin.")
     
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT sembol, miktar, ort_maliyet, guncel_fiyat FROM varliklar WHERE miktar > 0 AND user_id=%s", conn, params=(user_id,))
-    conn.close()
-    
+    df = kullanici_varliklari(user_id)
+
     if df.empty:
         st.warning("Görüntülenecek veri bulunamadı.")
     else:
-        df['Tutar'] = df['miktar'] * df['guncel_fiyat']
-        df['KZ_TL'] = (df['guncel_fiyat'] - df['ort_maliyet']) * df['miktar']
-        df['Yuzde'] = np.where(df['ort_maliyet'] > 0, ((df['guncel_fiyat'] - df['ort_maliyet']) / df['ort_maliyet']) * 100, 0.0)
+        df = portfoy_degerle(df, anlik, fiyatlar)
+        df = df.rename(columns={'Guncel': 'Tutar', 'Kar_Zarar': 'KZ_TL', 'Degisim_%': 'Yuzde'})
         df = df.sort_values(by="Tutar", ascending=False)
         
         legend_html = """
@@ -812,38 +2949,12 @@ elif menu == "🔥 Isı Haritası":
         """
         st.markdown(legend_html, unsafe_allow_html=True)
         
-        sutun_sayisi = 4
-        satirlar = df.to_dict('records')
-        
-        for i in range(0, len(satirlar), sutun_sayisi):
-            grup = satirlar[i:i+sutun_sayisi]
-            cols = st.columns(sutun_sayisi)
-            
-            for col, row in zip(cols, grup):
-                y = row['Yuzde']
-                if y >= 0:
-                    ok = "▲"
-                    if y >= 10: bg = "#059669"
-                    elif y >= 3: bg = "#10b981"
-                    else: bg = "#34d399"
-                else:
-                    ok = "▼"
-                    if y <= -10: bg = "#be123c"
-                    elif y <= -3: bg = "#e11d48"
-                    else: bg = "#fb7185"
-                
-                isim = row['sembol']
-                f_size = "14px" if len(isim) > 12 else "18px"
-                
-                kutu_html = f"""
-                <div style="background-color: {bg}; padding: 20px; border-radius: 10px; color: white; text-align: center; box-shadow: 0 4px 6px rgba(0,0,0,0.1); margin-bottom: 15px;">
-                    <div style="font-size: {f_size}; font-weight: bold; margin-bottom: 10px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;" title="{isim}">{isim}</div>
-                    <div style="font-size: 26px; font-weight: bold; margin-bottom: 10px;">{ok} %{abs(y):.2f}</div>
-                    <div style="font-size: 16px; margin-top: 10px; font-weight: 500;">{row['Tutar']:,.0f} ₺</div>
-                    <div style="font-size: 13px; opacity: 0.9; margin-top: 5px;">({row['KZ_TL']:+,.0f} ₺)</div>
-                </div>
-                """
-                col.markdown(kutu_html, unsafe_allow_html=True)
+        # Görünen hassasiyete yuvarlanmış veri önbellek anahtarıdır; ekranda fark yaratmayan fiyat oynamaları HTML'i yeniden üretmez
+        gorunum = pd.DataFrame({
+            'sembol': df['sembol'], 'Tutar': df['Tutar'].round(0),
+            'KZ_TL': df['KZ_TL'].round(0), 'Yuzde': df['Yuzde'].round(2)
+        }).reset_index(drop=True)
+        st.markdown(isi_haritasi_html(gorunum), unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
 # SAYFA 3: VARLIKLAR & İŞLEMLER
@@ -873,30 +2984,12 @@ elif menu == "💵 Varlıklar & İşlemler":
     with col_orta:
         st.title("Varlık & İşlem Yönetimi")
 
-        @st.cache_data(ttl=3600)
-        def yahoo_arama_islem(kelime):
-            import requests
-            url = f"https://query2.finance.yahoo.com/v1/finance/search?q={kelime}"
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            try:
-                res = requests.get(url, headers=headers, timeout=5)
-                quotes = res.json().get('quotes', [])
-                sonuclar = {}
-                for q in quotes:
-                    sembol = q.get('symbol')
-                    isim = q.get('shortname', '')
-                    borsa = q.get('exchDisp', '')
-                    if sembol: sonuclar[f"{sembol} - {isim} ({borsa})"] = sembol
-                return sonuclar
-            except:
-                return {}
-
         st.markdown("### 🔍 Hisse, Fon veya Kripto Ara")
         arama_terimi = st.text_input("Şirket veya Kripto Adı Yazın:", placeholder="Örn: Tesla, THYAO, BTC...", help="Aradığınız varlığı seçtiğinizde aşağıdaki forma otomatik eklenecektir.")
         
         secilen_sembol = ""
         if arama_terimi:
-            sonuclar = yahoo_arama_islem(arama_terimi)
+            sonuclar = sembol_ara(arama_terimi)
             if sonuclar:
                 secim = st.selectbox("Bulunan Sonuçlar:", ["Seçiniz..."] + list(sonuclar.keys()))
                 if secim != "Seçiniz...":
@@ -938,6 +3031,7 @@ elif menu == "💵 Varlıklar & İşlemler":
                 elle_giris = c3.text_input("Veya Hisse/Kripto Kodu", value=secilen_sembol, placeholder="Örn: AAPL, THYAO.IS")
                 
                 c4, c5, c6 = st.columns([1, 2, 2])
+                islem_tarihi = c4.date_input("İşlem Tarihi", value=date.today(), max_value=date.today())
                 miktar = c5.number_input("Adet / Miktar", min_value=0.0000, format="%f", step=1.0)
                 fiyat = c6.number_input("Birim Fiyat (₺ veya $)", min_value=0.00, format="%f", step=10.0)
                 
@@ -955,90 +3049,113 @@ elif menu == "💵 Varlıklar & İşlemler":
                         maden_doviz_anahtarlar = ["USD", "EUR", "GBP", "CHF", "TRY", "JPY", "GRAM", "ALTIN", "CEYREK", "GUMUS", "PLATIN", "GC=F", "SI=F", "PL=F"]
                         tur = "Döviz/Emtia" if any(x in sembol for x in maden_doviz_anahtarlar) else "Hisse/Fon"
                         
-                        conn = get_db_connection()
-                        cursor = conn.cursor()
-                        cursor.execute("SELECT id, miktar, ort_maliyet FROM varliklar WHERE sembol=%s AND user_id=%s", (sembol, user_id))
-                        mevcut = cursor.fetchone()
-                        
-                        if tip == "SATIS" and (not mevcut or mevcut[1] < miktar):
-                            st.error("Hata: Yetersiz Bakiye! Portföyünüzde bu kadar varlık yok.")
-                        else:
-                            if tip == "ALIS":
-                                if mevcut:
-                                    v_id, esk_m, esk_mal = mevcut
-                                    yeni_m = esk_m + miktar
-                                    yeni_mal = ((esk_m * esk_mal) + (miktar * fiyat)) / yeni_m
-                                    cursor.execute("UPDATE varliklar SET miktar=%s, ort_maliyet=%s, guncel_fiyat=%s, tur=%s WHERE id=%s", (yeni_m, yeni_mal, fiyat, tur, v_id))
+                        try:
+                            with portfoy_yazimi(user_id) as conn:
+                                # "Bugün" veritabanının günüdür; uygulama sunucusunun saat dilimi defter sırasını belirlemez
+                                cursor = conn.cursor()
+                                cursor.execute("SELECT CURRENT_DATE")
+                                if islem_tarihi < cursor.fetchone()[0]:
+                                    # Geriye tarihli işlem defterin ortasına girer; pozisyon o noktadan yeniden hesaplanır
+                                    yeni_m, yeni_mal = gecmis_tarihli_islem_ekle(cursor, user_id, sembol, tip, miktar, fiyat, islem_tarihi, tur)
                                 else:
-                                    cursor.execute("INSERT INTO varliklar (tur, sembol, miktar, ort_maliyet, guncel_fiyat, user_id) VALUES (%s,%s,%s,%s,%s,%s)", (tur, sembol, miktar, fiyat, fiyat, user_id))
+                                    yeni_m, yeni_mal, _ = hazir_sorgu(cursor, "islem_kaydet", (user_id, sembol, tip, miktar, fiyat, tur, islem_tarihi)).fetchone()
+                            st.success(f"{sembol} işlemi başarıyla kaydedildi! Yeni pozisyon: {yeni_m:,.4f} adet, ort. maliyet {yeni_mal:,.2f}")
+                        except ValueError:
+                            st.error("Hata: Yetersiz Bakiye! Bu tarihte portföyünüzde bu kadar varlık yok.")
+                        except psycopg2.errors.CheckViolation as e:
+                            if e.diag.message_primary == "YETERSIZ_BAKIYE":
+                                st.error("Hata: Yetersiz Bakiye! Portföyünüzde bu kadar varlık yok.")
                             else:
-                                v_id, esk_m, esk_mal = mevcut
-                                yeni_m = esk_m - miktar
-                                cursor.execute("UPDATE varliklar SET miktar=%s, guncel_fiyat=%s WHERE id=%s", (yeni_m, fiyat, v_id))
-                                
-                            cursor.execute("INSERT INTO islemler (sembol, islem_tipi, miktar, fiyat, tarih, user_id) VALUES (%s,%s,%s,%s,%s,%s)", (sembol, tip, miktar, fiyat, date.today().strftime("%Y-%m-%d"), user_id))
-                            conn.commit()
-                            st.success(f"{sembol} işlemi başarıyla kaydedildi!")
-                        
-                        conn.close()
+                                st.error("İşlem kaydedilemedi, lütfen girdiğiniz değerleri kontrol edin.")
 
-        tab1, tab2 = st.tabs(["💼 Mevcut Varlıklarım", "📜 İşlem Geçmişi (Silme)"])
+        tab1, tab2 = st.tabs(["💼 Mevcut Varlıklarım", "📜 İşlem Geçmişi (Düzenle / Sil)"])
         
         with tab1:
-            conn = get_db_connection()
-            df_varlik = pd.read_sql_query("SELECT tur, sembol, miktar, ort_maliyet, guncel_fiyat FROM varliklar WHERE miktar > 0 AND user_id=%s", conn, params=(user_id,))
-            conn.close()
+            df_varlik = kullanici_varliklari(user_id, detay=True)
             if not df_varlik.empty:
                 df_varlik['Toplam_Tutar'] = df_varlik['miktar'] * df_varlik['guncel_fiyat']
                 df_varlik['Kar_Zarar'] = df_varlik['Toplam_Tutar'] - (df_varlik['miktar'] * df_varlik['ort_maliyet'])
+                skorlar, hesaplanan = hazir_gostergeler([s for s in df_varlik['sembol'] if s != "TRY"])
+                if not skorlar.empty:
+                    rozet = skorlar['puan'].dropna().map(lambda p: f"{p:.0f} " + ("🚀" if p >= 75 else "⚖️" if p == 50 else "🌧️"))
+                    df_varlik['Skor'] = df_varlik['sembol'].map(rozet).fillna("")
                 st.dataframe(df_varlik, use_container_width=True, hide_index=True)
+                if hesaplanan:
+                    st.caption(f"⏳ {len(hesaplanan)} varlığın skoru arka planda hesaplanıyor; sayfa yenilendiğinde görünecek.")
             else:
                 st.info("Kayıtlı varlık yok.")
                 
         with tab2:
-            conn = get_db_connection()
-            df_islem = pd.read_sql_query("SELECT id, tarih, sembol, islem_tipi, miktar, fiyat FROM islemler WHERE user_id=%s ORDER BY id DESC", conn, params=(user_id,))
-            
+            f1, f2, f3, f4 = st.columns([2, 1, 2, 1])
+            f_sembol = f1.text_input("Sembol", placeholder="Örn: THYAO.IS", key="islem_f_sembol").strip().upper()
+            f_tip = f2.selectbox("Tip", ["Tümü", "ALIS", "SATIS"], key="islem_f_tip")
+            f_aralik = f3.date_input("Tarih Aralığı", value=(), max_value=date.today(), key="islem_f_tarih")
+            sayfa_boyutu = f4.selectbox("Satır", [25, 50, 100], index=1, key="islem_sayfa_boyutu")
+            filtre = {
+                "sembol": f_sembol or None,
+                "tip": None if f_tip == "Tümü" else f_tip,
+                "baslangic": f_aralik[0] if len(f_aralik) > 0 else None,
+                "bitis": f_aralik[1] if len(f_aralik) > 1 else None,
+            }
+
+            # Sayfa imleçleri: her sayfanın üst sınırı olan id'ler yığını; filtre değişince ilk sayfaya dönülür
+            if st.session_state.get("islem_filtre") != (filtre, sayfa_boyutu):
+                st.session_state.islem_filtre = (filtre, sayfa_boyutu)
+                st.session_state.islem_imlecleri = [None]
+            imlecler = st.session_state.islem_imlecleri
+
+            with db_baglantisi() as conn:
+                df_islem, sonraki_var = islem_sayfasi(conn, user_id, filtre, imlecler[-1], sayfa_boyutu)
+                # Silmeyle boşalan (ilk olmayan) sayfadan, içinde işlem kalan bir önceki sayfaya dönülür
+                while df_islem.empty and len(imlecler) > 1:
+                    imlecler.pop()
+                    df_islem, sonraki_var = islem_sayfasi(conn, user_id, filtre, imlecler[-1], sayfa_boyutu)
+                toplam = islem_sayisi(conn, user_id, filtre)
+
             if not df_islem.empty:
                 st.dataframe(df_islem, use_container_width=True, hide_index=True)
+                p1, p2, p3 = st.columns([1, 2, 1])
+                if p1.button("◀ Önceki", disabled=len(imlecler) == 1, use_container_width=True):
+                    imlecler.pop()
+                    st.rerun()
+                toplam_metin = f"{SAYIM_SINIRI:,}+" if toplam > SAYIM_SINIRI else f"{toplam:,}"
+                p2.markdown(f"<div style='text-align: center; color: #a3a3a3; padding-top: 8px;'>Sayfa {len(imlecler)} · {toplam_metin} işlem</div>", unsafe_allow_html=True)
+                if p3.button("Sonraki ▶", disabled=not sonraki_var, use_container_width=True):
+                    imlecler.append(int(df_islem['id'].iloc[-1]))
+                    st.rerun()
                 st.markdown("---")
                 st.subheader("🗑️ İşlem Sil")
-                sil_id = st.selectbox("Silmek istediğiniz işlemin ID numarasını seçin:", df_islem['id'].tolist())
+                sil_id = st.selectbox("Silmek istediğiniz işlemin ID numarasını seçin (bu sayfadaki işlemler):", df_islem['id'].tolist())
                 if st.button("Seçili İşlemi Sil (Geri Alınamaz)"):
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT sembol FROM islemler WHERE id=%s AND user_id=%s", (sil_id, user_id))
-                    sembol_sil = cursor.fetchone()[0]
-                    
-                    cursor.execute("DELETE FROM islemler WHERE id=%s", (sil_id,))
-                    
-                    cursor.execute("SELECT islem_tipi, miktar, fiyat FROM islemler WHERE sembol=%s AND user_id=%s ORDER BY id ASC", (sembol_sil, user_id))
-                    kalan_islemler = cursor.fetchall()
-                    
-                    toplam_adet = 0.0
-                    toplam_maliyet_tutari = 0.0
-                    
-                    for t, m, f in kalan_islemler:
-                        if t == "ALIS":
-                            toplam_maliyet_tutari += (m * f)
-                            toplam_adet += m
-                        elif t == "SATIS" and toplam_adet > 0:
-                            ort_birim = toplam_maliyet_tutari / toplam_adet
-                            toplam_adet -= m
-                            toplam_maliyet_tutari -= (m * ort_birim)
-                    
-                    yeni_ort = (toplam_maliyet_tutari / toplam_adet) if toplam_adet > 0 else 0
-                    
-                    if toplam_adet <= 0:
-                        cursor.execute("UPDATE varliklar SET miktar=0, ort_maliyet=0 WHERE sembol=%s AND user_id=%s", (sembol_sil, user_id))
-                    else:
-                        cursor.execute("UPDATE varliklar SET miktar=%s, ort_maliyet=%s WHERE sembol=%s AND user_id=%s", (toplam_adet, yeni_ort, sembol_sil, user_id))
-                    
-                    conn.commit()
+                    with portfoy_yazimi(user_id) as conn:
+                        islem_sil(conn.cursor(), user_id, int(sil_id))
                     st.success("İşlem silindi ve maliyetler yeniden hesaplandı!")
                     st.rerun()
+
+                st.markdown("---")
+                st.subheader("✏️ İşlem Düzenle")
+                duz_id = st.selectbox("Düzenlemek istediğiniz işlemin ID numarasını seçin (bu sayfadaki işlemler):", df_islem['id'].tolist(), key="duzenle_id")
+                secili = df_islem[df_islem['id'] == duz_id].iloc[0]
+                with st.form("islem_duzenle_formu"):
+                    d1, d2, d3 = st.columns(3)
+                    yeni_miktar = d1.number_input("Adet / Miktar", min_value=0.0, value=float(secili['miktar']), format="%f", step=1.0)
+                    yeni_fiyat = d2.number_input("Birim Fiyat (₺ veya $)", min_value=0.0, value=float(secili['fiyat']), format="%f", step=10.0)
+                    yeni_tarih = d3.date_input("İşlem Tarihi", value=secili['tarih'], max_value=date.today())
+                    if st.form_submit_button("💾 Değişikliği Kaydet", use_container_width=True):
+                        if yeni_miktar <= 0:
+                            st.error("Miktar 0'dan büyük olmalıdır.")
+                        else:
+                            try:
+                                with portfoy_yazimi(user_id) as conn:
+                                    islem_duzenle(conn.cursor(), user_id, int(duz_id), yeni_miktar, yeni_fiyat, yeni_tarih)
+                                st.success("İşlem güncellendi ve maliyetler yeniden hesaplandı!")
+                                st.rerun()
+                            except ValueError:
+                                st.error("Hata: Bu değişiklik sonrası satışlar eldeki miktarı aşıyor.")
+            elif any(filtre.values()):
+                st.info("Filtreye uyan işlem bulunamadı.")
             else:
                 st.info("İşlem geçmişi boş.")
-            conn.close()
 
     with col_sag:
         st.write("### Sabit Piyasa Verileri")
@@ -1135,23 +3252,23 @@ elif menu == "🧮 Hesap Araçları":
                 k_taksit = c1.number_input("💵 Aylık Ödenecek Taksit (₺)", min_value=0.0, step=1000.0, value=5000.0)
                 k_tutar = 0 
                 
-            k_vade = c2.selectbox("📅 Vade (Ay)", [12, 24, 36, 48, 60, 120])
+            k_vade = c2.selectbox("📅 Vade (Ay)", KREDI_VADELERI)
             k_faiz = c3.number_input("📈 Aylık Faiz Oranı (%)", min_value=0.0, format="%f", value=float(varsayilan_oran))
 
         st.markdown("<br>", unsafe_allow_html=True)
 
         if st.button("🔄 KREDİ DETAYLARINI HESAPLA", use_container_width=True, type="primary"):
             if k_faiz > 0 and (k_tutar > 0 or k_taksit > 0):
-                r = (k_faiz / 100.0) * vergi_carpani
                 n = k_vade
+                taksit_modu = hesap_modu == "Çekilecek Tutara Göre (Taksit Hesapla)"
                 
-                if hesap_modu == "Çekilecek Tutara Göre (Taksit Hesapla)":
-                    ana_deger = k_tutar * (r * (1 + r)**n) / ((1 + r)**n - 1)
+                if taksit_modu:
+                    ana_deger = float(kredi_taksiti(k_tutar, k_faiz, n, vergi_carpani))
                     baslik = "AYLIK ÖDEYECEĞİNİZ TAKSİT"
                     toplam_odeme = ana_deger * n
                     toplam_faiz = toplam_odeme - k_tutar
                 else:
-                    ana_deger = k_taksit * ((1 + r)**n - 1) / (r * (1 + r)**n)
+                    ana_deger = float(cekilebilir_tutar(k_taksit, k_faiz, n, vergi_carpani))
                     baslik = "ÇEKEBİLECEĞİNİZ MAKSİMUM TUTAR"
                     toplam_odeme = k_taksit * n
                     toplam_faiz = toplam_odeme - ana_deger
@@ -1175,6 +3292,28 @@ elif menu == "🧮 Hesap Araçları":
     </div>
 </div>
 """, unsafe_allow_html=True)
+
+                st.markdown("<br>", unsafe_allow_html=True)
+                tab_plan, tab_duyarlilik = st.tabs(["📆 Ödeme Planı", "🧮 Faiz x Vade Duyarlılığı"])
+
+                with tab_plan:
+                    plan = odeme_plani(k_tutar if taksit_modu else ana_deger, k_faiz, n, vergi_carpani)
+                    st.dataframe(
+                        plan.style.format({"Taksit": "{:,.2f} ₺", "Anapara": "{:,.2f} ₺", "Faiz": "{:,.2f} ₺",
+                                           "BSMV+KKDF": "{:,.2f} ₺", "Kalan Borç": "{:,.2f} ₺"}),
+                        use_container_width=True, hide_index=True, height=400
+                    )
+
+                with tab_duyarlilik:
+                    st.caption(f"{kredi_turu} için %{varsayilan_oran:.2f} varsayılan oranı etrafında "
+                               f"{'aylık taksit' if taksit_modu else 'çekilebilir tutar'} (₺). Seçili vade vurgulanmıştır.")
+                    matris = kredi_duyarliligi(k_tutar if taksit_modu else k_taksit, duyarlilik_oranlari(varsayilan_oran),
+                                               KREDI_VADELERI, vergi_carpani, taksit_modu)
+                    st.dataframe(
+                        matris.style.format("{:,.2f}")
+                        .set_properties(subset=[f"{n} Ay"], **{"font-weight": "bold", "background-color": "rgba(59, 130, 246, 0.15)"}),
+                        use_container_width=True, height=400
+                    )
                 
                 components.html("""
                 <script>
@@ -1230,7 +3369,7 @@ elif menu == "🧮 Hesap Araçları":
         st.markdown("**2. Hisse, Fon veya Kripto Ara**")
         ara_kelime = st.text_input("Arama Kelimesi:", placeholder="Örn: THYAO, AAPL, SOL", key=f"ara_{tur_belirteci}")
         if ara_kelime:
-            bulunanlar = yahoo_arama(ara_kelime)
+            bulunanlar = sembol_ara(ara_kelime)
             if bulunanlar:
                 sec_ara = st.selectbox("Sonuçlar:", ["Lütfen Seçin..."] + list(bulunanlar.keys()), key=f"sonuc_{tur_belirteci}")
                 if st.button("✅ Arama Sonucunu Onayla", key=f"btn_ara_{tur_belirteci}", use_container_width=True, type="primary"):
@@ -1280,39 +3419,18 @@ elif menu == "🧮 Hesap Araçları":
         if st.button("🔄 ANLIK KURLARLA HESAPLA", use_container_width=True, type="primary"):
             with st.spinner("Piyasa verileri çekiliyor..."):
                 
-                def tl_degeri_hesapla(kod):
-                    if kod == "TRY": return 1.0
-                    usd_kuru = veri_getir("USDTRY=X")
-                    if usd_kuru == 0: usd_kuru = 1.0
-                    
-                    has_altin_gram_tl = (veri_getir("GC=F") * usd_kuru) / 31.1035
-                    
-                    if kod == "GRAM-ALTIN": return has_altin_gram_tl
-                    if kod == "CEYREK-ALTIN": return has_altin_gram_tl * 1.6065
-                    if kod == "YARIM-ALTIN": return has_altin_gram_tl * 3.2130
-                    if kod == "TAM-ALTIN": return has_altin_gram_tl * 6.4260
-                    if kod == "ATA-ALTIN": return has_altin_gram_tl * 6.6080
-                    if kod == "ONS-ALTIN": return veri_getir("GC=F") * usd_kuru
-                    
-                    if kod == "GRAM-GUMUS": return (veri_getir("SI=F") * usd_kuru) / 31.1035
-                    if kod == "GRAM-PLATIN": return (veri_getir("PL=F") * usd_kuru) / 31.1035
-                    
-                    fiyat = veri_getir(kod)
-                    if ".IS" in kod or "TRY" in kod:
-                        return fiyat
-                    else:
-                        return fiyat * usd_kuru
+                kur_matrisi = capraz_kur_matrisi(anlik, fiyatlar)
 
                 try:
                     k_kod = st.session_state.cev_kaynak_kod
                     h_kod = st.session_state.cev_hedef_kod
                     
-                    kaynak_tl = tl_degeri_hesapla(k_kod)
-                    hedef_tl = tl_degeri_hesapla(h_kod)
+                    kaynak_tl = kur_matrisi.tl_degeri(k_kod)
+                    hedef_tl = kur_matrisi.tl_degeri(h_kod)
                     
                     if hedef_tl > 0 and kaynak_tl > 0:
-                        sonuc = (cevrilecek_tutar * kaynak_tl) / hedef_tl
-                        capraz_kur = kaynak_tl / hedef_tl
+                        capraz_kur = kur_matrisi.oran(k_kod, h_kod)
+                        sonuc = cevrilecek_tutar * capraz_kur
                         
                         st.markdown(f"""
                         <div style="background: linear-gradient(90deg, #1e3a8a, #3b82f6); padding: 25px; border-radius: 15px; text-align: center; color: white; box-shadow: 0 4px 15px rgba(0,0,0,0.2); margin-top: 15px;">
@@ -1378,23 +3496,19 @@ elif menu == "📅 Piyasa Takvimi":
         st.subheader("Hisse Temettü Tarayıcı")
         st.write("Portföyünüzdeki hisselerin temettü (kâr payı) verimleri Yahoo Finance üzerinden taranıyor...")
         
-        conn = get_db_connection()
-        hisseler = pd.read_sql_query("SELECT sembol, miktar FROM varliklar WHERE miktar > 0 AND user_id=%s", conn, params=(user_id,))
-        conn.close()
-        
+        hisseler = kullanici_varliklari(user_id)
+
         yoksay = ["TRY=X", "GRAM", "=F", "BTC", "ETH", "ALTIN", "GUMUS", "PLATIN", "USD", "EUR"]
+        miktarlar = {row['sembol']: row['miktar'] for _, row in hisseler.iterrows() if not any(x in row['sembol'] for x in yoksay)}
         temettu_listesi = []
+        tablo_yeri = st.empty()
         
         with st.spinner('Geçmiş ve gelecek temettü verileri hesaplanıyor... Lütfen bekleyin.'):
-            for _, row in hisseler.iterrows():
-                sembol = row['sembol']
-                miktar = row['miktar']
-                
-                if any(x in sembol for x in yoksay): 
+            for sembol, info in temel_veri_deposu().toplu_al(list(miktarlar)):
+                if not info:
                     continue
-                    
+                miktar = miktarlar[sembol]
                 try:
-                    info = yf.Ticker(sembol).info
                     tarih = "-"
                     tahmini_tutar_str = "-"
                     
@@ -1413,12 +3527,12 @@ elif menu == "📅 Piyasa Takvimi":
                     if tarih != "-" or tahmini_tutar_str != "-":
                         sade_sembol = sembol.replace(".IS", "")
                         temettu_listesi.append({"Hisse": sade_sembol, "Beklenen Tarih": tarih, "Tahmini Tutar": tahmini_tutar_str})
+                        # Satırlar çözüldükçe tabloya eklenir
+                        tablo_yeri.dataframe(pd.DataFrame(temettu_listesi), hide_index=True, use_container_width=True)
                 except:
                     continue
                     
-        if temettu_listesi:
-            st.dataframe(pd.DataFrame(temettu_listesi), hide_index=True, use_container_width=True)
-        else:
+        if not temettu_listesi:
             st.info("Portföyünüzdeki hisselerde yakın zamanda bir temettü ödemesi bulunamadı.")
 
 
@@ -1446,26 +3560,6 @@ elif menu == "📈 Piyasa Analizi":
     
     secilen_sembol = None  
     
-    @st.cache_data(ttl=3600)  
-    def sembol_ara(kelime):
-        url = f"https://query2.finance.yahoo.com/v1/finance/search?q={kelime}"
-        headers = {'User-Agent': 'Mozilla/5.0'} 
-        try:
-            res = requests.get(url, headers=headers)
-            data = res.json()
-            quotes = data.get('quotes', [])
-            
-            sonuclar = []
-            for q in quotes:
-                symbol = q.get('symbol')
-                name = q.get('shortname', 'İsimsiz')
-                exch = q.get('exchange', 'Bilinmiyor')
-                if symbol:
-                    sonuclar.append(f"{symbol} | {name} ({exch})")
-            return sonuclar
-        except:
-            return []
-
     if girdi_tipi == "Döviz & Emtia (Listeden Seç)":
         doviz_emtia_sozluk = {
             "Dolar / TL": "USDTRY=X",
@@ -1503,8 +3597,8 @@ elif menu == "📈 Piyasa Analizi":
             bulunan_sonuclar = sembol_ara(arama_metni)
             
             if bulunan_sonuclar:
-                secim = c1.selectbox("🎯 Arama Sonuçları (Lütfen Seçin):", bulunan_sonuclar)
-                secilen_sembol = secim.split(" | ")[0].strip()
+                secim = c1.selectbox("🎯 Arama Sonuçları (Lütfen Seçin):", list(bulunan_sonuclar.keys()))
+                secilen_sembol = bulunan_sonuclar[secim]
             else:
                 c1.warning("Buna benzer bir hisse, fon veya kripto bulunamadı.")
         else:
@@ -1515,35 +3609,20 @@ elif menu == "📈 Piyasa Analizi":
     secilen_periyot = c2.selectbox("📅 Zaman Aralığı:", list(periyotlar.keys()), index=3)
     
     if secilen_sembol:
-        @st.cache_data(ttl=300)
-        def analiz_verisi_getir(sembol, periyot_kodu):
+        def analiz_verisi_getir(sembol):
             try:
-                if sembol in ["GRAM-ALTIN", "CEYREK-ALTIN", "GRAM-GUMUS", "GRAM-PLATIN"]:
-                    ons_kod = "GC=F"
-                    if "GUMUS" in sembol: ons_kod = "SI=F"
-                    elif "PLATIN" in sembol: ons_kod = "PL=F"
-                    
-                    ons = yf.Ticker(ons_kod).history(period="5y")['Close']
-                    usd = yf.Ticker("USDTRY=X").history(period="5y")['Close']
-                    
-                    df = pd.concat([ons, usd], axis=1, keys=['O','U']).ffill().dropna()
-                    fac = 1.6065 if sembol == "CEYREK-ALTIN" else 1
-                    data = (df['O'] * df['U']) / 31.1035 * fac
-                else:
-                    t = "XU100.IS" if sembol == "BIST" else sembol
-                    data = yf.Ticker(t).history(period="5y")['Close'].dropna()
-                return data
+                return fiyat_gecmisi(sembol)
             except:
                 return None
 
         p_kod = periyotlar[secilen_periyot]
-        ham_veri = analiz_verisi_getir(secilen_sembol, p_kod)
+        ham_veri = analiz_verisi_getir(secilen_sembol)
         
         if ham_veri is None or ham_veri.empty:
             st.error("Bu sembol için geçmiş veri bulunamadı.")
         else:
             days_map = {"1mo":30, "3mo":90, "6mo":180, "1y":365, "3y":1095, "5y":1825}
-            grafik_verisi = ham_veri.tail(days_map.get(p_kod, 365))
+            grafik_verisi = ham_veri[ham_veri.index >= ham_veri.index[-1] - pd.Timedelta(days=days_map.get(p_kod, 365))]
             son_fiyat = ham_veri.iloc[-1]
             
             c3.metric(label="Güncel Fiyat", value=f"{son_fiyat:,.2f}")
@@ -1574,33 +3653,26 @@ elif menu == "📈 Piyasa Analizi":
                 st.subheader("🧠 Akıllı AI Özeti")
                 with st.container(border=True):
                     
-                    puan = 0
-                    sma50 = ham_veri.rolling(50).mean().iloc[-1]
-                    sma200 = ham_veri.rolling(200).mean().iloc[-1]
-                    son_1_ay_getiri = (son_fiyat - ham_veri.iloc[-30]) / ham_veri.iloc[-30]
-                    
-                    if son_fiyat > sma50: puan += 25  
-                    if son_fiyat > sma200: puan += 25 
-                    if sma50 > sma200: puan += 25     
-                    if son_1_ay_getiri > 0: puan += 25 
-                    
-                    son_1_yil = ham_veri.tail(252)
-                    zirve = son_1_yil.max()
-                    zirveye_uzaklik = ((zirve - son_fiyat) / zirve) * 100
+                    gosterge = gostergeler([secilen_sembol]).loc[secilen_sembol]
+                    puan = gosterge['puan']
+                    zirveye_uzaklik = gosterge['zirveye_uzaklik']
                     
-                    gunluk_getiri = ham_veri.pct_change().dropna()
-                    volatilite = gunluk_getiri.std() * 100
+                    volatilite = gosterge['volatilite']
                     if volatilite < 1.0: risk_seviyesi = "Düşük (Sakin) 🟢"
                     elif volatilite < 2.5: risk_seviyesi = "Orta (Dengeli) 🟡"
                     else: risk_seviyesi = "Yüksek (Agresif) 🔴"
                     
-                    son_5_gun_getiri = ((son_fiyat - ham_veri.iloc[-5]) / ham_veri.iloc[-5]) * 100
+                    son_5_gun_getiri = gosterge['momentum_5g']
 
-                    st.markdown(f"**Gelişim Skoru:** {puan}/100")
-                    st.progress(puan / 100)
-                    if puan >= 75: st.caption("Durum: **Çok Güçlü** 🚀")
-                    elif puan == 50: st.caption("Durum: **Kararsız/Yatay** ⚖️")
-                    else: st.caption("Durum: **Zayıf** 🌧️")
+                    if pd.isna(puan):
+                        st.markdown("**Gelişim Skoru:** —")
+                        st.caption("Skor için yeterli fiyat geçmişi yok (en az 200 işlem günü).")
+                    else:
+                        st.markdown(f"**Gelişim Skoru:** {puan:.0f}/100")
+                        st.progress(int(puan) / 100)
+                        if puan >= 75: st.caption("Durum: **Çok Güçlü** 🚀")
+                        elif puan == 50: st.caption("Durum: **Kararsız/Yatay** ⚖️")
+                        else: st.caption("Durum: **Zayıf** 🌧️")
                     
                     st.markdown("---")
                     
@@ -1623,3 +3695,43 @@ elif menu == "📈 Piyasa Analizi":
                     renk = "green" if son_5_gun_getiri > 0 else "red"
                     st.markdown("**🔥 Son 1 Hafta Durumu**")
                     st.write(f"Yakın ivme yönü: **{yon}** (:{renk}[{son_5_gun_getiri:+.1f}%])")
+                    
+                    st.markdown("---")
+                    
+                    st.markdown("**📐 Teknik Göstergeler**")
+                    rsi = gosterge['rsi']
+                    if rsi >= 70: rsi_yorum = "Aşırı alım bölgesi 🔺"
+                    elif rsi <= 30: rsi_yorum = "Aşırı satım bölgesi 🔻"
+                    else: rsi_yorum = "Nötr bölge"
+                    st.write(f"RSI (14): **{rsi:.0f}** — {rsi_yorum}")
+                    macd_yon = "Al sinyali bölgesinde 🟢" if gosterge['macd_hist'] > 0 else "Sat sinyali bölgesinde 🔴"
+                    st.write(f"MACD (12, 26, 9): {macd_yon}")
+                    st.write(f"Bollinger (20, 2): **{gosterge['bb_alt']:,.2f} – {gosterge['bb_ust']:,.2f}** bandında (%{gosterge['bb_yuzde']:.0f})")
+                    st.write(f"ATR (14): **{gosterge['atr']:,.2f}** *(fiyatın %{gosterge['atr_yuzde']:.1f}'i)*")
+
+        st.markdown("---")
+        with st.expander("📋 Takip Listesi Tarayıcı", expanded=False):
+            takip = {**st.session_state.takip_listesi_bant, **st.session_state.sag_panel_listesi}
+            kodlar = {isim: kod.replace("_", "-") for isim, kod in takip.items()}
+            tarama = gostergeler(list(kodlar.values()))
+            if tarama.empty:
+                st.info("Takip listesindeki semboller için geçmiş veri bulunamadı.")
+            else:
+                df_tarama = pd.DataFrame([
+                    {"Varlık": isim, "Skor": tarama.at[kod, 'puan'], "RSI": tarama.at[kod, 'rsi'],
+                     "MACD Hist.": tarama.at[kod, 'macd_hist'], "1 Ay (%)": tarama.at[kod, 'getiri_1ay'],
+                     "Zirveye Uzaklık (%)": tarama.at[kod, 'zirveye_uzaklik'], "Oynaklık (%)": tarama.at[kod, 'volatilite']}
+                    for isim, kod in kodlar.items() if kod in tarama.index
+                ]).sort_values("Skor", ascending=False)
+                st.dataframe(
+                    df_tarama.style.format({"Skor": "{:.0f}", "RSI": "{:.0f}", "MACD Hist.": "{:+.2f}", "1 Ay (%)": "{:+.1f}",
+                                            "Zirveye Uzaklık (%)": "{:.1f}", "Oynaklık (%)": "{:.1f}"}, na_rep="—"),
+                    use_container_width=True, hide_index=True
+                )
+
+# -----------------------------------------------------------------------------
+# YÖNETİCİ: PERFORMANS İZLEME PANELİ
+# -----------------------------------------------------------------------------
+son_iz = izleme_bitir()
+if son_iz and yonetici_mi():
+    izleme_paneli(son_iz)
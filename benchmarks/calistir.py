@@ -0,0 +1,195 @@
+"""Uçtan uca sayfa performansı benchmark'ı.
+
+Her sayfa Streamlit AppTest ile, 10/100/1000 varlıklı ve 10.000+ işlemli sentetik kullanıcılarla çalıştırılır.
+yfinance, RSS ve Yahoo arama sahteleri (sahteler.py) kullanıldığı için ağa çıkılmaz. Her sayfa için şunlar
+raporlanır:
+  - soğuk çalıştırma: tüm st.cache_* temizlenmiş ve fiyat geçmişi deposu boşken ilk çalıştırma
+  - sıcak yeniden çalıştırmalar: medyan / p95
+  - pencere başına Postgres gidiş-dönüşleri (execute + commit/rollback) ve giden HTTP çağrıları
+
+Postgres adresi BENCH_DB_URL ortam değişkeninden okunur. Benchmark kendi kullanıcılarının satırlarını
+silip yeniden yazar; yine de üretim veritabanına yönlendirmeyin. Değişken yoksa ve `pgserver` kuruluysa
+geçici bir gömülü Postgres başlatılır.
+
+    BENCH_DB_URL=postgresql://localhost/portfoy_bench python benchmarks/calistir.py
+    python benchmarks/calistir.py --olcekler 10,100 --tekrar 5 --kaydet sonuc.json
+    python benchmarks/calistir.py --karsilastir sonuc.json --tolerans 0.25   # gerilemede çıkış kodu 1
+    python benchmarks/calistir.py --canli   # canlı kotasyon akışı yerel tekrar sunucusundan (canli_tekrar.py)
+
+Canlı akış varsayılan olarak kapalıdır; --canli verilmezse uygulama gerçek Yahoo websocket'ine bağlanmaz.
+"""
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import tempfile
+
+BURASI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BURASI)
+
+import sahteler  # noqa: E402
+
+sahteler.yerlestir()
+
+import numpy as np  # noqa: E402
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import tohum  # noqa: E402
+
+UYGULAMA = os.path.join(os.path.dirname(BURASI), "app.py")
+SAYFALAR = ["📊 Genel Özet", "🔥 Isı Haritası", "💵 Varlıklar & İşlemler", "📈 Piyasa Analizi", "🧮 Hesap Araçları", "📅 Piyasa Takvimi"]
+METRIKLER = ("soguk_ms", "sicak_medyan_ms", "sicak_p95_ms", "soguk_db", "sicak_db", "soguk_http", "sicak_http")
+
+
+def veritabani_adresi(gecici_dizin):
+    if os.environ.get("BENCH_DB_URL"):
+        return os.environ["BENCH_DB_URL"]
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("BENCH_DB_URL tanımlı değil ve gömülü Postgres için `pgserver` kurulu değil.")
+    return pgserver.get_server(os.path.join(gecici_dizin, "pg"), cleanup_mode="stop").get_uri()
+
+
+class Oturum:
+    # Tek bir kullanıcı için AppTest; her soğuk ölçümde fiyat geçmişi deposu yeni bir dosyaya yönlendirilir
+    def __init__(self, db_url, user_id, gecici_dizin, canli_url=None):
+        self.db_url = db_url
+        self.canli_url = canli_url
+        self.user_id = user_id
+        self.gecici_dizin = gecici_dizin
+        self.depo_no = 0
+        self.at = None
+
+    def yeni(self):
+        self.depo_no += 1
+        at = AppTest.from_file(UYGULAMA, default_timeout=300)
+        at.secrets["DB_URL"] = self.db_url
+        at.secrets["SUPABASE_URL"] = "https://benchmark.invalid"
+        at.secrets["SUPABASE_KEY"] = "benchmark"
+        at.secrets["GECMIS_DB_YOLU"] = os.path.join(self.gecici_dizin, f"gecmis_{self.depo_no}.sqlite3")
+        at.secrets["CANLI_AKIS"] = bool(self.canli_url)
+        if self.canli_url:
+            at.secrets["CANLI_AKIS_URL"] = self.canli_url
+        at.session_state["user"] = types.SimpleNamespace(id=self.user_id, email="benchmark@ornek.invalid")
+        self.at = at
+        return at
+
+    def calistir(self):
+        sahteler.SAYAC.sifirla()
+        bas = time.perf_counter()
+        self.at.run()
+        sure = (time.perf_counter() - bas) * 1000
+        sayilar = sahteler.SAYAC.sifirla()
+        if self.at.exception:
+            raise RuntimeError(f"Sayfa hata verdi: {[e.value for e in self.at.exception]}")
+        return sure, sum(v for k, v in sayilar.items() if k.startswith("db.") and k != "db.connect"), \
+            sum(v for k, v in sayilar.items() if k.startswith("http."))
+
+
+def onbellekleri_temizle():
+    # Uygulamanın arka plan iş parçacıkları (fiyat yenileyici, haber akışı, metrikler, canlı akış) on_release
+    # kancasıyla durdurulur; sonraki ölçümlerin sayaçlarına sahipsiz iş parçacıklarının trafiği karışmaz
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def sayfa_olc(oturum, sayfa, tekrar):
+    at = oturum.yeni()
+    onbellekleri_temizle()
+    if sayfa != SAYFALAR[0]:
+        # Menü ilk çalıştırmadan önce seçilemez; varsayılan sayfa açılıp önbellekler yeniden boşaltılır
+        at.run()
+        onbellekleri_temizle()
+        at.secrets["GECMIS_DB_YOLU"] = os.path.join(oturum.gecici_dizin, f"gecmis_{oturum.depo_no}_b.sqlite3")
+        at.sidebar.radio[0].set_value(sayfa)
+    soguk_ms, soguk_db, soguk_http = oturum.calistir()
+    sicaklar = [oturum.calistir() for _ in range(tekrar)]
+    sureler = np.array([s[0] for s in sicaklar])
+    return {
+        "soguk_ms": round(soguk_ms, 1),
+        "sicak_medyan_ms": round(float(np.median(sureler)), 1),
+        "sicak_p95_ms": round(float(np.percentile(sureler, 95)), 1),
+        "soguk_db": soguk_db, "sicak_db": int(np.median([s[1] for s in sicaklar])),
+        "soguk_http": soguk_http, "sicak_http": int(np.median([s[2] for s in sicaklar])),
+    }
+
+
+def tablo_yazdir(sonuclar):
+    baslik = f"{'ölçek':>6}  {'sayfa':<26}" + "".join(f"{m:>16}" for m in METRIKLER)
+    print(baslik)
+    print("-" * len(baslik))
+    for olcek, sayfalar in sonuclar.items():
+        for sayfa, m in sayfalar.items():
+            print(f"{olcek:>6}  {sayfa:<26}" + "".join(f"{m[k]:>16}" for k in METRIKLER))
+
+
+def karsilastir(sonuclar, onceki, tolerans):
+    # Süre ve sayaçlardan herhangi biri öncekinin (1 + tolerans) katını aşarsa gerileme sayılır
+    gerilemeler = []
+    for olcek, sayfalar in sonuclar.items():
+        for sayfa, m in sayfalar.items():
+            eski = onceki.get(olcek, {}).get(sayfa)
+            if not eski: continue
+            for k in METRIKLER:
+                if k in eski and m[k] > eski[k] * (1 + tolerans) and m[k] - eski[k] >= 1:
+                    gerilemeler.append(f"{olcek} / {sayfa} / {k}: {eski[k]} -> {m[k]}")
+    return gerilemeler
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--olcekler", default="10,100,1000", help="virgülle ayrılmış varlık sayıları")
+    ap.add_argument("--islem", type=int, default=tohum.ASGARI_ISLEM, help="kullanıcı başına işlem sayısı")
+    ap.add_argument("--tekrar", type=int, default=5, help="sayfa başına sıcak yeniden çalıştırma sayısı")
+    ap.add_argument("--sayfalar", default="", help="yalnızca adında bu metinlerden biri geçen sayfalar (virgülle)")
+    ap.add_argument("--kaydet", help="sonuçların yazılacağı JSON dosyası")
+    ap.add_argument("--karsilastir", help="önceki sonuç JSON dosyası")
+    ap.add_argument("--tolerans", type=float, default=0.25)
+    ap.add_argument("--canli", action="store_true", help="canlı kotasyonları yerel websocket tekrar sunucusundan akıt")
+    ap.add_argument("--canli-kayit", help="tekrar sunucusu için kaydedilmiş JSONL (yoksa sentetik)")
+    args = ap.parse_args()
+
+    olcekler = [int(x) for x in args.olcekler.split(",") if x.strip()]
+    secili = [s for s in SAYFALAR if not args.sayfalar or any(p.strip() and p.strip() in s for p in args.sayfalar.split(","))]
+
+    canli_url = None
+    if args.canli:
+        import canli_tekrar
+        tekrar_sunucusu = canli_tekrar.TekrarSunucusu(dosya=args.canli_kayit).baslat()
+        canli_url = tekrar_sunucusu.url
+
+    with tempfile.TemporaryDirectory(prefix="portfoy_bench_") as gecici_dizin:
+        db_url = veritabani_adresi(gecici_dizin)
+        # Şema ve göçler uygulamanın kendi init_db'si ile kurulur, ardından kullanıcılar tohumlanır
+        hazirlik = Oturum(db_url, tohum.kullanici_kimligi(0), gecici_dizin, canli_url)
+        hazirlik.yeni().run()
+        kullanicilar = tohum.tohumla(db_url, olcekler, args.islem)
+
+        sonuclar = {}
+        for olcek in olcekler:
+            user_id, islem_adedi = kullanicilar[olcek]
+            print(f"# {olcek} varlık, {islem_adedi} işlem", file=sys.stderr)
+            oturum = Oturum(db_url, user_id, gecici_dizin, canli_url)
+            sonuclar[str(olcek)] = {sayfa: sayfa_olc(oturum, sayfa, args.tekrar) for sayfa in secili}
+
+    tablo_yazdir(sonuclar)
+    if args.canli:
+        print(f"# tekrar sunucusu {tekrar_sunucusu.gonderilen} canlı kotasyon mesajı gönderdi", file=sys.stderr)
+    if args.kaydet:
+        with open(args.kaydet, "w", encoding="utf-8") as f:
+            json.dump(sonuclar, f, ensure_ascii=False, indent=2)
+    if args.karsilastir:
+        with open(args.karsilastir, encoding="utf-8") as f:
+            gerilemeler = karsilastir(sonuclar, json.load(f), args.tolerans)
+        for g in gerilemeler:
+            print("GERİLEME:", g)
+        if gerilemeler:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Yahoo canlı kotasyon websocket'inin yerel tekrar sunucusu.
+
+Uygulamanın CanliKotasyonlar aboneliği CANLI_AKIS_URL ile bu sunucuya yönlendirilir. İstemci Yahoo'daki gibi
+{"subscribe": [...]} / {"unsubscribe": [...]} gönderir; sunucu abone olunan semboller için
+{"type": "pricing", "message": <base64 PricingData>} mesajları yollar. Kaynak ya kaydedilmiş bir JSONL dosyasıdır
+(her satır yfinance'in çözdüğü mesaj sözlüğü) ya da sahteler.py'deki serilerden türetilen rastgele yürüyüştür.
+
+    python benchmarks/canli_tekrar.py sun --port 8765 [--dosya kayit.jsonl] [--aralik 0.2]
+    python benchmarks/canli_tekrar.py kaydet --semboller USDTRY=X,GC=F,BTC-USD --sure 60 kayit.jsonl
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+
+from google.protobuf.json_format import ParseDict
+from websockets.sync.server import serve
+from yfinance.pricing_pb2 import PricingData
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sahteler  # noqa: E402
+
+
+def kodla(veri):
+    return json.dumps({"type": "pricing", "message": base64.b64encode(ParseDict(veri, PricingData()).SerializeToString()).decode()})
+
+
+class KayitKaynagi:
+    # Kaydedilmiş mesajları sembol başına sırayla, sona gelince baştan döndürür
+    def __init__(self, dosya):
+        self._mesajlar = {}
+        with open(dosya, encoding="utf-8") as f:
+            for satir in f:
+                if satir.strip():
+                    veri = json.loads(satir)
+                    self._mesajlar.setdefault(veri["id"], []).append(veri)
+        self._sira = dict.fromkeys(self._mesajlar, 0)
+
+    def sonraki(self, sembol):
+        liste = self._mesajlar.get(sembol)
+        if not liste: return None
+        i = self._sira[sembol]
+        self._sira[sembol] = (i + 1) % len(liste)
+        return dict(liste[i], time=str(int(time.time() * 1000)))
+
+
+class SentetikKaynak:
+    # Sahte yfinance serisinin son kapanışından başlayan küçük adımlı rastgele yürüyüş
+    def __init__(self, tohum=7):
+        self._rng = random.Random(tohum)
+        self._fiyat = {}
+        self._onceki = {}
+
+    def sonraki(self, sembol):
+        if sembol not in self._fiyat:
+            seri = sahteler._seri(sembol, 2)["Close"]
+            self._onceki[sembol], self._fiyat[sembol] = float(seri.iloc[0]), float(seri.iloc[1])
+        self._fiyat[sembol] *= 1 + self._rng.gauss(0, 0.0005)
+        fiyat, onceki = self._fiyat[sembol], self._onceki[sembol]
+        return {"id": sembol, "price": fiyat, "time": str(int(time.time() * 1000)),
+                "previous_close": onceki, "change": fiyat - onceki, "change_percent": (fiyat / onceki - 1) * 100}
+
+
+class TekrarSunucusu:
+    def __init__(self, port=0, dosya=None, aralik=0.2):
+        self.kaynak = KayitKaynagi(dosya) if dosya else SentetikKaynak()
+        self.aralik = aralik
+        self.gonderilen = 0
+        self._kilit = threading.Lock()
+        self._sunucu = serve(self._istemci, "127.0.0.1", port)
+        self.url = f"ws://127.0.0.1:{self._sunucu.socket.getsockname()[1]}"
+
+    def _istemci(self, baglanti):
+        abonelikler = set()
+        abonelik_kilidi = threading.Lock()  # okuyucu iş parçacığı değiştirir, gönderim döngüsü okur
+
+        def oku():
+            for ham in baglanti:
+                istek = json.loads(ham)
+                # Yahoo gibi: subscribe tam listeyi gönderir, unsubscribe yalnızca çıkarılacakları
+                with abonelik_kilidi:
+                    if "subscribe" in istek:
+                        abonelikler.update(istek["subscribe"])
+                    abonelikler.difference_update(istek.get("unsubscribe", []))
+
+        okuyucu = threading.Thread(target=oku, daemon=True)
+        okuyucu.start()
+        try:
+            while okuyucu.is_alive():
+                with abonelik_kilidi:
+                    semboller = sorted(abonelikler)
+                for sembol in semboller:
+                    veri = self.kaynak.sonraki(sembol)
+                    if veri is None: continue
+                    baglanti.send(kodla(veri))
+                    with self._kilit:
+                        self.gonderilen += 1
+                time.sleep(self.aralik)
+        except Exception:
+            pass
+
+    def baslat(self):
+        threading.Thread(target=self._sunucu.serve_forever, daemon=True).start()
+        return self
+
+    def durdur(self):
+        self._sunucu.shutdown()
+
+
+def kaydet(semboller, sure, cikti):
+    # Gerçek Yahoo akışından mesajları JSONL olarak kaydeder (ağ gerektirir)
+    from yfinance import WebSocket
+    bitis = time.time() + sure
+    with open(cikti, "w", encoding="utf-8") as f, WebSocket(verbose=False) as ws:
+        ws.subscribe(semboller)
+
+        def isle(veri):
+            f.write(json.dumps(veri, ensure_ascii=False) + "\n")
+            if time.time() > bitis:
+                raise KeyboardInterrupt
+
+        ws.listen(isle)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    alt = ap.add_subparsers(dest="komut", required=True)
+    sun = alt.add_parser("sun")
+    sun.add_argument("--port", type=int, default=8765)
+    sun.add_argument("--dosya")
+    sun.add_argument("--aralik", type=float, default=0.2)
+    kay = alt.add_parser("kaydet")
+    kay.add_argument("--semboller", required=True)
+    kay.add_argument("--sure", type=float, default=60)
+    kay.add_argument("cikti")
+    args = ap.parse_args()
+
+    if args.komut == "kaydet":
+        kaydet(args.semboller.split(","), args.sure, args.cikti)
+        return
+    sunucu = TekrarSunucusu(args.port, args.dosya, args.aralik).baslat()
+    print(f"{sunucu.url} dinleniyor", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sunucu.durdur()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# Benchmark'lar için ağa çıkmayan sahte sağlayıcılar ve sayaçlar.
+# - yfinance: sembol adından türetilen deterministik fiyat serileri döndüren modül (sys.modules'a yerleştirilir);
+#   WebSocket gerçek istemcidir ve yalnızca CANLI_AKIS_URL ile verilen yerel tekrar sunucusuna bağlanır
+# - HTTP: requests çağrılarını kayıtlı RSS / Yahoo arama yanıtlarıyla karşılayan adaptör
+# - Postgres: havuzun açtığı bağlantılara imleç/commit sayan sınıflar enjekte eden psycopg2.connect sarmalayıcısı
+import io
+import sys
+import json
+import types
+import zlib
+import threading
+from collections import Counter
+from email.utils import formatdate
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+
+class Sayac:
+    # İş parçacıkları arasında paylaşılan olay sayacı; ölçüm penceresi başında sifirla() çağrılır
+    def __init__(self):
+        self._kilit = threading.Lock()
+        self._sayilar = Counter()
+
+    def artir(self, anahtar, adet=1):
+        with self._kilit:
+            self._sayilar[anahtar] += adet
+
+    def sifirla(self):
+        with self._kilit:
+            onceki, self._sayilar = self._sayilar, Counter()
+        return onceki
+
+    def toplam(self, on_ek):
+        with self._kilit:
+            return sum(v for k, v in self._sayilar.items() if k.startswith(on_ek))
+
+
+SAYAC = Sayac()
+
+# =============================================================================
+# SAHTE YFINANCE
+# =============================================================================
+TEMEL_FIYATLAR = {
+    "USDTRY=X": 41.0, "EURTRY=X": 48.0, "GBPTRY=X": 55.0, "GC=F": 4000.0, "SI=F": 48.0, "PL=F": 1500.0,
+    "XU100.IS": 10500.0, "BTC-USD": 110000.0, "ETH-USD": 4000.0, "^GSPC": 6600.0, "THYAO.IS": 300.0, "AAPL": 250.0,
+}
+PERIYOT_GUN = {"1d": 1, "5d": 5, "1mo": 22, "3mo": 66, "6mo": 130, "1y": 252, "2y": 504, "3y": 756, "5y": 1260, "10y": 2520, "max": 2520}
+
+
+def _seri(sembol, gun):
+    # Aynı sembol her çağrıda aynı seriyi üretir; son gün bugündür
+    temel = TEMEL_FIYATLAR.get(sembol, 20.0 + zlib.crc32(sembol.encode()) % 480)
+    rng = np.random.default_rng(zlib.crc32(sembol.encode()))
+    tum = np.cumsum(rng.normal(0, 0.012, PERIYOT_GUN["max"]))
+    degerler = temel * np.exp(tum[-gun:] - tum[-1])
+    indeks = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=gun, tz="UTC")
+    return pd.DataFrame({"Open": degerler, "High": degerler * 1.01, "Low": degerler * 0.99, "Close": degerler, "Volume": 1000}, index=indeks)
+
+
+def _gun_sayisi(period, start):
+    if start is not None:
+        return min(PERIYOT_GUN["max"], max(2, len(pd.bdate_range(pd.Timestamp(start), pd.Timestamp.today()))))
+    return PERIYOT_GUN.get(period, 5)
+
+
+class SahteTicker:
+    def __init__(self, sembol):
+        self.ticker = sembol
+
+    def history(self, period="1mo", start=None, **kwargs):
+        SAYAC.artir("http.yfinance.history")
+        return _seri(self.ticker, _gun_sayisi(period, start))
+
+    @property
+    def info(self):
+        SAYAC.artir("http.yfinance.info")
+        kod = zlib.crc32(self.ticker.encode())
+        if kod % 3:
+            return {"shortName": self.ticker}
+        return {"shortName": self.ticker, "dividendRate": round(1 + kod % 7 / 2, 2),
+                "exDividendDate": int(pd.Timestamp.today().timestamp()) + 86400 * (kod % 60)}
+
+
+def sahte_download(tickers, period="5d", start=None, group_by="column", **kwargs):
+    SAYAC.artir("http.yfinance.download")
+    if isinstance(tickers, str):
+        tickers = tickers.split()
+    gun = _gun_sayisi(period, start)
+    df = pd.concat({t: _seri(t, gun) for t in tickers}, axis=1)
+    if group_by != "ticker":
+        df = df.swaplevel(0, 1, axis=1).sort_index(axis=1)
+    return df
+
+
+def yfinance_yerlestir():
+    try:
+        from yfinance.live import WebSocket
+    except ImportError:
+        WebSocket = None
+    modul = types.ModuleType("yfinance")
+    if WebSocket is not None:
+        modul.WebSocket = WebSocket
+    modul.Ticker = SahteTicker
+    modul.download = sahte_download
+    sys.modules["yfinance"] = modul
+    return modul
+
+# =============================================================================
+# SAHTE HTTP (RSS VE YAHOO ARAMA)
+# =============================================================================
+def rss_govdesi(adet=40):
+    ogeler = "".join(
+        f"<item><title>Piyasalarda gün ortası özeti #{i}</title><link>https://ornek.invalid/haber/{i}</link>"
+        f"<pubDate>{formatdate(1_700_000_000 - i * 600, usegmt=True)}</pubDate></item>"
+        for i in range(adet))
+    return f"<?xml version='1.0' encoding='utf-8'?><rss version='2.0'><channel><title>Haber</title>{ogeler}</channel></rss>".encode()
+
+
+RSS_ETAG = '"benchmark-rss-1"'
+
+
+def yahoo_arama_govdesi(kelime):
+    kok = "".join(ch for ch in kelime.upper() if ch.isalnum())[:6] or "X"
+    return json.dumps({"quotes": [
+        {"symbol": f"{kok}{i}.IS", "shortname": f"{kok} Sentetik {i}", "exchDisp": "Istanbul"} for i in range(5)
+    ]}).encode()
+
+
+class SahteAdaptor(HTTPAdapter):
+    # Ağa hiç çıkmaz; bilinen uç noktalar için kayıtlı yanıt, diğerleri için 404 döndürür
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url = request.url
+        basliklar = {"Content-Type": "application/json"}
+        durum, govde = 404, b""
+        if "finance/search" in url:
+            SAYAC.artir("http.yahoo_arama")
+            kelime = requests.utils.unquote(url.split("q=", 1)[1].split("&", 1)[0]) if "q=" in url else ""
+            durum, govde = 200, yahoo_arama_govdesi(kelime)
+        elif "rss" in url:
+            SAYAC.artir("http.rss")
+            if request.headers.get("If-None-Match") == RSS_ETAG:
+                durum = 304
+            else:
+                durum, govde = 200, rss_govdesi()
+                basliklar = {"Content-Type": "application/rss+xml", "ETag": RSS_ETAG}
+        else:
+            SAYAC.artir("http.diger")
+        ham = HTTPResponse(body=io.BytesIO(govde), headers=basliklar, status=durum, preload_content=False, decode_content=True)
+        return self.build_response(request, ham)
+
+
+def http_yerlestir():
+    # requests.get / Session.request ne olursa olsun her oturum sahte adaptörü kullanır
+    ozgun_init = requests.Session.__init__
+
+    def init(self, *args, **kwargs):
+        ozgun_init(self, *args, **kwargs)
+        self.mount("http://", SahteAdaptor())
+        self.mount("https://", SahteAdaptor())
+
+    requests.Session.__init__ = init
+
+# =============================================================================
+# POSTGRES GİDİŞ-DÖNÜŞ SAYACI
+# =============================================================================
+def _sayan_imlec_sinifi(taban, _onbellek={}):
+    # Uygulamanın kendi imleç sınıfı (ör. izleme yapan IzlenenImlec) korunur, sayaç onun üstüne eklenir
+    if taban not in _onbellek:
+        def execute(self, sorgu, parametreler=None):
+            SAYAC.artir("db.execute")
+            return taban.execute(self, sorgu, parametreler)
+
+        def executemany(self, sorgu, parametreler):
+            SAYAC.artir("db.executemany")
+            return taban.executemany(self, sorgu, parametreler)
+
+        _onbellek[taban] = type(f"Sayan{taban.__name__}", (taban,), {"execute": execute, "executemany": executemany})
+    return _onbellek[taban]
+
+
+def _sayan_baglanti_sinifi(taban, _onbellek={}):
+    if taban not in _onbellek:
+        def __init__(self, *args, **kwargs):
+            taban.__init__(self, *args, **kwargs)
+            self.cursor_factory = _sayan_imlec_sinifi(self.cursor_factory or psycopg2.extensions.cursor)
+
+        def commit(self):
+            SAYAC.artir("db.commit")
+            return taban.commit(self)
+
+        def rollback(self):
+            SAYAC.artir("db.rollback")
+            return taban.rollback(self)
+
+        _onbellek[taban] = type(f"Sayan{taban.__name__}", (taban,), {"__init__": __init__, "commit": commit, "rollback": rollback})
+    return _onbellek[taban]
+
+
+def postgres_sayaci_yerlestir():
+    # Uygulamanın connection_factory'si (HazirBaglanti) alt sınıflanır; isinstance kontrolleri bozulmaz
+    ozgun_connect = psycopg2.connect
+
+    def connect(*args, connection_factory=None, **kwargs):
+        SAYAC.artir("db.connect")
+        taban = connection_factory or psycopg2.extensions.connection
+        return ozgun_connect(*args, connection_factory=_sayan_baglanti_sinifi(taban), **kwargs)
+
+    psycopg2.connect = connect
+
+
+def yerlestir():
+    yfinance_yerlestir()
+    http_yerlestir()
+    postgres_sayaci_yerlestir()
@@ -0,0 +1,74 @@
+# Benchmark kullanıcılarını sentetik portföylerle doldurur. Kullanıcı kimlikleri ölçeğe göre sabittir;
+# her tohumlama önce o kullanıcının eski satırlarını siler, böylece aynı veritabanında tekrar çalıştırılabilir.
+import uuid
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+BENCH_AD_ALANI = uuid.UUID("6f1c1a52-5b0e-4c55-9a3e-0d7b8b1f0c11")
+SABIT_VARLIKLAR = [
+    ("Döviz/Emtia", "GRAM-ALTIN"), ("Döviz/Emtia", "CEYREK-ALTIN"), ("Döviz/Emtia", "USDTRY=X"),
+    ("Kripto", "BTC-USD"), ("Hisse/Fon", "THYAO.IS"), ("Hisse/Fon", "AAPL"), ("Döviz/Emtia", "GRAM-GUMUS"),
+]
+ASGARI_ISLEM = 10_000
+GECMIS_GUN = 750
+
+
+def kullanici_kimligi(varlik_sayisi):
+    return str(uuid.uuid5(BENCH_AD_ALANI, f"portfoy-{varlik_sayisi}"))
+
+
+def semboller(adet):
+    sabit = SABIT_VARLIKLAR[:adet]
+    return sabit + [("Hisse/Fon", f"BNC{i:04d}.IS") for i in range(adet - len(sabit))]
+
+
+def islemler_uret(varliklar, adet, rng):
+    # Her varlık önce alınır; sonraki işlemler çoğunlukla alış, satışlar eldeki miktarı asla aşmaz
+    bugun = pd.Timestamp(date.today())
+    tarihler = pd.bdate_range(end=bugun, periods=GECMIS_GUN)
+    sira = np.concatenate([np.arange(len(varliklar)), rng.integers(0, len(varliklar), max(0, adet - len(varliklar)))])
+    gunler = np.sort(rng.integers(0, len(tarihler), len(sira)))
+    eldeki = np.zeros(len(varliklar))
+    maliyet = np.zeros(len(varliklar))
+    satirlar = []
+    for v, g in zip(sira, gunler):
+        fiyat = round(float(rng.uniform(5, 500)), 4)
+        miktar = float(rng.integers(1, 20))
+        if eldeki[v] > miktar and rng.random() < 0.25:
+            tip = "SATIS"
+            eldeki[v] -= miktar
+        else:
+            tip = "ALIS"
+            maliyet[v] = (eldeki[v] * maliyet[v] + miktar * fiyat) / (eldeki[v] + miktar)
+            eldeki[v] += miktar
+        satirlar.append((varliklar[v][1], tip, miktar, fiyat, tarihler[g].date()))
+    return satirlar, eldeki, maliyet
+
+
+def kullanici_tohumla(conn, varlik_sayisi, islem_sayisi=None, tohum=42):
+    user_id = kullanici_kimligi(varlik_sayisi)
+    rng = np.random.default_rng(tohum + varlik_sayisi)
+    varliklar = semboller(varlik_sayisi)
+    islemler, eldeki, maliyet = islemler_uret(varliklar, max(islem_sayisi or ASGARI_ISLEM, varlik_sayisi), rng)
+    with conn.cursor() as cursor:
+        for tablo in ("islemler", "varliklar", "hedefler", "portfoy_degeri", "pozisyon_kontrol_noktalari"):
+            cursor.execute(f"DELETE FROM {tablo} WHERE user_id = %s", (user_id,))
+        execute_values(cursor, "INSERT INTO varliklar (tur, sembol, miktar, ort_maliyet, guncel_fiyat, user_id) VALUES %s",
+                       [(tur, sembol, float(m), float(c), float(c), user_id) for (tur, sembol), m, c in zip(varliklar, eldeki, maliyet)])
+        execute_values(cursor, "INSERT INTO islemler (sembol, islem_tipi, miktar, fiyat, tarih, user_id) VALUES %s",
+                       [(*satir, user_id) for satir in islemler], page_size=5000)
+        cursor.execute("INSERT INTO hedefler (ad, tutar, user_id) VALUES (%s, %s, %s)", ("Ev", 5_000_000, user_id))
+    conn.commit()
+    return user_id, len(islemler)
+
+
+def tohumla(db_url, olcekler, islem_sayisi=None):
+    conn = psycopg2.connect(db_url)
+    try:
+        return {n: kullanici_tohumla(conn, n, islem_sayisi) for n in olcekler}
+    finally:
+        conn.close()